@@ -0,0 +1,139 @@
+import glob
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from image_loader import SHARED_LOADER
+
+# Cache for GUI images (the Run tab background) so startup doesn't decode and resize
+# the full source photo every time.
+#
+# - the sizes the window used last are saved under ASSET_CACHE_DIR (max_on_disk per source
+#   image, older ones are deleted), the next launch just loads the small pre-rendered file
+# - when the window is resized, a quick rescale of an already rendered size is shown first
+#   and the proper render from the source replaces it when it's ready
+# - the cache key uses the source path, mtime and file size, so nothing needs to read the
+#   (possibly huge) source file to find out if a render is still valid
+
+ASSET_CACHE_DIR = os.path.join(".cache", "assets")
+
+
+class AssetCache:
+    def __init__(self, cache_dir=ASSET_CACHE_DIR, loader=SHARED_LOADER, max_in_memory=4, max_on_disk=4):
+        self.cache_dir = cache_dir
+        self.loader = loader
+        self.max_in_memory = max_in_memory
+        self.max_on_disk = max_on_disk
+        self._renders = OrderedDict()   # (source key, size) -> PIL image
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _source_key(self, path):
+        st = os.stat(path)
+        ident = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}"
+        return hashlib.sha1(ident.encode("utf-8")).hexdigest()[:16]
+
+    def _disk_path(self, source_key, size):
+        return os.path.join(self.cache_dir, f"{source_key}-{size[0]}x{size[1]}.png")
+
+    def cached(self, path, size):
+        """Return the render from memory or disk, or None. Never touches the source image."""
+        size = tuple(size)
+        source_key = self._source_key(path)
+        with self._lock:
+            img = self._renders.get((source_key, size))
+            if img is not None:
+                self._renders.move_to_end((source_key, size))
+                return img
+        disk_path = self._disk_path(source_key, size)
+        if os.path.exists(disk_path):
+            try:
+                with Image.open(disk_path) as f:
+                    img = f.copy()
+                os.utime(disk_path)  # used again, so it's the last one _prune() deletes
+            except OSError:
+                return None  # broken file, render() will overwrite it
+            self._remember(source_key, size, img)
+            return img
+        return None
+
+    def _closest_render(self, source_key, size, bigger_only):
+        """The smallest render at least as big as size, or (if allowed) the biggest one we have."""
+        with self._lock:
+            candidates = [(s, im) for (k, s), im in self._renders.items() if k == source_key]
+        bigger = [c for c in candidates if c[0][0] >= size[0] and c[0][1] >= size[1]]
+        if bigger:
+            return min(bigger, key=lambda c: c[0][0] * c[0][1])[1]
+        if candidates and not bigger_only:
+            return max(candidates, key=lambda c: c[0][0] * c[0][1])[1]
+        return None
+
+    def quick(self, path, size):
+        """
+        Something to show right now: the exact render if we have one, otherwise the closest
+        render in memory scaled with a fast filter. Returns (image or None, exact).
+        Nothing here decodes the source, so it's safe to call on every resize event.
+        """
+        size = tuple(size)
+        img = self.cached(path, size)
+        if img is not None:
+            return img, True
+        base = self._closest_render(self._source_key(path), size, bigger_only=False)
+        if base is None:
+            return None, False
+        return base.resize(size, Image.BILINEAR), False
+
+    def render(self, path, size):
+        """
+        Proper render for size, saved for next time. Scaled down from a bigger render we already
+        have when possible, otherwise decoded from the source (JPEG draft decode + LANCZOS).
+        """
+        size = tuple(size)
+        img = self.cached(path, size)
+        if img is not None:
+            return img
+        source_key = self._source_key(path)
+        base = self._closest_render(source_key, size, bigger_only=True)
+        if base is not None:
+            img = base.resize(size, Image.LANCZOS, reducing_gap=2.0)
+        else:
+            img = self.loader.fit(path, size)
+        self._store(source_key, size, img)
+        return img
+
+    def _store(self, source_key, size, img):
+        self._remember(source_key, size, img)
+        disk_path = self._disk_path(source_key, size)
+        tmp_path = f"{disk_path}.{threading.get_ident()}.tmp"
+        try:
+            img.save(tmp_path, format="PNG", compress_level=1)  # fast to write and to read back
+            os.replace(tmp_path, disk_path)
+        except OSError:
+            return  # the memory copy still works
+        self._prune(source_key)
+
+    def _prune(self, source_key):
+        """Keep only the max_on_disk most recently used renders of a source, resizing makes lots of sizes."""
+        paths = glob.glob(os.path.join(self.cache_dir, f"{source_key}-*.png"))
+        if len(paths) <= self.max_on_disk:
+            return
+        def last_used(p):
+            try:
+                return os.path.getmtime(p)
+            except OSError:
+                return 0.0
+        for old in sorted(paths, key=last_used)[:-self.max_on_disk]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass  # removed by another thread already
+
+    def _remember(self, source_key, size, img):
+        with self._lock:
+            self._renders[(source_key, size)] = img
+            self._renders.move_to_end((source_key, size))
+            while len(self._renders) > self.max_in_memory:
+                self._renders.popitem(last=False)
@@ -0,0 +1,175 @@
+# CPU inference backends for the Hugging Face models.
+#
+#   "torch" - the normal fp32 PyTorch model (what pipeline() gives you)
+#   "int8"  - PyTorch with dynamic int8 quantization of every Linear layer
+#   "onnx"  - exported to ONNX and run with onnxruntime (needs: pip install optimum[onnxruntime])
+#
+# int8 and onnx models are converted once and saved under BACKEND_CACHE_DIR, later starts
+# load the converted files directly, which is faster than loading fp32 and converting again.
+# (TorchScript is not offered: tracing doesn't cover generate(), which bart summarization needs.)
+#
+# Run this file to check that the backends give the same answers and to compare their speed:
+#   python backends.py --backends torch int8 onnx
+
+import argparse
+import glob
+import os
+import re
+import statistics
+import time
+
+BACKENDS = ("torch", "int8", "onnx")
+BACKEND_CACHE_DIR = os.path.join(".cache", "backends")
+
+# pipeline task -> (transformers auto class, optimum onnxruntime class)
+TASK_CLASSES = {
+    "summarization": ("AutoModelForSeq2SeqLM", "ORTModelForSeq2SeqLM"),
+    "sentiment-analysis": ("AutoModelForSequenceClassification", "ORTModelForSequenceClassification"),
+    "image-classification": ("AutoModelForImageClassification", "ORTModelForImageClassification"),
+}
+
+
+def artifact_dir(model_id, backend, cache_dir=BACKEND_CACHE_DIR):
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_id)
+    return os.path.join(cache_dir, safe_name, backend)
+
+
+def _preprocessor_kwargs(task, model_id):
+    # when pipeline() gets a model object instead of a name it also needs the tokenizer / processor
+    if task == "image-classification":
+        from transformers import AutoImageProcessor
+        return {"image_processor": AutoImageProcessor.from_pretrained(model_id)}
+    from transformers import AutoTokenizer
+    return {"tokenizer": AutoTokenizer.from_pretrained(model_id)}
+
+
+def _load_int8(task, model_id, cache_dir):
+    import torch
+    import transformers
+
+    path = os.path.join(artifact_dir(model_id, "int8", cache_dir), "model.pt")
+    if os.path.exists(path):
+        model = torch.load(path, weights_only=False)
+    else:
+        auto_class = getattr(transformers, TASK_CLASSES[task][0])
+        model = auto_class.from_pretrained(model_id)
+        model.eval()
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        torch.save(model, path)
+    model.eval()
+    return model
+
+
+def _load_onnx(task, model_id, cache_dir):
+    try:
+        import optimum.onnxruntime as ort
+    except ImportError as e:
+        raise ImportError("the onnx backend needs optimum: pip install optimum[onnxruntime]") from e
+
+    ort_class = getattr(ort, TASK_CLASSES[task][1])
+    path = artifact_dir(model_id, "onnx", cache_dir)
+    if os.path.isdir(path) and glob.glob(os.path.join(path, "*.onnx")):
+        return ort_class.from_pretrained(path)
+    model = ort_class.from_pretrained(model_id, export=True)
+    model.save_pretrained(path)
+    return model
+
+
+def build_pipeline(task, model_id, backend="torch", cache_dir=BACKEND_CACHE_DIR):
+    """Same as pipeline(task, model=model_id) but running on the chosen backend."""
+    # imported here so that importing backends (and models / gui) doesn't pay for transformers
+    from transformers import pipeline
+    if backend == "torch":
+        return pipeline(task, model=model_id)
+    if backend == "int8":
+        model = _load_int8(task, model_id, cache_dir)
+    elif backend == "onnx":
+        model = _load_onnx(task, model_id, cache_dir)
+    else:
+        raise ValueError(f"unknown backend {backend!r}, choose from {BACKENDS}")
+    return pipeline(task, model=model, **_preprocessor_kwargs(task, model_id))
+
+
+# ======================
+# Parity + speed report
+# ======================
+
+PARITY_TEXTS = [
+    "I absolutely loved this movie, the acting was brilliant.",
+    "The service was slow and the food arrived cold.",
+    "It was fine. Nothing special, but nothing terrible either.",
+]
+
+
+def _top(result):
+    result = result[0] if isinstance(result, list) else result
+    return result["label"], result["score"]
+
+
+def _median_latency(fn, inputs, repeat):
+    times = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def compare_backends(backends=BACKENDS, texts=PARITY_TEXTS, images=None, tolerance=0.05, repeat=3):
+    """
+    Load the sentiment and image models on every backend, check their top label and score
+    against the torch backend and measure load time, memory and median latency.
+    Returns a list of report rows (one per backend and model).
+    """
+    from models import AIModels
+
+    images = images or sorted(glob.glob(os.path.join("data", "*.jpg")))
+    reference = {}
+    rows = []
+    for backend in backends:
+        models = AIModels(backends={"sentiment_analyzer": backend, "image_classifier": backend}, cache=False)
+        for name, inputs in (("sentiment_analyzer", texts), ("image_classifier", images)):
+            pipe = models.registry.get(name)
+            outputs = [_top(pipe(item)) for item in inputs]  # also warms the model up
+            reference.setdefault(name, outputs)
+
+            mismatches = 0
+            max_diff = 0.0
+            for (label, score), (ref_label, ref_score) in zip(outputs, reference[name]):
+                diff = abs(score - ref_score)
+                max_diff = max(max_diff, diff)
+                if label != ref_label or diff > tolerance:
+                    mismatches += 1
+
+            stats = models.load_stats[name]
+            rows.append({
+                "backend": backend,
+                "model": name,
+                "load_seconds": stats["load_seconds"],
+                "rss_added_mb": stats["rss_added_mb"],
+                "median_latency_ms": _median_latency(pipe, inputs, repeat) * 1000,
+                "max_score_diff": max_diff,
+                "parity": mismatches == 0,
+            })
+        del models
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CPU inference backends")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--tolerance", type=float, default=0.05, help="max allowed score difference")
+    args = parser.parse_args()
+
+    rows = compare_backends(args.backends, tolerance=args.tolerance)
+    print(f"{'backend':<8}{'model':<20}{'load s':>8}{'RSS MB':>9}{'p50 ms':>9}{'max diff':>10}  parity")
+    for r in rows:
+        print(f"{r['backend']:<8}{r['model']:<20}{r['load_seconds']:>8.2f}{r['rss_added_mb']:>9.0f}"
+              f"{r['median_latency_ms']:>9.1f}{r['max_score_diff']:>10.4f}  {'ok' if r['parity'] else 'FAIL'}")
+    return 0 if all(r["parity"] for r in rows) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,227 @@
+# Benchmark suite for AIModels.
+#
+# Measures: startup (import + AIModels()), per-model load time, single call latency
+# (p50/p95/p99) for summarization, sentiment, image classification and OCR, batched throughput
+# and peak memory. Results are written as JSON and compared with a saved baseline.
+#
+#   python benchmark.py --tiny --offline                 # tiny stand-in models, no network
+#   python benchmark.py --tiny --offline --save-baseline # store the current numbers as the baseline
+#   python benchmark.py                                  # the real models (slow, needs them cached)
+#
+# Exit code is 1 if any metric got worse than the baseline by more than --threshold.
+# No baseline is committed (the numbers depend on the machine), so the first run on a machine
+# has nothing to compare against: it says so loudly, and with --require-baseline exits with 2.
+
+import argparse
+import glob
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+RESULTS_PATH = os.path.join("benchmarks", "latest.json")
+BASELINE_PATH = os.path.join("benchmarks", "baseline.json")
+
+# small random-weight models with the same architectures, good enough to time the code paths
+TINY_MODEL_SPECS = {
+    "summarizer": ("summarization", "hf-internal-testing/tiny-random-bart"),
+    "sentiment_analyzer": ("sentiment-analysis", "hf-internal-testing/tiny-random-distilbert"),
+    "image_classifier": ("image-classification", "hf-internal-testing/tiny-random-vit"),
+}
+
+WORDS = (
+    "the model reads a long report about city transport budgets and weather while users wait "
+    "for results people liked the new park but complained about noise traffic and parking prices "
+    "researchers measured performance across many machines and found surprising differences"
+).split()
+
+
+def synthetic_corpus(count, min_words, max_words, seed=137):
+    """Deterministic fake sentences so every run uses the same text."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+        sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+        corpus.append(" ".join(sentences))
+    return corpus
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def latency_summary(times):
+    return {
+        "calls": len(times),
+        "p50_ms": percentile(times, 50) * 1000,
+        "p95_ms": percentile(times, 95) * 1000,
+        "p99_ms": percentile(times, 99) * 1000,
+    }
+
+
+def time_calls(fn, inputs, repeat):
+    times = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            times.append(time.perf_counter() - start)
+    return latency_summary(times)
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure_startup(tiny):
+    """Time a fresh interpreter importing models and creating AIModels (nothing preloaded)."""
+    code = (
+        "import time; t = time.perf_counter(); import models; "
+        f"models.AIModels(specs={TINY_MODEL_SPECS!r} if {tiny} else None, cache=False); "
+        "print(time.perf_counter() - t)"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(args):
+    from models import AIModels
+
+    results = {"startup_seconds": measure_startup(args.tiny)}
+    models = AIModels(cache=False, specs=TINY_MODEL_SPECS if args.tiny else None)
+
+    texts = synthetic_corpus(args.items, 40, 160)
+    images = sorted(set(glob.glob(os.path.join(args.images, "*.jpg")) + glob.glob(os.path.join(args.images, "*.JPG"))
+                        + glob.glob(os.path.join(args.images, "*.jpeg"))))
+
+    # load (and warm up) every model once so load time and latency are measured separately
+    models.run_summarization(texts[0])
+    models.run_sentiment(texts[0])
+    models.run_image_classification(images[0])
+    results["load_seconds"] = {name: stats["load_seconds"] for name, stats in models.load_stats.items()}
+
+    results["latency"] = {
+        "summarization": time_calls(models.run_summarization, texts[:args.items // 2 or 1], args.repeat),
+        "sentiment": time_calls(models.run_sentiment, texts, args.repeat),
+        "image_classification": time_calls(models.run_image_classification, images, args.repeat),
+    }
+
+    if shutil.which("tesseract"):
+        models.run_ocr(images[0])  # starts the OCR worker processes
+        results["latency"]["ocr"] = time_calls(models.run_ocr, images, args.repeat)
+    else:
+        print("tesseract not found, skipping the OCR benchmark", file=sys.stderr)
+
+    throughput = {}
+    for task, fn, inputs in (
+        ("summarization", models.run_summarization_batch, texts),
+        ("sentiment", models.run_sentiment_batch, texts),
+        ("image_classification", models.run_image_classification_batch, images * args.repeat),
+    ):
+        fn(inputs, batch_size=args.batch_size)
+        throughput[task] = models.batch_stats[task]["items_per_second"]
+    results["throughput_items_per_second"] = throughput
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    models.close()
+    return results
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(results, baseline, threshold):
+    """Return a list of (metric, baseline, current, change) that got worse by more than threshold."""
+    regressions = []
+    current, previous = flatten(results["metrics"]), flatten(baseline["metrics"])
+    for metric, old in previous.items():
+        new = current.get(metric)
+        if new is None or old == 0 or metric.endswith(".calls"):
+            continue
+        # throughput should go up, everything else (time, memory) should go down
+        change = (old - new) / old if "throughput" in metric else (new - old) / old
+        if change > threshold:
+            regressions.append((metric, old, new, change))
+    return regressions
+
+
+def skip_comparison(reason, required):
+    print(f"REGRESSION CHECK SKIPPED: {reason}", file=sys.stderr)
+    return 2 if required else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AIModels")
+    parser.add_argument("--tiny", action="store_true", help="use tiny stand-in models")
+    parser.add_argument("--offline", action="store_true", help="only use models already in the local HF cache")
+    parser.add_argument("--images", default="data")
+    parser.add_argument("--items", type=int, default=16, help="size of the synthetic text corpus")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.20, help="allowed slowdown, 0.20 = 20%%")
+    parser.add_argument("--require-baseline", action="store_true",
+                        help="exit with 2 when there's no usable baseline instead of 0 (for CI)")
+    args = parser.parse_args()
+
+    if args.offline:
+        # must be set before transformers is imported
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "tiny_models": args.tiny,
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "metrics": run_benchmarks(args),
+    }
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["metrics"], indent=2))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        shutil.copyfile(args.output, args.baseline)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        return skip_comparison(f"no baseline at {args.baseline}, run with --save-baseline to create one",
+                               args.require_baseline)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("tiny_models") != args.tiny:
+        return skip_comparison("the baseline was made with different models", args.require_baseline)
+
+    regressions = compare(report, baseline, args.threshold)
+    for metric, old, new, change in regressions:
+        print(f"REGRESSION {metric}: {old:.4g} -> {new:.4g} ({change:+.0%})")
+    if not regressions:
+        print(f"No regressions over {args.threshold:.0%} compared to {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
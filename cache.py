@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Result cache for the AIModels.run_* methods.
+# The key is built from the model id, the generation settings and a hash of the input
+# (the text itself or the raw bytes of the image file), so the same input always maps
+# to the same entry no matter what the file is called.
+
+_MISSING = object()
+
+
+class ResultCache:
+    """
+    Two tiers:
+      - memory: an LRU dict holding at most max_items results
+      - disk (optional): one small JSON file per result in disk_dir, survives restarts
+    Values must be JSON friendly (the run_* methods return strings, so that's fine).
+    """
+
+    def __init__(self, max_items=256, disk_dir=None):
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model_id, params, payload) -> str:
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        h = hashlib.sha256()
+        h.update(model_id.encode("utf-8"))
+        h.update(b"\0")
+        h.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"\0")
+        h.update(hashlib.sha256(payload).digest())
+        return h.hexdigest()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)  # mark as recently used
+                self.hits += 1
+                return self._memory[key]
+
+        value = self._read_disk(key)
+        if value is not _MISSING:
+            with self._lock:
+                self.hits += 1
+                self.disk_hits += 1
+            self._remember(key, value)
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def contains(self, key) -> bool:
+        with self._lock:
+            if key in self._memory:
+                return True
+        return self.disk_dir is not None and os.path.exists(self._disk_path(key))
+
+    def put(self, key, value):
+        self._remember(key, value)
+        self._write_disk(key, value)
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+        if disk and self.disk_dir:
+            for root, _dirs, files in os.walk(self.disk_dir):
+                for name in files:
+                    if name.endswith(".json"):
+                        os.remove(os.path.join(root, name))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "max_items": self.max_items,
+            }
+
+    # ---- internals ----
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)  # drop the least recently used
+
+    def _disk_path(self, key):
+        # two-letter sub folders so one folder doesn't end up with thousands of files
+        return os.path.join(self.disk_dir, key[:2], key + ".json")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return _MISSING
+        try:
+            with open(self._disk_path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return _MISSING
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)  # atomic, so a crash never leaves half a file
+        except OSError:
+            pass  # the disk tier is best effort, the memory tier still works
@@ -0,0 +1,75 @@
+# splits long text into pieces that fit in a model's token window
+# used by AIModels.run_summarization for documents longer than bart-large-cnn's 1024 tokens
+# and by AIModels.run_document_sentiment (sentences, very long ones cut into windows)
+#
+# Summary chunks are "content defined": a chunk ends after a sentence whose hash happens to
+# end in a few zero bits (or when the chunk is full), not at a fixed token offset. Editing a few
+# words only changes the chunk(s) around the edit, the chunks after it get the same boundaries
+# and the same text as before, so their summaries can be reused from the cache.
+
+import hashlib
+import re
+
+# end of a sentence: . ! or ? (optionally followed by quotes / brackets) and then whitespace,
+# blank lines also end a sentence so headings and list items stay separate
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+|\n\s*\n")
+
+
+def token_limit(tokenizer, default=1024, reserved=2) -> int:
+    """How many content tokens fit in one model input (leaving room for <s> and </s>)."""
+    limit = getattr(tokenizer, "model_max_length", default)
+    # some tokenizers report a huge placeholder number when the limit isn't set
+    if not limit or limit > 100_000:
+        limit = default
+    return limit - reserved
+
+
+def split_sentences(text):
+    """Split text into sentences (simple punctuation rules, good enough for reviews and articles)."""
+    return [part.strip() for part in _SENTENCE_END.split(text) if part and part.strip()]
+
+
+def token_windows(ids, max_tokens):
+    """Cut a list of token ids into consecutive windows of at most max_tokens."""
+    return [ids[start:start + max_tokens] for start in range(0, len(ids), max_tokens)] or [ids]
+
+
+def _is_boundary(sentence, divisor):
+    digest = hashlib.blake2b(sentence.encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % divisor == 0
+
+
+def stable_chunks(tokenizer, text, max_tokens, min_tokens, boundary_divisor=8, ids=None):
+    """
+    Cut text into chunks of whole sentences, at most max_tokens tokens each. A chunk of at least
+    min_tokens ends after any sentence that is a content-defined boundary (about 1 in
+    boundary_divisor sentences), so the boundaries depend on the text around them only.
+    Sentences longer than max_tokens are cut into token windows. Returns [text] if it fits whole.
+    Pass ids (the whole text tokenized without special tokens) to skip the length check tokenization.
+    """
+    if ids is not None and len(ids) <= max_tokens:
+        return [text]
+    sentences = split_sentences(text)
+    encoded = tokenizer(sentences, add_special_tokens=False)["input_ids"] if sentences else []
+    if sum(len(s) for s in encoded) <= max_tokens:
+        return [text]
+
+    chunks, current, current_tokens = [], [], 0
+    for sentence, sentence_ids in zip(sentences, encoded):
+        if len(sentence_ids) <= max_tokens:
+            pieces = [(sentence, len(sentence_ids))]
+        else:
+            pieces = [(tokenizer.decode(w, skip_special_tokens=True).strip(), len(w))
+                      for w in token_windows(sentence_ids, max_tokens)]
+        for piece, n in pieces:
+            if current and current_tokens + n > max_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += n
+            if current_tokens >= min_tokens and _is_boundary(piece, boundary_divisor):
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
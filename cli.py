@@ -0,0 +1,270 @@
+# Headless command line mode: run the models over many files without opening the GUI.
+#
+# examples:
+#   python main.py summarize docs/ -o summaries.jsonl
+#   python main.py sentiment "reviews/*.txt" --format csv -o sentiment.csv
+#   python main.py classify data/ --batch-size 16 --resume
+#   python main.py ocr-summarize scans/ --sentiment
+#
+# Results are written one line per file as soon as each batch finishes. With --resume, files that
+# are listed in the checkpoint file (written after every batch) are skipped, so an interrupted run
+# continues where it stopped.
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from models import AIModels, DEFAULT_BATCH_SIZE, MODEL_SPECS
+from backends import BACKENDS
+from cache import ResultCache
+
+TEXT_EXTENSIONS = (".txt", ".md")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tif", ".tiff")
+
+# which files each command reads
+COMMAND_INPUTS = {
+    "summarize": TEXT_EXTENSIONS,
+    "sentiment": TEXT_EXTENSIONS,
+    "classify": IMAGE_EXTENSIONS,
+    "ocr-summarize": IMAGE_EXTENSIONS,
+}
+
+
+def find_inputs(source, extensions):
+    """A directory (searched recursively) or a glob pattern -> sorted list of matching files."""
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, "**", "*"), recursive=True)
+    else:
+        paths = glob.glob(source, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(extensions))
+
+
+def read_text(path):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+class Checkpoint:
+    """Plain text file with one finished input path per line."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+
+    def load(self):
+        if self.path and os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+        return self.done
+
+    def add(self, paths):
+        if not self.path:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            for p in paths:
+                f.write(p + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(paths)
+
+
+class ResultWriter:
+    FIELDS = ["path", "task", "result", "error"]
+
+    def __init__(self, output, fmt, append):
+        self.fmt = fmt
+        if output == "-":
+            self.file = sys.stdout
+            self._close = False
+        else:
+            new_file = not (append and os.path.exists(output) and os.path.getsize(output) > 0)
+            self.file = open(output, "a" if append else "w", encoding="utf-8", newline="")
+            self._close = True
+            append = not new_file
+        self.csv = None
+        if fmt == "csv":
+            self.csv = csv.DictWriter(self.file, fieldnames=self.FIELDS)
+            if not append:
+                self.csv.writeheader()
+
+    def write(self, records):
+        for record in records:
+            if self.csv is not None:
+                self.csv.writerow(record)
+            else:
+                self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        if self._close:
+            self.file.close()
+
+
+def run_batch(models, command, paths, pool, batch_size):
+    """Returns (results, errors) lists lined up with paths."""
+    if command == "classify":
+        return models.run_image_classification_batch(paths, batch_size=batch_size), [None] * len(paths)
+
+    # (ocr-summarize doesn't come here, it runs through run_ocr_graph)
+    texts = list(pool.map(read_text, paths))
+    errors = [None if text.strip() else "no text found" for text in texts]
+
+    ok = [i for i, error in enumerate(errors) if error is None]
+    inputs = [texts[i] for i in ok]
+    if command == "sentiment":
+        outputs = models.run_sentiment_batch(inputs, batch_size=batch_size)
+    else:
+        outputs = models.run_summarization_batch(inputs, batch_size=batch_size)
+
+    results = [None] * len(paths)
+    for i, out in zip(ok, outputs):
+        results[i] = out
+    return results, errors
+
+
+def process_batch(models, command, paths, pool, batch_size):
+    try:
+        results, errors = run_batch(models, command, paths, pool, batch_size)
+    except Exception as exc:
+        if len(paths) == 1:
+            # recorded like any other failed file, so the run goes on and --resume skips it
+            results, errors = [None], [str(exc)]
+        else:
+            # one bad file shouldn't lose the whole batch: retry the files one by one
+            results, errors = [], []
+            for path in paths:
+                try:
+                    r, e = run_batch(models, command, [path], pool, batch_size)
+                    results.append(r[0])
+                    errors.append(e[0])
+                except Exception as item_exc:
+                    results.append(None)
+                    errors.append(str(item_exc))
+    return [
+        {"path": path, "task": command, "result": result, "error": error}
+        for path, result, error in zip(paths, results, errors)
+    ]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Run the AI models over files without the GUI")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for command in COMMAND_INPUTS:
+        p = sub.add_parser(command, help=f"{command} every matching file")
+        p.add_argument("source", help="directory (searched recursively) or glob pattern, e.g. 'data/*.jpg'")
+        p.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+        p.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+        p.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        p.add_argument("--workers", type=int, default=os.cpu_count() or 4,
+                       help="threads for reading text files")
+        p.add_argument("--checkpoint", help="checkpoint file (default: <output>.checkpoint, none when writing to stdout)")
+        p.add_argument("--resume", action="store_true", help="skip files already in the checkpoint")
+        p.add_argument("--cache-dir", help="keep model results on disk here between runs")
+        p.add_argument("--backend", choices=BACKENDS, default="torch", help="CPU backend for the models")
+        p.add_argument("--processes", type=int, default=0,
+                       help="model worker processes sharing one copy of the weights (Linux/macOS)")
+        if command == "ocr-summarize":
+            p.add_argument("--sentiment", action="store_true",
+                           help="also score the sentiment of every image's text (written as a 'sentiment' record)")
+    return parser
+
+
+def run_ocr_graph(models, paths, writer, checkpoint, sentiment=False):
+    """
+    ocr-summarize through stage_graph: decode, OCR, summarize (and sentiment) run as separate stages,
+    so different images are in different stages at the same time. Results are written as each
+    image finishes. Returns (finished files, failed records).
+    """
+    from stage_graph import ocr_summary_graph
+
+    graph = ocr_summary_graph(models, sentiment=sentiment)
+    start = time.perf_counter()
+    finished = failed = 0
+    for item in graph.run({"path": path} for path in paths):
+        records = [{"path": item["path"], "task": "ocr-summarize", "result": item.get("summary"), "error": item["error"]}]
+        if sentiment:
+            # a failed sentiment only fails its own record, the summary above is still fine
+            records.append({"path": item["path"], "task": "sentiment", "result": item.get("sentiment"),
+                            "error": item["error"] or item.get("sentiment_error")})
+        writer.write(records)
+        checkpoint.add([item["path"]])
+        finished += 1
+        failed += sum(1 for r in records if r["error"])
+        if finished % 10 == 0 or finished == len(paths):
+            rate = finished / (time.perf_counter() - start)
+            print(f"{finished}/{len(paths)} files ({rate:.1f}/s)", file=sys.stderr)
+
+    for name, info in graph.stats().items():
+        print(f"  stage {name:<10} {info['workers']} worker(s)  busy {info['occupancy']:.0%}  "
+              f"max queue {info['max_queue_depth']}", file=sys.stderr)
+    print(f"  bottleneck: {graph.bottleneck()}", file=sys.stderr)
+    return finished, failed
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    checkpoint_path = args.checkpoint or (args.output + ".checkpoint" if args.output != "-" else None)
+    if args.resume and checkpoint_path is None:
+        # stdout has no file name to put the checkpoint next to, so there'd be nothing to resume from
+        parser.error("--resume with output to stdout needs --checkpoint FILE")
+
+    paths = find_inputs(args.source, COMMAND_INPUTS[args.command])
+    checkpoint = Checkpoint(checkpoint_path)
+    if args.resume:
+        done = checkpoint.load()
+        paths = [p for p in paths if p not in done]
+    elif checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)  # fresh run, old progress doesn't apply
+
+    if not paths:
+        print("Nothing to do: no matching files (or all already done).", file=sys.stderr)
+        return 0
+
+    cache = ResultCache(disk_dir=args.cache_dir) if args.cache_dir else None
+    models = AIModels(cache=cache, backends={name: args.backend for name in MODEL_SPECS})
+    if args.processes > 1 and args.command != "ocr-summarize":
+        from worker_pool import SharedModelPool
+        # only the model this command needs is loaded and shared with the workers
+        needed = {"summarize": "summarizer", "sentiment": "sentiment_analyzer", "classify": "image_classifier"}
+        threads = max(1, (os.cpu_count() or 1) // args.processes)
+        models = SharedModelPool(workers=args.processes, threads_per_worker=threads, models=models,
+                                 preload=(needed[args.command],))
+    writer = ResultWriter(args.output, args.format, append=args.resume)
+
+    start = time.perf_counter()
+    finished = failed = 0
+    try:
+        if args.command == "ocr-summarize":
+            # images move through decode / OCR / summarize stages independently instead of in batches
+            finished, failed = run_ocr_graph(models, paths, writer, checkpoint, sentiment=args.sentiment)
+        else:
+            with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                for i in range(0, len(paths), args.batch_size):
+                    batch = paths[i:i + args.batch_size]
+                    records = process_batch(models, args.command, batch, pool, args.batch_size)
+                    writer.write(records)
+                    checkpoint.add(batch)
+                    finished += len(batch)
+                    failed += sum(1 for r in records if r["error"])
+                    rate = finished / (time.perf_counter() - start)
+                    print(f"{finished}/{len(paths)} files ({rate:.1f}/s)", file=sys.stderr)
+    except KeyboardInterrupt:
+        print(f"Interrupted after {finished} files, run again with --resume to continue.", file=sys.stderr)
+        return 130
+    finally:
+        writer.close()
+        models.close()
+
+    print(f"Done: {finished} files, {failed} errors, {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import base64
+import json
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Thin client for server.py. It has the same run_* methods the GUI uses on AIModels,
+# so AIApp can talk to a shared model host instead of loading the models itself:
+#   python main.py --server http://modelhost:8765
+
+
+class RemoteModels:
+    def __init__(self, base_url, timeout=300):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cache = None   # the server has its own cache
+        self.load_stats = {}
+
+    def _post(self, endpoint, payload):
+        request = urllib.request.Request(
+            f"{self.base_url}/{endpoint}",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())["result"]
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read())["error"]
+            except (ValueError, KeyError):
+                message = e.reason
+            if e.code == 503:
+                message = f"server is busy, try again shortly ({message})"
+            raise RuntimeError(message) from None
+
+    @staticmethod
+    def _image(path):
+        with open(path, "rb") as f:
+            return {"image": base64.b64encode(f.read()).decode("ascii")}
+
+    def health(self):
+        with urllib.request.urlopen(f"{self.base_url}/health", timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    # on_partial / cancel_event are accepted so the GUI can call these like AIModels,
+    # but the server answers with the finished result only
+    def run_summarization(self, text, on_partial=None, cancel_event=None):
+        return self._post("summarize", {"text": text})
+
+    def run_summarization_stream(self, text, on_token, cancel_event=None, on_partial=None):
+        summary = self.run_summarization(text)
+        on_token(summary)  # no token streaming over HTTP yet, the whole summary arrives at once
+        return summary
+
+    def run_sentiment(self, text):
+        return self._post("sentiment", {"text": text})
+
+    def run_multi(self, text, tasks=("summarization", "sentiment"), on_partial=None, cancel_event=None):
+        # one request per task, sent at the same time
+        calls = {"summarization": self.run_summarization, "sentiment": self.run_sentiment}
+        tasks = list(dict.fromkeys(tasks))
+        with ThreadPoolExecutor(max_workers=len(tasks) or 1) as pool:
+            return dict(zip(tasks, pool.map(lambda task: calls[task](text), tasks)))
+
+    def run_document_sentiment(self, text, batch_size=None):
+        raise RuntimeError("per-sentence sentiment only works with local models, not on the server")
+
+    def run_image_classification(self, image_path, top_k=None):
+        return self._post("classify", self._image(image_path))  # the server always lists its default top 5
+
+    def run_zero_shot_classification(self, image_path, labels, top_k=5):
+        raise RuntimeError("custom labels (zero-shot) only work with local models, not on the server")
+
+    def decode_for_ocr(self, image_path):
+        return None  # the server decodes the image itself
+
+    def has_cached_ocr(self, image_path):
+        return False  # the server checks its own cache
+
+    def run_ocr(self, image_path, decoded=None):
+        try:
+            return self._post("ocr", self._image(image_path))
+        except Exception as e:
+            return f"OCR failed: {str(e)}"
+
+    def run_ocr_summarization(self, image_path, on_partial=None, cancel_event=None):
+        text = self.run_ocr(image_path)
+        if text.startswith("OCR failed"):
+            raise RuntimeError(text)
+        if not text.strip():
+            raise RuntimeError("OCR failed: no text found in this image")
+        return self.run_summarization(text)
+
+    # the queue panel uses the batch methods, the server batches concurrent requests itself
+    # (server.MicroBatcher), so these just send the items one by one
+    def run_summarization_batch(self, texts, batch_size=None):
+        return [self.run_summarization(text) for text in texts]
+
+    def run_sentiment_batch(self, texts, batch_size=None):
+        return [self.run_sentiment(text) for text in texts]
+
+    def run_image_classification_batch(self, image_paths, batch_size=None):
+        return [self.run_image_classification(path) for path in image_paths]
+
+    def run_ocr_batch(self, image_paths):
+        return [self.run_ocr(path) for path in image_paths]
+
+    # the models live on the server, so there is nothing to warm up here
+    model_states = {}
+
+    def warmup(self, names=None, background=True):
+        return None
+
+    def memory_usage(self):
+        return {}
+
+    def close(self):
+        pass
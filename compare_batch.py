@@ -0,0 +1,56 @@
+# compares the one-at-a-time loop with the batched methods on the images in data/
+# usage: python compare_batch.py [--batch-sizes 1 2 4 8] [--repeat 4]
+
+import argparse
+import glob
+import os
+import time
+
+from models import AIModels
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.JPG", "*.png")
+
+
+def data_images(folder="data"):
+    paths = set()
+    for pattern in IMAGE_PATTERNS:
+        paths.update(glob.glob(os.path.join(folder, pattern)))
+    return sorted(paths)
+
+
+def time_loop(models, image_paths):
+    start = time.perf_counter()
+    results = [models.run_image_classification(path) for path in image_paths]
+    seconds = time.perf_counter() - start
+    return results, len(image_paths) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-item loop vs batched image classification")
+    parser.add_argument("--folder", default="data")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=4, help="repeat the image list to get a bigger workload")
+    args = parser.parse_args()
+
+    image_paths = data_images(args.folder) * args.repeat
+    if not image_paths:
+        print(f"No images found in {args.folder}/")
+        return
+
+    models = AIModels(cache=False)  # no result cache, otherwise the second run would just be cache hits
+    models.run_image_classification(image_paths[0])  # load + warm the model so it isn't timed
+
+    loop_results, loop_rate = time_loop(models, image_paths)
+
+    print(f"{len(image_paths)} images from {args.folder}/")
+    print(f"{'mode':<16}{'images/s':>10}{'speedup':>10}{'same output':>14}")
+    print(f"{'loop':<16}{loop_rate:>10.2f}{1.0:>10.2f}{'-':>14}")
+    for batch_size in args.batch_sizes:
+        batch_results = models.run_image_classification_batch(image_paths, batch_size=batch_size)
+        rate = models.batch_stats["image_classification"]["items_per_second"]
+        same = "yes" if batch_results == loop_results else "no"
+        print(f"{'batch=' + str(batch_size):<16}{rate:>10.2f}{rate / loop_rate:>10.2f}{same:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+# Runs model calls on background threads so the Tkinter window never freezes.
+# Threads (not processes) are used on purpose: the pipelines live inside AIModels in this
+# process, and torch releases the GIL during the forward pass so the GUI stays smooth.
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when the user pressed Cancel."""
+
+
+class Job:
+    """
+    One submitted piece of work. The worker function gets the Job as its first argument
+    so it can check job.cancelled and send partial output with job.report().
+    The GUI reads updates with job.drain_updates() from an after() callback.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, key, description=""):
+        self.id = next(Job._ids)
+        self.key = key
+        self.description = description
+        self.future = None
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._updates = queue.Queue()
+
+    # ---- used by the worker thread ----
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def cancel_event(self) -> threading.Event:
+        return self._cancel_event
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def report(self, update):
+        """Push a partial result / progress message for the GUI to pick up."""
+        self._updates.put(update)
+
+    # ---- used by the GUI thread ----
+    def cancel(self):
+        self._cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()  # only works if it hasn't started yet, otherwise the flag is used
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def drain_updates(self):
+        items = []
+        while True:
+            try:
+                items.append(self._updates.get_nowait())
+            except queue.Empty:
+                return items
+
+    def outcome(self):
+        """Return ("ok", result), ("cancelled", None) or ("error", exception). Call once done()."""
+        if self.cancelled:
+            return "cancelled", None
+        try:
+            return "ok", self.future.result()
+        except (CancelledError, JobCancelled):
+            return "cancelled", None
+        except Exception as e:
+            return "error", e
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at or time.perf_counter()
+        return end - (self.started_at or self.submitted_at)
+
+
+class InferenceExecutor:
+    """
+    Thread pool with one in-flight job per key. Submitting a key that is already
+    running returns the existing Job instead of starting a duplicate run
+    (this is what fixes the double-click problem on the Submit button).
+    """
+
+    def __init__(self, max_workers=2):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._jobs = {}  # key -> Job, only while it is running
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, description="", **kwargs) -> Job:
+        with self._lock:
+            existing = self._jobs.get(key)
+            if existing is not None and not existing.done():
+                return existing
+
+            job = Job(key, description)
+
+            def run():
+                job.started_at = time.perf_counter()
+                try:
+                    job.check_cancelled()
+                    return fn(job, *args, **kwargs)
+                finally:
+                    job.finished_at = time.perf_counter()
+                    with self._lock:
+                        if self._jobs.get(key) is job:
+                            del self._jobs[key]
+
+            self._jobs[key] = job
+            job.future = self._pool.submit(run)
+            return job
+
+    def is_running(self, key) -> bool:
+        with self._lock:
+            job = self._jobs.get(key)
+            return job is not None and not job.done()
+
+    def active_jobs(self):
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.done()]
+
+    def cancel(self, key):
+        with self._lock:
+            job = self._jobs.get(key)
+        if job is not None:
+            job.cancel()
+
+    def cancel_all(self):
+        for job in self.active_jobs():
+            job.cancel()
+
+    def shutdown(self, wait=False):
+        self.cancel_all()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
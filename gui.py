@@ -1,23 +1,49 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext
 from tkinter import filedialog, messagebox
-from models import AIModels
+from models import AIModels, format_document_sentiment
+from startup import PROFILE
+from client import RemoteModels
+from cache import ResultCache
+from executor import InferenceExecutor
+from instrumentation import REGISTRY
 import functools
-from PIL import Image, ImageTk
-import pytesseract 
+import time
+from PIL import ImageTk
+from concurrent.futures import ThreadPoolExecutor
+from image_loader import SHARED_LOADER
+from assets import AssetCache
+from job_queue import DocumentQueue
+from zero_shot import parse_labels
+from phash_index import PerceptualIndex
+
+# model results are kept here so the same text/image isn't run twice, even after a restart
+RESULT_CACHE_DIR = ".cache/results"
+# hashes of classified images, so resized or re-saved copies reuse the result
+PHASH_INDEX_DIR = ".cache/phash"
+
+# GUI model names -> AIModels.run_multi task names
+MULTI_TASKS = {"Summarization": "summarization", "Sentiment Analysis": "sentiment"}
+
+# texts longer than this (about 512 tokens) get per-sentence sentiment instead of being cut off
+LONG_SENTIMENT_CHARS = 2000
+
+# how often (ms) the GUI checks running jobs for results
+POLL_INTERVAL_MS = 50
 
 #Decorator
 
+# counts GUI callbacks in the metrics registry, the model calls themselves are timed in models.py
 def log_model_run(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        print(f"Running model: {func.__name__}")  # Logging model run
+        REGISTRY.inc("gui_actions_total", action=func.__name__)
         return func(*args, **kwargs)
     return wrapper
 
 # This is our main GUI class. It makes the window and connects everything.
 class AIApp(tk.Tk):
-    def __init__(self):
+    def __init__(self, server_url=None, warmup=True, memory_budget_mb=None, idle_unload_seconds=None):
         # Call the Tkinter parent class (inheritance!)
         super().__init__()
 
@@ -26,17 +52,35 @@ class AIApp(tk.Tk):
         self.geometry("800x600")
         self.configure(bg="#f4f4f4")
 
-        # Load Hugging Face models (from models.py)
-        self.models = AIModels()
+        # Hugging Face models (from models.py) are loaded lazily the first time they are used,
+        # so the tabs show up straight away instead of waiting for ~2 GB of weights.
+        # With a server_url the models run on a shared server.py host instead (client.py)
+        if server_url:
+            self.models = RemoteModels(server_url)
+        else:
+            # on small machines a memory budget / idle timeout unloads models that aren't being used
+            self.models = AIModels(cache=ResultCache(max_items=512, disk_dir=RESULT_CACHE_DIR),
+                                   memory_budget_mb=memory_budget_mb, idle_unload_seconds=idle_unload_seconds,
+                                   phash_index=PerceptualIndex(disk_dir=PHASH_INDEX_DIR))
+
+        # model calls run on this worker pool, the GUI only polls for results with after()
+        self.executor = InferenceExecutor(max_workers=2)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Create tabs like in the sample GUI
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(fill="both", expand=True)
 
-        # Making 3 tabs
+        # Making 4 tabs
         self.create_run_tab()
         self.create_model_info_tab()
         self.create_explanation_tab()
+        self.create_stats_tab()
+
+        # once the window is on screen the models are loaded and warmed up on a background thread,
+        # so the first Submit doesn't pay for loading + first-call setup (see models.AIModels.warmup)
+        self.warmup = warmup
+        self.after(0, self.on_window_shown)
 
     # ======================
     # TAB 1: Run Models
@@ -48,13 +92,19 @@ class AIApp(tk.Tk):
 
         #Let's add an image as a background for the GUI as shown in class
          # ---------- Background Image ----------
-        bg_image_path = "data/syd_bg.jpg" # since the image is saved in the data folder herewithin
-        bg_img = Image.open(bg_image_path)
-        bg_img = bg_img.resize((800, 600))  # setting the size same as window size
-        self.bg_photo = ImageTk.PhotoImage(bg_img)
+        # pre-rendered sizes are cached on disk (assets.py), so normally this is just loading a small file.
+        # on the very first launch the tab shows plain colour and the picture is rendered in the background
+        self.bg_image_path = "data/syd_bg.jpg" # since the image is saved in the data folder herewithin
+        self.assets = AssetCache()
+        # own thread for background renders, so they don't take an inference worker or show up as jobs
+        self.bg_renderer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="background")
+        self.bg_size = (800, 600)  # setting the size same as window size
+        self.bg_resize_after = None
 
-        bg_label = tk.Label(self.run_tab, image=self.bg_photo)
-        bg_label.place(x=0, y=0, relwidth=1, relheight=1)
+        self.bg_label = tk.Label(self.run_tab, bg="light blue")
+        self.bg_label.place(x=0, y=0, relwidth=1, relheight=1)
+        self.show_background(self.bg_size)
+        self.run_tab.bind("<Configure>", self.on_run_tab_resize)
 
 
 
@@ -67,7 +117,7 @@ class AIApp(tk.Tk):
             self.run_tab,
             textvariable=self.input_type_var,
             state="readonly",
-            values=["Text", "Image"]
+            values=["Text", "Image", "Queue"]
         )
         self.input_type_dropdown.pack(pady=5)
 
@@ -105,161 +155,585 @@ class AIApp(tk.Tk):
         )
         self.refresh_button.pack(side="left", padx=5, pady=0)
 
+        # Busy indicator + Cancel button, shown while a model is running
+        self.status_frame = tk.Frame(self.run_tab)
+        self.status_frame.pack(pady=2)
+        self.status_label = tk.Label(self.status_frame, text="Ready", font=("Arial", 10))
+        self.status_label.pack(side="left", padx=5)
+        self.progress = ttk.Progressbar(self.status_frame, mode="indeterminate", length=150)
+        self.progress.pack(side="left", padx=5)
+        self.cancel_button = tk.Button(
+            self.status_frame, text="Cancel", font=("Arial", 10, "bold"),
+            bg="white", fg="red", command=self.cancel_jobs, state="disabled"
+        )
+        self.cancel_button.pack(side="left", padx=5)
+
+        # one line with every model's state: loading -> warming up -> ready
+        self.model_state_label = tk.Label(self.run_tab, text="", font=("Arial", 9))
+        self.model_state_label.pack()
+
         # Frame for input/output widgets
         self.io_frame = tk.Frame(self.run_tab, bg="light blue") # adding light blue to match closely with the background because..
         #tkinter doesn't support transparency and this block was standing out, hence light blu 
         self.io_frame.pack(fill="both", expand=True, pady=10)
+        self.panels = {}  # input type -> its frame, see get_panel()
+        self.selection_error = tk.Label(self.io_frame, text="", fg="red")
+
+    def on_window_shown(self):
+        PROFILE.mark("window shown")
+        self.warmup_thread = self.models.warmup() if self.warmup else None
+        self.profile_saved = False
+        self.poll_model_states()
+
+    def poll_model_states(self):
+        # keeps running after warmup too, models can be unloaded (memory budget) and loaded again
+        states = self.models.model_states
+        names = {"sentiment_analyzer": "Sentiment", "image_classifier": "Classifier", "summarizer": "Summarizer",
+                 "zero_shot": "Zero-shot"}
+        self.model_state_label.config(
+            text="   ".join(f"{names.get(name, name)}: {state}" for name, state in states.items() if name in names)
+        )
+        warming = self.warmup_thread is not None and self.warmup_thread.is_alive()
+        if not warming and not self.profile_saved:
+            PROFILE.mark("warmup finished")
+            PROFILE.save()
+            self.profile_saved = True
+        self.after(250 if warming else 1000, self.poll_model_states)
+
+    def set_background(self, img):
+        self.bg_photo = ImageTk.PhotoImage(img)
+        self.bg_label.config(image=self.bg_photo)
+
+    def show_background(self, size):
+        # show whatever is ready right away, then render the exact size off the main thread
+        img, exact = self.assets.quick(self.bg_image_path, size)
+        if img is not None:
+            self.set_background(img)
+        if not exact:
+            future = self.bg_renderer.submit(self.assets.render, self.bg_image_path, size)
+            self.after(POLL_INTERVAL_MS, self.poll_background, future, size)
+
+    def poll_background(self, future, size):
+        if not future.done():
+            self.after(POLL_INTERVAL_MS, self.poll_background, future, size)
+            return
+        # a failed render just leaves the stretched / plain background
+        if not future.cancelled() and future.exception() is None and size == self.bg_size:  # ignore renders for sizes the window already left
+            self.set_background(future.result())
+
+    def on_run_tab_resize(self, event):
+        size = (event.width, event.height)
+        if event.widget is not self.run_tab or size == self.bg_size or min(size) < 2:
+            return
+        self.bg_size = size
+        # stretch what we have immediately, render properly once the user stops dragging
+        img, exact = self.assets.quick(self.bg_image_path, size)
+        if img is not None:
+            self.set_background(img)
+        if self.bg_resize_after is not None:
+            self.after_cancel(self.bg_resize_after)
+        self.bg_resize_after = None if exact else self.after(200, self.show_background, size)
 
     # ======================
     # CONFIRM SELECTION (between text and image)
     # ======================
 
     def confirm_selection(self):
+        # the input/output panels are built the first time they are needed and then only shown
+        # or hidden, so switching back and forth keeps the text, the output and running jobs
+        self.hide_panels()
 
-        #  Clear previous input/output but keep dropdowns and submit button
-        for widget in self.io_frame.winfo_children():
-            widget.destroy()
-        
         input_type = self.input_type_var.get()
         model_type = self.model_var.get()
 
 
         # Check invalid combinations
         if input_type == "Text" and model_type == "Image Classification":
-            tk.Label(self.io_frame, text="Invalid selection: Text + Image Classification", fg="red").pack()
+            self.selection_error.config(text="Invalid selection: Text + Image Classification")
+            self.selection_error.pack()
             return
         if input_type == "Image" and model_type == "Sentiment Analysis":
-            tk.Label(self.io_frame, text="Invalid selection: Image + " + model_type, fg="red").pack()
+            self.selection_error.config(text="Invalid selection: Image + " + model_type)
+            self.selection_error.pack()
             return
 
+        self.current_model = model_type
+        panel = self.get_panel(input_type)
+        panel.pack(fill="both", expand=True)
+
         # Text + Summarization or Sentiment
         if input_type == "Text":
-            tk.Label(self.io_frame, text="Enter your text:", font=("Arial", 12)).pack(pady=5)
-            self.text_input = tk.Text(self.io_frame, height=6, width=70)
-            self.text_input.pack(pady=5)
+            self.output_text = self.text_output
+            for model, var in self.task_vars.items():
+                var.set(model == model_type)
+            # summaries can appear word by word while they are generated (Cancel stops and keeps the text)
+            if model_type == "Summarization":
+                self.stream_check.pack(before=self.text_submit)
+            else:
+                self.stream_check.pack_forget()
+            # sentiment per sentence + a document score (always used for long texts, see run_text_model)
+            if model_type == "Sentiment Analysis":
+                self.sentence_check.pack(before=self.text_submit)
+            else:
+                self.sentence_check.pack_forget()
+            self.write_output(self.output_text, "")
+
+        # Image + Image Classification or Summarization
+        elif input_type == "Image":
+            self.output_text = self.image_output
+            self.write_output(self.output_text, "")
+
+        # Queue: new items get this model (if it fits the input), it can be changed per item
+        elif input_type == "Queue":
+            self.queue_model_var.set(model_type)
+
+    def get_panel(self, input_type):
+        if input_type not in self.panels:
+            builders = {"Text": self.build_text_panel, "Image": self.build_image_panel,
+                        "Queue": self.build_queue_panel}
+            self.panels[input_type] = builders[input_type]()
+        return self.panels[input_type]
+
+    def hide_panels(self):
+        self.selection_error.pack_forget()
+        for panel in self.panels.values():
+            panel.pack_forget()
+
+    def build_text_panel(self):
+        panel = tk.Frame(self.io_frame, bg="light blue")
+        tk.Label(panel, text="Enter your text:", font=("Arial", 12)).pack(pady=5)
+        self.text_input = tk.Text(panel, height=6, width=70)
+        self.text_input.pack(pady=5)
+
+        # tick both to get a summary and the sentiment from one Submit (AIModels.run_multi)
+        task_frame = tk.Frame(panel)
+        task_frame.pack()
+        tk.Label(task_frame, text="Tasks:").pack(side="left")
+        self.task_vars = {}
+        for model in ("Summarization", "Sentiment Analysis"):
+            self.task_vars[model] = tk.BooleanVar(value=False)
+            tk.Checkbutton(task_frame, text=model, variable=self.task_vars[model]).pack(side="left")
+
+        self.stream_var = tk.BooleanVar(value=True)
+        self.stream_check = tk.Checkbutton(panel, text="Stream the summary as it is written",
+                                           variable=self.stream_var)
+
+        self.sentence_var = tk.BooleanVar(value=False)
+        self.sentence_check = tk.Checkbutton(panel, text="Score every sentence (long documents)",
+                                             variable=self.sentence_var)
+
+        self.text_submit = tk.Button(
+            panel, text="Submit", font=("Arial", 12, "bold"),
+            bg="white", fg="green",
+            command=lambda: self.run_text_model(self.current_model)
+        )
+        self.text_submit.pack(pady=10)
 
-            tk.Button(
-                self.io_frame, text="Submit", font=("Arial", 12, "bold"),
+        tk.Label(panel, text="Model Output:", font=("Arial", 12, "bold")).pack(pady=5)
+        self.text_output = tk.Text(panel, height=10, width=70, state="disabled")
+        self.text_output.pack(pady=5)
+        return panel
+
+    #using normal button, wanted to use modern web file upload like but .. 
+    # Tkinter doesn't have builtu-in widget for it
+    def build_image_panel(self):
+        panel = tk.Frame(self.io_frame, bg="light blue")
+        tk.Button(
+            panel, text="Upload Image", font=("Arial", 12, "bold"),
+            bg="white", fg="blue", command=self.upload_image
+        ).pack(pady=5)
+
+        # small preview of the uploaded image, the same decode is reused by the models
+        self.preview_label = tk.Label(panel, bg="light blue")
+        self.preview_label.pack(pady=2)
+
+        # own labels switch Image Classification to zero-shot CLIP (zero_shot.py) instead of the 1000 ImageNet classes
+        label_frame = tk.Frame(panel)
+        label_frame.pack(pady=2)
+        tk.Label(label_frame, text="Custom labels (optional, comma separated):").pack(side="left")
+        self.labels_entry = tk.Entry(label_frame, width=30)
+        self.labels_entry.pack(side="left", padx=2)
+        tk.Label(label_frame, text="Top:").pack(side="left")
+        self.top_k_var = tk.IntVar(value=5)
+        tk.Spinbox(label_frame, from_=1, to=20, width=3, textvariable=self.top_k_var).pack(side="left")
+
+        tk.Button(
+            panel, text="Submit", font=("Arial", 12, "bold"),
                 bg="white", fg="green",
-                command=lambda: self.run_text_model(model_type)
-            ).pack(pady=10)
+            command=lambda: self.run_image_model(self.current_model)
+        ).pack(pady=10)
 
-            tk.Label(self.io_frame, text="Model Output:", font=("Arial", 12, "bold")).pack(pady=5)
-            self.output_text = tk.Text(self.io_frame, height=10, width=70, state="disabled")
-            self.output_text.pack(pady=5)
-            return
+        tk.Label(panel, text="Model Output:", font=("Arial", 12, "bold")).pack(pady=5)
+        self.image_output = tk.Text(panel, height=6, width=50,bg="black", bd=0, highlightthickness=0)
+        self.image_output.pack(pady=5)
+        return panel
 
-    # Image + Image Classification or Summarization
+    # ======================
+    # QUEUE PANEL (many files / texts at once)
+    # ======================
+    # One ttk.Treeview row per item instead of a set of widgets per item: Tk only draws the rows
+    # that are visible, so thousands of entries scroll fine. job_queue.DocumentQueue runs the items
+    # in batches on its own threads, and poll_queue() only updates the rows that changed.
+
+    def build_queue_panel(self):
+        panel = tk.Frame(self.io_frame, bg="light blue")
+
+        toolbar = tk.Frame(panel, bg="light blue")
+        toolbar.pack(fill="x", padx=10, pady=2)
+        tk.Button(toolbar, text="Add Files", command=self.queue_add_files).pack(side="left", padx=2)
+        tk.Button(toolbar, text="Add Texts", command=self.queue_add_texts).pack(side="left", padx=2)
+        tk.Button(toolbar, text="Start", fg="green", command=self.queue_start).pack(side="left", padx=2)
+        tk.Button(toolbar, text="Stop", fg="red", command=self.queue_stop).pack(side="left", padx=2)
+        tk.Button(toolbar, text="Retry Failed", command=self.queue_retry).pack(side="left", padx=2)
+        tk.Button(toolbar, text="Clear Finished", command=self.queue_clear).pack(side="left", padx=2)
+        tk.Button(toolbar, text="Export", command=self.queue_export).pack(side="left", padx=2)
+
+        model_bar = tk.Frame(panel, bg="light blue")
+        model_bar.pack(fill="x", padx=10, pady=2)
+        tk.Label(model_bar, text="Model:", bg="light blue").pack(side="left")
+        self.queue_model_var = tk.StringVar(value="Summarization")
+        ttk.Combobox(
+            model_bar, textvariable=self.queue_model_var, state="readonly", width=20,
+            values=["Summarization", "Sentiment Analysis", "Image Classification"]
+        ).pack(side="left", padx=2)
+        tk.Button(model_bar, text="Apply to Selected",
+                  command=lambda: self.queue_apply_model(self.queue_tree.selection())).pack(side="left", padx=2)
+        tk.Button(model_bar, text="Apply to All",
+                  command=lambda: self.queue_apply_model(self.queue_tree.get_children())).pack(side="left", padx=2)
+        self.queue_summary = tk.Label(model_bar, text="", bg="light blue")
+        self.queue_summary.pack(side="right")
+
+        list_frame = tk.Frame(panel)
+        list_frame.pack(fill="both", expand=True, padx=10, pady=2)
+        columns = ("name", "model", "status", "seconds", "result")
+        self.queue_tree = ttk.Treeview(list_frame, columns=columns, show="headings", height=8)
+        for column, heading, width in zip(columns, ("Input", "Model", "Status", "Latency", "Result"),
+                                          (180, 130, 70, 70, 300)):
+            self.queue_tree.heading(column, text=heading)
+            self.queue_tree.column(column, width=width, stretch=column in ("name", "result"))
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.queue_tree.yview)
+        self.queue_tree.configure(yscrollcommand=scrollbar.set)
+        self.queue_tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.queue_tree.bind("<<TreeviewSelect>>", self.queue_show_selected)
+
+        # full result of the selected row
+        self.queue_detail = tk.Text(panel, height=4, width=90, state="disabled")
+        self.queue_detail.pack(fill="x", padx=10, pady=2)
+
+        self.doc_queue = DocumentQueue(self.models)
+        self.queue_polling = False
+        return panel
+
+    def queue_row(self, item):
+        seconds = f"{item.seconds:.2f}s" if item.seconds is not None else ""
+        result = item.error or item.result
+        return (item.name, item.model, item.status, seconds, " ".join(result.split())[:120])
+
+    def queue_insert(self, items):
+        # rows are inserted in slices so adding thousands of files doesn't freeze the window
+        for item in items[:500]:
+            self.queue_tree.insert("", tk.END, iid=str(item.id), values=self.queue_row(item))
+        if len(items) > 500:
+            self.after(1, self.queue_insert, items[500:])
+        self.queue_update_summary()
 
-    #using normal button, wanted to use modern web file upload like but .. 
-    # Tkinter doesn't have builtu-in widget for it
+    @log_model_run
+    def queue_add_files(self):
+        paths = filedialog.askopenfilenames(
+            title="Add files to the queue",
+            filetypes=[("Text and image files", "*.txt *.md *.jpg *.jpeg *.png *.bmp *.gif *.tif *.tiff")]
+        )
+        items = [self.doc_queue.add_file(path, self.queue_model_var.get()) for path in paths]
+        self.queue_insert([item for item in items if item is not None])
 
-        elif input_type == "Image":
-            tk.Button(
-                self.io_frame, text="Upload Image", font=("Arial", 12, "bold"),
-                bg="white", fg="blue", command=self.upload_image
-            ).pack(pady=5)
-
-            tk.Button(
-                self.io_frame, text="Submit", font=("Arial", 12, "bold"),
-                    bg="white", fg="green",
-                command=lambda: self.run_image_model(model_type)
-            ).pack(pady=10)
-
-            tk.Label(self.io_frame, text="Model Output:", font=("Arial", 12, "bold")).pack(pady=5)
-            self.output_text = tk.Text(self.io_frame, height=6, width=50,bg="black", bd=0, highlightthickness=0)
-            self.output_text.pack(pady=5)
+    @log_model_run
+    def queue_add_texts(self):
+        # small window to paste many texts, separated by empty lines
+        dialog = tk.Toplevel(self)
+        dialog.title("Add texts")
+        tk.Label(dialog, text="Paste texts, one per paragraph (leave an empty line between texts):").pack(pady=5)
+        box = scrolledtext.ScrolledText(dialog, width=80, height=15)
+        box.pack(padx=10, pady=5)
+
+        def add():
+            paragraphs = [p.strip() for p in box.get("1.0", tk.END).split("\n\n") if p.strip()]
+            self.queue_insert([self.doc_queue.add_text(p, self.queue_model_var.get()) for p in paragraphs])
+            dialog.destroy()
+
+        tk.Button(dialog, text="Add", fg="green", command=add).pack(pady=5)
+
+    def queue_apply_model(self, iids):
+        model = self.queue_model_var.get()
+        changed = self.doc_queue.set_model([int(iid) for iid in iids], model)
+        skipped = len(iids) - len(changed)
+        self.queue_refresh_rows()
+        if skipped:
+            self.queue_summary.config(text=f"{model} set on {len(changed)}, skipped {skipped} (not pending or wrong input)")
+
+    @log_model_run
+    def queue_start(self):
+        self.doc_queue.start()
+        if not self.queue_polling:
+            self.queue_polling = True
+            self.after(POLL_INTERVAL_MS, self.poll_queue)
+
+    def queue_stop(self):
+        self.doc_queue.stop()
+        self.queue_summary.config(text="Stopping after the running batches...")
+
+    def queue_retry(self):
+        self.doc_queue.retry([int(iid) for iid in self.queue_tree.get_children()])
+        self.queue_refresh_rows()
+
+    def queue_clear(self):
+        removed = self.doc_queue.remove_finished()
+        if removed:
+            self.queue_tree.delete(*[str(item_id) for item_id in removed])
+        self.queue_update_summary()
+
+    def queue_export(self):
+        path = filedialog.asksaveasfilename(title="Export queue results", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON lines", "*.jsonl")])
+        if not path:
+            return
+        count = self.doc_queue.export(path)
+        messagebox.showinfo("Export queue results", f"Saved {count} results to {path}")
+
+    def queue_refresh_rows(self):
+        for item in self.doc_queue.drain_changes():
+            if self.queue_tree.exists(str(item.id)):
+                self.queue_tree.item(str(item.id), values=self.queue_row(item))
+        self.queue_update_summary()
+
+    def queue_update_summary(self):
+        counts = self.doc_queue.counts()
+        self.queue_summary.config(text=", ".join(f"{n} {status}" for status, n in counts.items()))
+
+    def poll_queue(self):
+        self.queue_refresh_rows()
+        if self.queue_tree.selection():
+            self.queue_show_selected()
+        if self.doc_queue.running:
+            self.after(POLL_INTERVAL_MS * 2, self.poll_queue)
+        else:
+            self.queue_refresh_rows()  # the last batch may have finished right before the check
+            self.queue_polling = False
+
+    def queue_show_selected(self, event=None):
+        selection = self.queue_tree.selection()
+        item = self.doc_queue.items.get(int(selection[0])) if selection else None
+        if item is None:
+            self.write_output(self.queue_detail, "")
             return
+        text = f"{item.path or item.text[:300]}\n{item.model}: {item.status}\n{item.error or item.result}"
+        self.write_output(self.queue_detail, text)
 
+    # ======================
+    # BACKGROUND JOBS
+    # ======================
+    # Model calls used to run right inside the button callback and froze the window.
+    # Now the button submits a job to self.executor and we poll it with after().
+    # Clicking Submit twice on the same input just keeps the one job that is already running.
 
+    def write_output(self, widget, text, append=False):
+        # the io_frame may have been rebuilt while the job was running
+        if not widget.winfo_exists():
+            return
+        widget.config(state="normal")
+        if not append:
+            widget.delete("1.0", tk.END)
+        widget.insert(tk.END, text)
+        widget.config(state="disabled")
+
+    def start_job(self, key, fn, *args, output, on_update=None, description=""):
+        if self.executor.is_running(key):
+            self.status_label.config(text="Already running for this input...")
+            return None
+        job = self.executor.submit(key, fn, *args, description=description)
+        self.write_output(output, "Running... (the first run also loads the model)")
+        self.update_busy_state()
+        self.after(POLL_INTERVAL_MS, self.poll_job, job, output, on_update)
+        return job
+
+    def poll_job(self, job, output, on_update=None):
+        updates = job.drain_updates()
+        if updates and on_update is not None:
+            on_update(output, updates)
+
+        if not job.done():
+            self.after(POLL_INTERVAL_MS, self.poll_job, job, output, on_update)
+            return
 
-        
-## this shows confirm button and is functional, but when double clicked it shows multiple times, 
-## required update here would be: to fix the button (right now, it's transparent and need to be clicked see the text)
-## also, should click only once and then perform action or refresh. 
+        status, value = job.outcome()
+        if status == "ok":
+            self.write_output(output, value)
+        elif status == "cancelled":
+            self.write_output(output, "\n[Cancelled]", append=on_update is not None)
+        else:
+            self.write_output(output, f"Error: {str(value)}")
+        self.update_busy_state(f"{job.description} finished in {job.elapsed:.2f}s")
+
+    def update_busy_state(self, idle_text="Ready"):
+        active = self.executor.active_jobs()
+        if active:
+            self.status_label.config(text=f"Running {len(active)} job(s)...")
+            self.progress.start(10)
+            self.cancel_button.config(state="normal")
+        else:
+            self.status_label.config(text=idle_text)
+            self.progress.stop()
+            self.cancel_button.config(state="disabled")
+
+    def cancel_jobs(self):
+        self.executor.cancel_all()
+        self.status_label.config(text="Cancelling...")
+
+    def on_close(self):
+        if "Queue" in self.panels:
+            self.doc_queue.shutdown()
+        self.executor.shutdown(wait=False)
+        self.bg_renderer.shutdown(wait=False, cancel_futures=True)
+        self.models.close()
+        self.destroy()
+
+    # these run on the worker threads, so they must not touch any widgets
+    def report_partial_summary(self, job):
+        # called from the worker thread for every finished chunk of a long document
+        return lambda index, total, summary: job.report(f"[Part {index}/{total}] {summary}\n")
+
+    def show_partials(self, output, updates):
+        # first update replaces the "Running..." message, the rest are appended
+        if output.winfo_exists() and output.get("1.0", "1.7") == "Running":
+            self.write_output(output, "Summarizing long text in parts...\n")
+        self.write_output(output, "".join(updates), append=True)
+
+    def show_stream(self, output, updates):
+        # tokens are strings, ("ttft", seconds) marks the first token of the final summary
+        for update in updates:
+            if output.winfo_exists() and output.get("1.0", "1.7") == "Running":
+                self.write_output(output, "")
+            if isinstance(update, tuple):
+                self.status_label.config(text=f"First token after {update[1]:.2f}s, generating...")
+                has_parts = output.winfo_exists() and output.get("1.0", "end-1c").strip()
+                self.write_output(output, ("\n" if has_parts else "") + "Summary:\n", append=True)
+            else:
+                self.write_output(output, update, append=True)
+            if output.winfo_exists():
+                output.see(tk.END)
+
+    def stream_summary_job(self, job, text):
+        first_token = []
+
+        def on_token(piece):
+            if not first_token:
+                first_token.append(time.perf_counter() - job.started_at)
+                job.report(("ttft", first_token[0]))
+            job.report(piece)
+
+        summary = self.models.run_summarization_stream(
+            text, on_token, cancel_event=job.cancel_event, on_partial=self.report_partial_summary(job)
+        )
+        ttft = f"\n\n(first token after {first_token[0]:.2f}s)" if first_token else ""
+        return "Summary:\n" + summary + ttft
 
+    def multi_job(self, job, selected_models, text):
+        tasks = [MULTI_TASKS[model] for model in selected_models]
+        results = self.models.run_multi(
+            text, tasks, on_partial=self.report_partial_summary(job), cancel_event=job.cancel_event
+        )
+        parts = []
+        if "summarization" in results:
+            parts.append("Summary:\n" + results["summarization"])
+        if "sentiment" in results:
+            parts.append("Sentiment: " + results["sentiment"])
+        return "\n\n".join(parts)
+
+    def text_job(self, job, selected_model, text, stream=False, per_sentence=False):
+        if selected_model == "Summarization" and stream:
+            return self.stream_summary_job(job, text)
+        if selected_model == "Summarization":
+            summary = self.models.run_summarization(
+                text, on_partial=self.report_partial_summary(job), cancel_event=job.cancel_event
+            )
+            return "Summary:\n" + summary
+        elif selected_model == "Sentiment Analysis" and per_sentence:
+            return format_document_sentiment(self.models.run_document_sentiment(text))
+        elif selected_model == "Sentiment Analysis":
+            return "Sentiment: " + self.models.run_sentiment(text)
+        return f"{selected_model} is not available for text."
+
+    def image_job(self, job, selected_model, image_path, labels=(), top_k=5):
+        if selected_model == "Image Classification" and labels:
+            return self.models.run_zero_shot_classification(image_path, labels, top_k=top_k)
+        if selected_model == "Image Classification":
+            return self.models.run_image_classification(image_path, top_k=top_k)
+        elif selected_model == "Summarization":
+            # OCR runs in parallel worker processes and every page is summarized as soon as it is read
+            try:
+                summary = self.models.run_ocr_summarization(
+                    image_path, on_partial=self.report_partial_summary(job), cancel_event=job.cancel_event
+                )
+            except RuntimeError as e:
+                if not str(e).startswith("OCR failed"):
+                    raise
+                error = str(e)[len("OCR failed: "):]
+                return f"OCR failed: Can't Summarize this Image. Please try another.  ({error})"
+            return "Summary:\n" + summary
+        return f"{selected_model} is not available for images."
 
     @log_model_run #decorator added    
     def run_text_model(self, selected_model):
         text = self.text_input.get("1.0", tk.END).strip()
-        self.output_text.config(state="normal")
-        self.output_text.delete("1.0", tk.END)
 
         if not text:
-            self.output_text.insert(tk.END, "Please enter some text first!")
-            self.output_text.config(state="disabled")
+            self.write_output(self.output_text, "Please enter some text first!")
             return
 
-        try:
-            if selected_model == "Summarization":
-                result = self.models.run_summarization(text)
-                self.output_text.insert(tk.END, "Summary:\n" + result)
-            elif selected_model == "Sentiment Analysis":
-                result = self.models.run_sentiment(text)
-                self.output_text.insert(tk.END, "Sentiment: " + result)
-        except Exception as e:
-            self.output_text.insert(tk.END, f"Error: {str(e)}")
-        finally:
-            self.output_text.config(state="disabled")
-
-    #using pytesseract for error from ocr
-    def safe_ocr(self, image_path):
-        """
-        Safely extract text from an image.
-        Converts unsupported images to RGB and catches errors.
-        """
-        try:
-            img = Image.open(image_path)
-            # convert to RGB (required for pytesseract)
-            if img.mode != "RGB":
-                img = img.convert("RGB")  
-            # Remove alpha channel if present
-            if "A" in img.getbands():
-                img = img.convert("RGB")
-            text = pytesseract.image_to_string(img)
-            return text.strip()
-        except Exception as e:
-            return f"OCR failed: Can't Summarize this Image. Please try another.  ({str(e)})"
-        
-            # Returns the extracted text, or an error message if OCR fails.
-
-
+        selected_models = [model for model, var in self.task_vars.items() if var.get()]
+        if len(selected_models) > 1:
+            # both models run at the same time, so this takes about as long as the summary alone
+            self.start_job(
+                ("multi", tuple(selected_models), text), self.multi_job, selected_models, text,
+                output=self.output_text, on_update=self.show_partials, description=" + ".join(selected_models)
+            )
+            return
+        if selected_models:
+            selected_model = selected_models[0]
+
+        stream = selected_model == "Summarization" and self.stream_var.get()
+        # the sentiment model only reads 512 tokens, longer texts are always scored sentence by sentence
+        per_sentence = selected_model == "Sentiment Analysis" and (
+            self.sentence_var.get() or len(text) > LONG_SENTIMENT_CHARS)
+        self.start_job(
+            ("text", selected_model, text, stream, per_sentence), self.text_job, selected_model, text, stream,
+            per_sentence,
+            output=self.output_text, on_update=self.show_stream if stream else self.show_partials,
+            description=selected_model
+        )
 
     def run_image_model(self, selected_model):
-        self.output_text.config(state="normal")
-        self.output_text.delete("1.0", tk.END)
-
         if not hasattr(self, "image_path") or not self.image_path:
-            self.output_text.insert(tk.END, "Please upload an image first!")
-            self.output_text.config(state="disabled")
+            self.write_output(self.output_text, "Please upload an image first!")
             return
 
+        labels = tuple(parse_labels(self.labels_entry.get()))
         try:
-            if selected_model == "Image Classification":
-                result = self.models.run_image_classification(self.image_path)
-                self.output_text.insert(tk.END, result)
-
-            elif selected_model == "Summarization":
-                # Use safe_ocr instead of direct run_ocr
-                extracted_text = self.safe_ocr(self.image_path)
-                if extracted_text.startswith("OCR failed"):
-                    self.output_text.insert(tk.END, extracted_text)
-                else:
-                    result = self.models.run_summarization(extracted_text)
-                    self.output_text.insert(tk.END, "Summary:\n" + result)
-
-        except Exception as e:
-            self.output_text.insert(tk.END, f"Error: {str(e)}")
-
-        finally:
-            self.output_text.config(state="disabled")
+            top_k = max(1, self.top_k_var.get())
+        except tk.TclError:
+            top_k = 5  # not a number in the box
+        self.start_job(
+            ("image", selected_model, self.image_path, labels, top_k), self.image_job, selected_model,
+            self.image_path, labels, top_k,
+            output=self.output_text, on_update=self.show_partials, description=selected_model
+        )
 
 
     @log_model_run
     def upload_image(self):
         self.image_path = filedialog.askopenfilename(
             title="Select an image",
-            filetypes=[("Image files", "*.jpg *.jpeg *.png *.bmp *.gif")]
+            filetypes=[("Image files", "*.jpg *.jpeg *.png *.bmp *.gif *.tif *.tiff")]
         )
         self.output_text.config(state="normal")
         self.output_text.delete("1.0", tk.END)
@@ -267,8 +741,16 @@ class AIApp(tk.Tk):
             self.output_text.insert(tk.END, "No image selected!")
         else:
             self.output_text.insert(tk.END, f"Image selected: {self.image_path}")
+            self.show_preview(self.image_path)
         self.output_text.config(state="disabled")
 
+    def show_preview(self, image_path):
+        try:
+            self.preview_photo = ImageTk.PhotoImage(SHARED_LOADER.preview(image_path))
+            self.preview_label.config(image=self.preview_photo)
+        except Exception:
+            self.preview_label.config(image="", text="(no preview for this file)")
+
 
 
        
@@ -295,7 +777,8 @@ Model Information
 
     Strength: Excellent for articles or reports.
 
-    Limitation: May miss minor details if text is very long.
+    Limitation: May miss minor details. Very long text is split into parts that are
+    summarized one by one and then combined, so it takes longer.
 
 2. Sentiment Analysis Model: distilbert-base-uncased-finetuned-sst-2-english
 
@@ -313,6 +796,9 @@ Model Information
 
     Limitation: Small or unusual objects may be misclassified.
 
+    Custom labels: typing your own labels uses openai/clip-vit-base-patch32 (zero-shot) instead.
+    The labels are encoded once and kept, so long label lists stay fast.
+
 4. Image-to-Text (OCR + Summarization)
 
     Task: Extracts text from an image and summarizes it.
@@ -386,7 +872,8 @@ Explanation of OOP Concepts in This Project
 
     - Try/except blocks are used when running models to catch errors (e.g., unsupported image types, empty text).
 
-    - A logging decorator (log_model_run) is applied to model functions to record each execution.
+    - A decorator (log_model_run) counts each GUI action, and the @instrument decorator in instrumentation.py
+      times every model call (shown in the Stats tab).
 
     - Improves robustness and makes debugging easier.
 
@@ -405,6 +892,96 @@ Explanation of OOP Concepts in This Project
         explain_text.insert(tk.END, oop_explanation)
         explain_text.config(state="disabled")  # lock text
 
+    # ======================
+    # TAB 4: Stats
+    # ======================
+    def create_stats_tab(self):
+        self.stats_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.stats_frame, text="Stats")
+
+        button_frame = tk.Frame(self.stats_frame)
+        button_frame.pack(pady=5)
+        tk.Button(button_frame, text="Refresh", command=self.refresh_stats).pack(side="left", padx=5)
+        tk.Button(button_frame, text="Export Prometheus",
+                  command=lambda: self.export_stats("prometheus")).pack(side="left", padx=5)
+        tk.Button(button_frame, text="Export JSON",
+                  command=lambda: self.export_stats("json")).pack(side="left", padx=5)
+
+        self.stats_text = scrolledtext.ScrolledText(self.stats_frame, wrap=tk.NONE, width=90, height=25,
+                                                    font=("Courier", 10))
+        self.stats_text.pack(pady=5, padx=10, fill="both", expand=True)
+        self.stats_text.config(state="disabled")
+
+        # refresh whenever the user switches to this tab
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+
+    def on_tab_changed(self, event=None):
+        if self.notebook.select() == str(self.stats_frame):
+            self.refresh_stats()
+
+    def refresh_stats(self):
+        data = REGISTRY.to_dict()
+        lines = ["Model loads"]
+        for name, stats in self.models.load_stats.items():
+            warmup = f"  warmup {stats['warmup_seconds']:.2f}s" if "warmup_seconds" in stats else ""
+            lines.append(f"  {name:<20} {stats['load_seconds']:7.2f}s  +{stats['rss_added_mb']:.0f} MB  ({stats['backend']}){warmup}")
+        if isinstance(self.models, RemoteModels):
+            lines.append(f"  models run on {self.models.base_url}")
+        elif not self.models.load_stats:
+            lines.append("  no model loaded yet")
+
+        usage = self.models.memory_usage()
+        if usage:
+            budget = self.models.registry.memory_budget_mb
+            lines += ["", f"Memory: process {usage.pop('process_rss_mb'):.0f} MB"
+                          + (f" of {budget:.0f} MB budget" if budget else "")]
+            for name, info in usage.items():
+                size = f"{info['mb']:.0f} MB" if info["mb"] is not None else "size unknown"
+                idle = f", idle {info['idle_seconds']:.0f}s" if info["idle_seconds"] is not None else ""
+                lines.append(f"  {name:<20} {'loaded' if info['loaded'] else 'not loaded':<11} {size}{idle}")
+
+        lines += ["", f"{'Timings':<60}{'count':>7}{'mean':>9}{'p50':>9}{'p95':>9}"]
+        for h in data["histograms"]:
+            if h["name"] == "aimodels_input_size":
+                continue
+            label = h["name"] + " " + " ".join(f"{k}={v}" for k, v in h["labels"].items())
+            mean = h["sum"] / h["count"] if h["count"] else 0.0
+            lines.append(f"  {label:<58}{h['count']:>7}{mean * 1000:>7.0f}ms{h['p50'] * 1000:>7.0f}ms{h['p95'] * 1000:>7.0f}ms")
+
+        if data["gauges"]:
+            lines += ["", "Gauges (stage_graph: queue depth, busy workers, occupancy)"]
+            for g in data["gauges"]:
+                label = g["name"] + " " + " ".join(f"{k}={v}" for k, v in g["labels"].items())
+                lines.append(f"  {label:<64}{g['value']:>7}")
+
+        lines += ["", "Counters"]
+        for c in data["counters"]:
+            label = c["name"] + " " + " ".join(f"{k}={v}" for k, v in c["labels"].items())
+            lines.append(f"  {label:<64}{c['value']:>7}")
+
+        if self.models.cache is not None:
+            cache = self.models.cache.stats()
+            lines += ["", f"Result cache: {cache['hits']} hits ({cache['disk_hits']} from disk), "
+                          f"{cache['misses']} misses, {cache['memory_items']}/{cache['max_items']} in memory"]
+
+        if getattr(self.models, "phash_index", None) is not None:
+            index = self.models.phash_index.stats()
+            lines.append(f"Near-duplicate images: {index['hits']} reused, {index['misses']} computed, "
+                         f"{index['images']} images indexed"
+                         + (f", {index['write_errors']} NOT saved to disk" if index["write_errors"] else ""))
+
+        self.write_output(self.stats_text, "\n".join(lines))
+
+    def export_stats(self, fmt):
+        extension = ".prom" if fmt == "prometheus" else ".json"
+        path = filedialog.asksaveasfilename(title="Export metrics", defaultextension=extension,
+                                            filetypes=[("Metrics", "*" + extension)])
+        if not path:
+            return
+        with open(path, "w") as f:
+            f.write(REGISTRY.to_prometheus() if fmt == "prometheus" else REGISTRY.to_json())
+        messagebox.showinfo("Export metrics", f"Saved metrics to {path}")
+
     # ======================
     # RUN MODEL FUNCTION
     # ======================
@@ -459,9 +1036,8 @@ Explanation of OOP Concepts in This Project
 
     def refresh_selection(self):
         """Reset the Run tab to allow new selections"""
-        # Clear input/output frame
-        for widget in self.io_frame.winfo_children():
-            widget.destroy()
+        # Hide the input/output panels (they are kept, so the queue and running jobs aren't lost)
+        self.hide_panels()
 
         # Reset dropdowns back to defaults
         self.input_type_var.set("Text")  # clear input type
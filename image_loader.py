@@ -0,0 +1,152 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageOps
+
+# Shared image loading for classification, OCR and the GUI preview.
+#
+# - JPEGs are decoded with draft mode: the decoder itself scales by 1/2, 1/4 or 1/8, so a
+#   4000x3000 photo needed at 224x224 is never fully decoded (much faster, much less memory).
+# - Decoded images are kept in a small LRU cache (limited by pixel bytes) keyed by the file's
+#   content hash, so the same picture is decoded once for the preview, the classifier and OCR.
+# - The content hash itself is remembered per (path, mtime, size), so it's only recomputed
+#   when the file changes.
+
+# ViT (google/vit-base-patch16-224) input size
+MODEL_SIZE = (224, 224)
+# preview shown in the Run tab after uploading
+PREVIEW_SIZE = (240, 180)
+# largest side kept for OCR (same limit as ocr.OCR_MAX_SIDE)
+OCR_MAX_SIDE = 3500
+
+
+def _byte_size(img):
+    return img.width * img.height * len(img.getbands())
+
+
+class ImageLoader:
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()   # (digest, variant) -> PIL image
+        self._bytes = 0
+        self._digests = {}             # (path, mtime_ns, size) -> sha256 hex
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ---- file identity ----
+    def file_digest(self, path) -> str:
+        """sha256 of the file content, cached until the file's mtime or size changes."""
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(block)
+            digest = h.hexdigest()
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    # ---- public variants ----
+    def model_input(self, path, size=MODEL_SIZE):
+        """RGB image already at the classifier's input size (bilinear, same as the ViT processor)."""
+        return self._get(path, ("model", size), lambda img: img.convert("RGB").resize(size, Image.BILINEAR),
+                         draft=("RGB", size))
+
+    def center_crop(self, path, size=MODEL_SIZE):
+        """RGB image scaled so the short side fits, then cropped to size (CLIP-style preprocessing)."""
+        return self._get(path, ("crop", size), lambda img: ImageOps.fit(img.convert("RGB"), size, Image.BICUBIC),
+                         draft=("RGB", size))
+
+    def preview(self, path, size=PREVIEW_SIZE):
+        """Small RGB thumbnail (keeps the aspect ratio) for showing in the GUI."""
+        def make(img):
+            img = img.convert("RGB")
+            img.thumbnail(size, Image.LANCZOS)
+            return img
+        return self._get(path, ("preview", size), make, draft=("RGB", size))
+
+    def fit(self, path, size):
+        """RGB image resized to exactly size (used for backgrounds)."""
+        return self._get(path, ("fit", size), lambda img: img.convert("RGB").resize(size, Image.LANCZOS),
+                         draft=("RGB", size))
+
+    def base(self, path, max_side=OCR_MAX_SIDE):
+        """
+        The largest decode we keep: RGB, transparent parts on white, longest side <= max_side.
+        Once this exists the smaller variants are made from it instead of decoding the file again.
+        """
+        def make(img):
+            if img.mode in ("RGBA", "LA", "P"):
+                img = img.convert("RGBA")
+                background = Image.new("RGBA", img.size, "white")
+                img = Image.alpha_composite(background, img)
+            img = img.convert("RGB")
+            if max(img.size) > max_side:
+                img.thumbnail((max_side, max_side), Image.LANCZOS)
+            return img
+        return self._get(path, ("base", max_side), make, draft=("RGB", (max_side, max_side)), is_base=True)
+
+    def ocr_input(self, path, max_side=OCR_MAX_SIDE):
+        """Greyscale image with the longest side at most max_side, ready for ocr.preprocess()."""
+        self.base(path, max_side)  # OCR needs the big decode, keep it for the other variants too
+        return self._get(path, ("ocr", max_side), ImageOps.grayscale, draft=("L", (max_side, max_side)))
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "images": len(self._images),
+                    "mb": self._bytes / (1024 * 1024)}
+
+    # ---- internals ----
+    def _get(self, path, variant, make, draft, is_base=False):
+        digest = self.file_digest(path)
+        key = (digest, variant)
+        with self._lock:
+            img = self._images.get(key)
+            if img is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return img
+            self.misses += 1
+            # if the big decode of this file is already here, shrink that instead of decoding again
+            base = None if is_base else next(
+                (im for (d, v), im in self._images.items() if d == digest and v[0] == "base"), None)
+
+        if base is not None:
+            img = make(base)
+        else:
+            with Image.open(path) as source:
+                if source.format == "JPEG":
+                    # let the JPEG decoder scale down while decoding
+                    source.draft(*draft)
+                # honour the camera rotation flag like transformers' load_image does
+                img = make(ImageOps.exif_transpose(source))
+                img.load()
+        self._remember(key, img)
+        return img
+
+    def _remember(self, key, img):
+        size = _byte_size(img)
+        with self._lock:
+            if key in self._images:
+                return
+            self._images[key] = img
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._images) > 1:
+                _, old = self._images.popitem(last=False)
+                self._bytes -= _byte_size(old)
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self._bytes = 0
+
+
+# one loader for the whole app, so the GUI and the models share decoded images
+SHARED_LOADER = ImageLoader()
@@ -0,0 +1,249 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process metrics for the model calls.
+#
+# Every AIModels.run_* call is timed with @instrument, and the Hugging Face pipelines are wrapped
+# with instrument_pipeline() so the time is also split into stages:
+#   preprocessing / tokenization -> forward -> postprocessing
+# Counters, gauges and histograms live in REGISTRY and can be exported as Prometheus text or JSON,
+# and the GUI shows them in the "Stats" tab.
+
+# seconds, from 1 ms up to a minute
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# characters / bytes / items
+SIZE_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimate a quantile from the buckets (linear inside the bucket, like Prometheus does)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                low = self.buckets[i - 1] if i > 0 else 0.0
+                high = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return low + (high - low) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape_label(value):
+    # Prometheus text format: backslash, double quote and newline must be escaped in label values
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    inner = ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs)
+    return "{" + inner + "}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}     # (name, labels) -> value
+        self._histograms = {}   # (name, labels) -> Histogram
+        self._gauges = {}       # (name, labels) -> current value
+        self._help = {}
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        """A value that goes up and down (queue depth, busy workers), only the latest one is kept."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name, value, buckets=TIME_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Time the with-block into the histogram `name` (in seconds), even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._gauges.clear()
+
+    # ---- export ----
+    def to_dict(self):
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            gauges = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._gauges.items())
+            ]
+            histograms = [
+                {
+                    "name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                    "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99),
+                    "buckets": dict(zip([str(b) for b in h.buckets] + ["+Inf"], h.counts)),
+                }
+                for (name, labels), h in sorted(self._histograms.items())
+            ]
+        return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            counter_names = sorted({name for name, _ in self._counters})
+            for name in counter_names:
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for (n, labels), value in sorted(self._counters.items()):
+                    if n == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+            gauge_names = sorted({name for name, _ in self._gauges})
+            for name in gauge_names:
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} gauge")
+                for (n, labels), value in sorted(self._gauges.items()):
+                    if n == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+            hist_names = sorted({name for name, _ in self._histograms})
+            for name in hist_names:
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for (n, labels), h in sorted(self._histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(list(h.buckets) + ["+Inf"], h.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {h.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("aimodels_call_seconds", "Time spent in AIModels.run_* methods")
+REGISTRY.describe("aimodels_calls_total", "AIModels.run_* calls by result status")
+REGISTRY.describe("aimodels_input_size", "Input size per call (characters, bytes or items)")
+REGISTRY.describe("aimodels_stage_seconds", "Time per pipeline stage")
+REGISTRY.describe("aimodels_ttft_seconds", "Time to the first streamed summary token")
+REGISTRY.describe("aimodels_cache_total", "Result cache lookups by outcome")
+REGISTRY.describe("aimodels_model_unloads_total", "Models unloaded to stay under the memory budget or when idle")
+REGISTRY.describe("aimodels_chunk_cache_total", "Summary chunks answered from the per-chunk cache (hit) or summarized (miss)")
+REGISTRY.describe("aimodels_phash_total", "Near-duplicate image lookups: result reused from a similar image (hit) or computed (miss)")
+REGISTRY.describe("aimodels_phash_write_errors_total", "Near-duplicate index entries that could not be written to disk")
+REGISTRY.describe("pipeline_stage_seconds", "Time one item spent being processed in a stage_graph stage")
+REGISTRY.describe("pipeline_queue_depth", "Items waiting in front of a stage_graph stage")
+REGISTRY.describe("pipeline_stage_busy", "Workers of a stage_graph stage that are processing an item")
+REGISTRY.describe("pipeline_stage_occupancy", "Share of a stage's worker time spent busy since the graph started")
+REGISTRY.describe("ocr_page_seconds", "Time from submitting an OCR page until its text is ready")
+REGISTRY.describe("gui_actions_total", "GUI callbacks triggered by the user")
+
+
+def input_size(value):
+    """Characters for text, bytes for an image path, number of items for a list."""
+    if isinstance(value, str):
+        if len(value) < 4096 and os.path.isfile(value):
+            return os.path.getsize(value)
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    return 0
+
+
+def instrument(func):
+    """Decorator for AIModels.run_* methods: times the call, counts ok/error and records input size."""
+    method = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if args:
+            REGISTRY.observe("aimodels_input_size", input_size(args[0]), buckets=SIZE_BUCKETS, method=method)
+        start = time.perf_counter()
+        try:
+            result = func(self, *args, **kwargs)
+        except Exception as e:
+            REGISTRY.inc("aimodels_calls_total", method=method, status="error", error=type(e).__name__)
+            raise
+        finally:
+            REGISTRY.observe("aimodels_call_seconds", time.perf_counter() - start, method=method)
+        # run_ocr reports failures as text instead of raising
+        status = "error" if isinstance(result, str) and result.startswith("OCR failed") else "ok"
+        REGISTRY.inc("aimodels_calls_total", method=method, status=status)
+        return result
+
+    return wrapper
+
+
+def instrument_pipeline(pipe, model_name):
+    """
+    Wrap the preprocess / _forward / postprocess steps of a Hugging Face pipeline object so every
+    call records per-stage time. For text models preprocessing *is* tokenization, so it gets that name.
+    """
+    first_stage = "preprocessing" if getattr(pipe, "tokenizer", None) is None else "tokenization"
+    stages = (("preprocess", first_stage), ("_forward", "forward"), ("postprocess", "postprocessing"))
+    for attr, stage in stages:
+        original = getattr(pipe, attr, None)
+        if original is None:
+            continue
+
+        def timed(*args, _original=original, _stage=stage, **kwargs):
+            with REGISTRY.span("aimodels_stage_seconds", model=model_name, stage=_stage):
+                return _original(*args, **kwargs)
+
+        setattr(pipe, attr, timed)
+    return pipe
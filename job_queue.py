@@ -0,0 +1,271 @@
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from cli import TEXT_EXTENSIONS, IMAGE_EXTENSIONS, read_text
+from models import DEFAULT_BATCH_SIZE
+from stage_graph import ocr_summary_graph
+
+# Queue of many inputs (text files, pasted texts, images) for the queue panel in the Run tab.
+#
+# - every item has its own model, status, latency and result
+# - workers take the next few pending items that use the same model and run them through the
+#   AIModels batch methods, so 500 reviews are a few padded batches instead of 500 single calls
+# - with 2 workers, the second one prefers a different model than the first (e.g. images are
+#   classified while texts are summarized)
+# - image summaries go through stage_graph (decode -> OCR -> summarize), so the images of a batch
+#   overlap instead of waiting for each other
+# - the GUI never reads every item: drain_changes() only returns the items that changed since
+#   the last poll, so a list of thousands of rows is cheap to keep up to date
+
+# which models make sense for which kind of input
+KIND_MODELS = {
+    "text": ("Summarization", "Sentiment Analysis"),
+    "image": ("Image Classification", "Summarization"),
+}
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+
+@dataclass
+class QueueItem:
+    id: int
+    kind: str             # "text" or "image"
+    name: str             # shown in the list: file name or the start of the text
+    model: str            # one of KIND_MODELS[kind]
+    path: str = None      # image or text file
+    text: str = None      # pasted text
+    status: str = PENDING
+    seconds: float = None # time the item's batch took
+    result: str = ""
+    error: str = ""
+
+
+def kind_of(path):
+    lower = path.lower()
+    if lower.endswith(TEXT_EXTENSIONS):
+        return "text"
+    if lower.endswith(IMAGE_EXTENSIONS):
+        return "image"
+    return None
+
+
+class DocumentQueue:
+    def __init__(self, models, workers=2, batch_size=DEFAULT_BATCH_SIZE):
+        self.models = models
+        self.workers = workers
+        self.batch_size = batch_size
+        self.items = {}             # id -> QueueItem, in the order they were added
+        self._pending = deque()     # ids waiting to run, in order
+        self._changed = set()
+        self._running_models = []   # (kind, model) of the batches in flight
+        self._active_workers = 0
+        self._next_id = 1
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="queue")
+        self.graph_stats = {}       # stage_graph.StageGraph.stats() of the last image summary batch
+
+    # ---- adding / editing (GUI thread) ----
+    def _add(self, kind, name, model, path=None, text=None):
+        if model not in KIND_MODELS[kind]:
+            model = KIND_MODELS[kind][0]
+        with self._lock:
+            item = QueueItem(self._next_id, kind, name, model, path=path, text=text)
+            self._next_id += 1
+            self.items[item.id] = item
+            self._pending.append(item.id)
+        return item
+
+    def add_file(self, path, model):
+        """Queue a text or image file. Returns None for file types we can't run."""
+        kind = kind_of(path)
+        if kind is None:
+            return None
+        return self._add(kind, os.path.basename(path), model, path=path)
+
+    def add_text(self, text, model):
+        name = " ".join(text.split())[:60]
+        return self._add("text", name, model, text=text)
+
+    def set_model(self, ids, model):
+        """Change the model of pending items. Items that can't use it (or already ran) are skipped."""
+        changed = []
+        with self._lock:
+            for item_id in ids:
+                item = self.items.get(item_id)
+                if item is not None and item.status == PENDING and model in KIND_MODELS[item.kind]:
+                    item.model = model
+                    changed.append(item_id)
+            self._changed.update(changed)
+        return changed
+
+    def retry(self, ids):
+        """Put failed items back in the queue."""
+        with self._lock:
+            for item_id in ids:
+                item = self.items.get(item_id)
+                if item is not None and item.status == FAILED:
+                    item.status, item.error, item.seconds = PENDING, "", None
+                    self._pending.append(item_id)
+                    self._changed.add(item_id)
+
+    def remove_finished(self):
+        """Forget done / failed items, returns their ids so the list can drop the rows too."""
+        with self._lock:
+            removed = [i for i, item in self.items.items() if item.status in (DONE, FAILED)]
+            for item_id in removed:
+                del self.items[item_id]
+                self._changed.discard(item_id)
+        return removed
+
+    # ---- running ----
+    def start(self):
+        """Start (or resume) working through the pending items."""
+        self._stop.clear()
+        with self._lock:
+            missing = self.workers - self._active_workers
+            self._active_workers += missing
+        for _ in range(missing):
+            self._pool.submit(self._work)
+
+    def stop(self):
+        """Don't start any more batches, the ones already running finish normally."""
+        self._stop.set()
+
+    @property
+    def running(self):
+        with self._lock:
+            return self._active_workers > 0
+
+    def _next_batch(self):
+        with self._lock:
+            ids = [i for i in self._pending if i in self.items]
+            if not ids:
+                return None, []
+            # prefer a model no other worker is busy with
+            group = next(
+                ((self.items[i].kind, self.items[i].model) for i in ids
+                 if (self.items[i].kind, self.items[i].model) not in self._running_models),
+                (self.items[ids[0]].kind, self.items[ids[0]].model),
+            )
+            batch = [self.items[i] for i in ids if (self.items[i].kind, self.items[i].model) == group]
+            batch = batch[:self.batch_size]
+            taken = {item.id for item in batch}
+            self._pending = deque(i for i in ids if i not in taken)
+            for item in batch:
+                item.status = RUNNING
+                self._changed.add(item.id)
+            self._running_models.append(group)
+            return group, batch
+
+    def _work(self):
+        try:
+            while not self._stop.is_set():
+                group, batch = self._next_batch()
+                if not batch:
+                    return
+                start = time.perf_counter()
+                outcomes = self._run_or_retry(group, batch)
+                seconds = time.perf_counter() - start
+                with self._lock:
+                    self._running_models.remove(group)
+                    for item, (result, error) in zip(batch, outcomes):
+                        item.status = FAILED if error else DONE
+                        item.result, item.error, item.seconds = result or "", error or "", seconds
+                        self._changed.add(item.id)
+        finally:
+            with self._lock:
+                self._active_workers -= 1
+
+    def _run_or_retry(self, group, batch):
+        try:
+            return self._run(group, batch)
+        except Exception as e:
+            if len(batch) == 1:
+                return [(None, str(e))]
+        # one bad document shouldn't fail the whole batch: retry them one by one (like cli.process_batch)
+        outcomes = []
+        for item in batch:
+            try:
+                outcomes.extend(self._run(group, [item]))
+            except Exception as e:
+                outcomes.append((None, str(e)))
+        return outcomes
+
+    def _run(self, group, batch):
+        """Returns one (result, error) pair per item."""
+        kind, model = group
+        if (kind, model) == ("image", "Image Classification"):
+            results = self.models.run_image_classification_batch([i.path for i in batch], batch_size=self.batch_size)
+            return [(r, None) for r in results]
+
+        if kind == "image":
+            # decode, OCR and summarize are separate stages, so the images of the batch overlap
+            graph = ocr_summary_graph(self.models)
+            outcomes = [None] * len(batch)
+            for record in graph.run({"index": n, "path": item.path} for n, item in enumerate(batch)):
+                outcomes[record["index"]] = (record.get("summary"), record["error"])
+            self.graph_stats = graph.stats()
+            return outcomes
+
+        texts = [i.text if i.text is not None else read_text(i.path) for i in batch]
+
+        outcomes = [None] * len(batch)
+        ok = []
+        for index, text in enumerate(texts):
+            if not text.strip():
+                outcomes[index] = (None, "no text found")
+            else:
+                ok.append(index)
+        inputs = [texts[i] for i in ok]
+        if model == "Sentiment Analysis":
+            results = self.models.run_sentiment_batch(inputs, batch_size=self.batch_size)
+        else:
+            results = self.models.run_summarization_batch(inputs, batch_size=self.batch_size)
+        for index, result in zip(ok, results):
+            outcomes[index] = (result, None)
+        return outcomes
+
+    # ---- reading (GUI thread) ----
+    def drain_changes(self):
+        """Items whose status / result changed since the last call."""
+        with self._lock:
+            changed = [self.items[i] for i in self._changed if i in self.items]
+            self._changed.clear()
+        return changed
+
+    def counts(self):
+        with self._lock:
+            counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for item in self.items.values():
+                counts[item.status] += 1
+        return counts
+
+    def export(self, path):
+        """Write every item with its result, as CSV or JSON lines depending on the file extension."""
+        with self._lock:
+            records = [
+                {"name": item.name, "input": item.path or item.text, "model": item.model, "status": item.status,
+                 "seconds": round(item.seconds, 3) if item.seconds is not None else None,
+                 "result": item.result, "error": item.error}
+                for item in self.items.values()
+            ]
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            if path.lower().endswith(".csv"):
+                writer = csv.DictWriter(f, fieldnames=list(records[0]) if records else ["name"])
+                writer.writeheader()
+                writer.writerows(records)
+            else:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return len(records)
+
+    def shutdown(self):
+        self.stop()
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -1,10 +1,38 @@
 # starting point of our project where the GUI and Hugging Face Models will be launched
+#
+#   python main.py                      -> opens the GUI
+#   python main.py --server URL         -> opens the GUI, models run on a server.py host
+#   python main.py <command> [options]  -> headless batch mode, see cli.py (python main.py -h)
+#
+# set AIMODELS_WARMUP=0 to skip loading + warming up the models right after launch.
+# on small machines AIMODELS_MEMORY_BUDGET_MB / AIMODELS_IDLE_UNLOAD_S unload models that aren't used
+# each launch writes .cache/startup_profile.json with the time every startup step took
 
-#importing main gui class from gui.py
-from gui import AIApp
+import os
+import sys
+
+# imported first, so the startup profile (startup.py) measures from the start of the process
+from startup import PROFILE
 
 if __name__ == "__main__":
-    app = AIApp()               #creating an instance
+    server_url = os.environ.get("AIMODELS_SERVER")
+    if len(sys.argv) == 3 and sys.argv[1] == "--server":
+        server_url = sys.argv[2]
+    elif len(sys.argv) > 1:
+        # any other arguments means batch mode, no window (works on machines without a display)
+        from cli import main
+        sys.exit(main())
+
+    #importing main gui class from gui.py
+    with PROFILE.step("import gui"):
+        from gui import AIApp
+
+    budget = os.environ.get("AIMODELS_MEMORY_BUDGET_MB")
+    idle = os.environ.get("AIMODELS_IDLE_UNLOAD_S")
+    with PROFILE.step("build window"):
+        app = AIApp(server_url=server_url, warmup=os.environ.get("AIMODELS_WARMUP", "1") != "0",
+                    memory_budget_mb=float(budget) if budget else None,
+                    idle_unload_seconds=float(idle) if idle else None)   #creating an instance
 
     #starting the tkinter main loop
     app.mainloop()
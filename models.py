@@ -1,65 +1,1017 @@
+import gc
+import json
 import os
-from transformers import pipeline
-import pytesseract
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
+from backends import build_pipeline
+from chunking import stable_chunks, token_limit, split_sentences, token_windows
+from cache import ResultCache
+from ocr import OCREngine, count_pages
+from image_loader import SHARED_LOADER
+from zero_shot import ZeroShotClassifier, ZERO_SHOT_MODEL, ZERO_SHOT_SPEC
+from instrumentation import REGISTRY, instrument, instrument_pipeline
+from startup import PROFILE
 
 # # Disable Hugging Face symlink warning on Windows
 # os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
 
+# every model the app can use: name -> (pipeline task, Hugging Face model id)
+# nothing is loaded here, the registry below builds a pipeline the first time it is needed
+MODEL_SPECS = {
+    "summarizer": ("summarization", "facebook/bart-large-cnn"),
+    "sentiment_analyzer": ("sentiment-analysis", "distilbert-base-uncased-finetuned-sst-2-english"),
+    # google/vit-base-patch16-224 is a pre-trained Vision Transformer for general image recognition
+    "image_classifier": ("image-classification", "google/vit-base-patch16-224"),
+}
+
+# generation settings used for every summary
+SUMMARY_KWARGS = {"max_length": 60, "min_length": 15, "do_sample": False}
+
+# long documents are cut into chunks of whole sentences, at most this many tokens
+# (bart-large-cnn takes 1024 at most) and at least SUMMARY_CHUNK_MIN_TOKENS unless the text ends.
+# the boundaries depend on the content (see chunking.stable_chunks), so after a small edit
+# most chunks are unchanged and their summaries come from the cache
+SUMMARY_CHUNK_TOKENS = 900
+SUMMARY_CHUNK_MIN_TOKENS = 450
+SUMMARY_CHUNK_BATCH = 4
+
+# tasks run_multi can combine on one text -> the model that does it
+TEXT_TASKS = {"summarization": "summarizer", "sentiment": "sentiment_analyzer"}
+
+# id used in cache keys for OCR results (tesseract isn't one of the Hugging Face models)
+OCR_MODEL_ID = "tesseract"
+
+# max Hamming distance (of 64 dHash bits) for reusing a near-identical image's classification, see
+# phash_index.py. OCR never uses it: two receipts or text pages with the same layout have almost the
+# same tiny hash but different text, so OCR results are only reused for identical files (result cache)
+PHASH_CLASSIFY_DISTANCE = 6
+
+# how many inputs go through a pipeline at once in the run_*_batch methods
+DEFAULT_BATCH_SIZE = 8
+
+# warmup order after launch: quickest models first, so they are ready soonest
+WARMUP_ORDER = ("sentiment_analyzer", "image_classifier", "summarizer")
+
+# a few realistic sentences, long enough to go through the same kernels a normal request uses
+WARMUP_TEXT = (
+    "The city council met on Tuesday evening to discuss the budget for next year. "
+    "Several residents asked for more money for parks and public transport, while others "
+    "worried about rising costs. The final vote is expected at the next meeting in two weeks."
+)
+
+
+# measured model sizes (MB) are saved here, so the memory budget can count with real numbers
+# before a model was loaded in this run
+MODEL_SIZES_PATH = os.path.join(".cache", "model_sizes.json")
+
+
+def current_rss_mb() -> float:
+    """Resident memory of this process in MB (psutil if installed, otherwise /proc)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024  # value is in kB
+    except OSError:
+        pass
+    return 0.0
+
+
+def model_memory_mb(pipe):
+    """Size of a pipeline's weights + buffers in MB, None if the model isn't a torch module (onnx)."""
+    model = getattr(pipe, "model", None)
+    if not hasattr(model, "parameters"):
+        return None
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors) / (1024 * 1024)
+
+
+class ModelRegistry:
+    """
+    Keeps the Hugging Face pipelines and builds each one lazily on first use.
+    Records how long every model took to load and how much memory it added,
+    so we can check that startup is no longer paying for all three models.
+
+    With a memory budget (MB of resident memory for the whole process) the least recently
+    used models are unloaded before loading another one would go over it, and again after the
+    load if the measured memory still ended up over it. With idle_unload_seconds models nobody
+    used for that long are unloaded in the background.
+    An unloaded model is simply loaded again by the next get().
+    """
+
+    def __init__(self, specs=None, backends=None, memory_budget_mb=None, idle_unload_seconds=None,
+                 sizes_path=MODEL_SIZES_PATH):
+        self.specs = dict(MODEL_SPECS)
+        self.specs.update(specs or {})
+        # name -> "torch" / "int8" / "onnx" (see backends.py), anything not listed runs on torch
+        self.backends = {name: "torch" for name in self.specs}
+        self.backends.update(backends or {})
+        self._pipelines = {}
+        self._locks = {name: threading.Lock() for name in self.specs}
+        self.load_stats = {}  # name -> {"model", "backend", "load_seconds", "rss_added_mb", "warmup_seconds"}
+        # name -> "not loaded" / "loading" / "warming up" / "ready" / "failed", shown in the GUI
+        self.states = {name: "not loaded" for name in self.specs}
+
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_unload_seconds = idle_unload_seconds
+        self.memory_mb = {}   # name -> size of the model, kept after unloading so we know what a reload costs
+        self.sizes_path = sizes_path
+        self._load_sizes()
+        self._last_used = {}  # name -> time.monotonic() of the last get()
+        self.budget_unloads = 0  # models unloaded to stay under the budget, warmup stops once this goes up
+        if idle_unload_seconds:
+            threading.Thread(target=self._unload_idle_loop, name="idle-unload", daemon=True).start()
+
+    def get(self, name):
+        """Return the pipeline for name, loading it if this is the first call."""
+        self._last_used[name] = time.monotonic()
+        pipe = self._pipelines.get(name)
+        if pipe is not None:
+            return pipe
+        # one lock per model so loading the summarizer doesn't block sentiment
+        with self._locks[name]:
+            if name not in self._pipelines:
+                self._make_room(name)
+                self.states[name] = "loading"
+                try:
+                    self._pipelines[name] = self._load(name)
+                except Exception:
+                    self.states[name] = "failed"
+                    raise
+                # loaded but the first call will still be slow until warmup() ran
+                self.states[name] = "loaded"
+                # the size known before loading can be missing or off, check what we actually use now
+                self._enforce_budget(name)
+            return self._pipelines[name]
+
+    def _load(self, name):
+        task, model_id = self.specs[name]
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        with PROFILE.step(f"load {name}", model=model_id, backend=self.backends[name]):
+            pipe = instrument_pipeline(build_pipeline(task, model_id, self.backends[name]), name)
+        rss_added = current_rss_mb() - rss_before
+        self.load_stats[name] = {
+            "model": model_id,
+            "backend": self.backends[name],
+            "load_seconds": time.perf_counter() - start,
+            "rss_added_mb": rss_added,
+        }
+        # the weight size is exact, the RSS difference is skewed when two models load at once
+        size = model_memory_mb(pipe)
+        self.memory_mb[name] = size if size is not None else max(rss_added, 0.0)
+        self._save_sizes()
+        return pipe
+
+    def _size_key(self, name):
+        return f"{self.specs[name][1]}|{self.backends[name]}"
+
+    def _load_sizes(self):
+        if not self.sizes_path or not os.path.exists(self.sizes_path):
+            return
+        try:
+            with open(self.sizes_path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return  # broken file, sizes get measured again
+        for name in self.specs:
+            if self._size_key(name) in saved:
+                self.memory_mb[name] = saved[self._size_key(name)]
+
+    def _save_sizes(self):
+        if not self.sizes_path:
+            return
+        try:
+            with open(self.sizes_path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+        saved.update({self._size_key(name): round(mb, 1) for name, mb in self.memory_mb.items()})
+        try:
+            os.makedirs(os.path.dirname(self.sizes_path) or ".", exist_ok=True)
+            tmp_path = f"{self.sizes_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(saved, f, indent=2)
+            os.replace(tmp_path, self.sizes_path)
+        except OSError:
+            pass  # only an estimate for the next run, the budget is still checked after every load
+
+    def is_loaded(self, name) -> bool:
+        return name in self._pipelines
+
+    # ======================
+    # Memory budget
+    # ======================
+    def unload(self, name, reason="manual"):
+        """Drop the pipeline so its memory can be freed. Calls still running with it finish normally."""
+        if self._pipelines.pop(name, None) is None:
+            return False
+        self.states[name] = "not loaded"
+        if reason == "budget":
+            self.budget_unloads += 1
+        REGISTRY.inc("aimodels_model_unloads_total", model=name, reason=reason)
+        gc.collect()
+        return True
+
+    def has_room(self, name) -> bool:
+        """Whether loading name keeps the process under the budget without unloading anything."""
+        if not self.memory_budget_mb:
+            return True
+        return current_rss_mb() + self.memory_mb.get(name, 0.0) <= self.memory_budget_mb
+
+    def _make_room(self, name):
+        """Unload least recently used models until loading name fits in the budget (called with name's lock)."""
+        if not self.memory_budget_mb:
+            return
+        # freed memory only shows up in RSS once running calls let go of the model,
+        # so count with the known model sizes instead of re-reading RSS after every unload
+        projected = current_rss_mb() + self.memory_mb.get(name, 0.0)
+        # snapshot first: other threads may load a model (insert into _pipelines) while we look
+        candidates = sorted((n for n in list(self._pipelines) if n != name), key=lambda n: self._last_used.get(n, 0.0))
+        for other in candidates:
+            if projected <= self.memory_budget_mb:
+                break
+            # a model that is being loaded / unloaded by another thread is skipped (no lock waiting, no deadlock)
+            if not self._locks[other].acquire(blocking=False):
+                continue
+            try:
+                if self.unload(other, reason="budget"):
+                    projected -= self.memory_mb.get(other, 0.0)
+            finally:
+                self._locks[other].release()
+
+    def _enforce_budget(self, name):
+        """
+        After loading name: re-read RSS and unload the least recently used other models until the
+        process is back under the budget (called with name's lock, name itself stays loaded).
+        """
+        if not self.memory_budget_mb:
+            return
+        # snapshot first: other threads may load a model (insert into _pipelines) while we look
+        candidates = sorted((n for n in list(self._pipelines) if n != name), key=lambda n: self._last_used.get(n, 0.0))
+        for other in candidates:
+            if current_rss_mb() <= self.memory_budget_mb:
+                return
+            if not self._locks[other].acquire(blocking=False):
+                continue
+            try:
+                self.unload(other, reason="budget")
+            finally:
+                self._locks[other].release()
+
+    def _unload_idle_loop(self):
+        interval = max(1.0, min(30.0, self.idle_unload_seconds / 2))
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            for name in list(self._pipelines):
+                if now - self._last_used.get(name, now) < self.idle_unload_seconds:
+                    continue
+                if self._locks[name].acquire(blocking=False):
+                    try:
+                        self.unload(name, reason="idle")
+                    finally:
+                        self._locks[name].release()
+
+    def memory_usage(self):
+        """name -> {"loaded", "mb", "idle_seconds"} plus the process total under "process_rss_mb"."""
+        now = time.monotonic()
+        usage = {
+            name: {
+                "loaded": name in self._pipelines,
+                "mb": self.memory_mb.get(name),
+                "idle_seconds": now - self._last_used[name] if name in self._last_used else None,
+            }
+            for name in self.specs
+        }
+        usage["process_rss_mb"] = current_rss_mb()
+        return usage
+
+    def warmup(self, name):
+        """
+        Load name and push one dummy input through it, so the lazy one-time costs (kernel setup,
+        tokenizer caches, memory allocator growth) are paid here and not by the user's first call.
+        """
+        pipe = self.get(name)
+        if self.states[name] == "ready":
+            return
+        self.states[name] = "warming up"
+        task = self.specs[name][0]
+        start = time.perf_counter()
+        try:
+            with PROFILE.step(f"warmup {name}"):
+                if task == "summarization":
+                    pipe(WARMUP_TEXT, **SUMMARY_KWARGS)
+                elif task == "image-classification":
+                    pipe(Image.new("RGB", (224, 224), (128, 128, 128)))
+                elif task == "zero-shot-image-classification":
+                    pipe(Image.new("RGB", (224, 224), (128, 128, 128)), candidate_labels=["photo", "drawing"])
+                else:
+                    pipe(WARMUP_TEXT)
+        except Exception:
+            self.states[name] = "failed"
+            raise
+        self.load_stats[name]["warmup_seconds"] = time.perf_counter() - start
+        self.states[name] = "ready"
+
+    def preload(self, names, background=True):
+        """Load the given models now, on daemon threads if background is True."""
+        threads = []
+        for name in names:
+            if background:
+                t = threading.Thread(target=self.get, args=(name,), name=f"preload-{name}", daemon=True)
+                t.start()
+                threads.append(t)
+            else:
+                self.get(name)
+        return threads
+
+
 class AIModels:
-    def __init__(self):
-        # Load Hugging Face models for text_summarization
-        self.summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-        self.sentiment_analyzer = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
-        
-        #loading image classification model
-        self.image_classifier = pipeline("image-classification", model="google/vit-base-patch16-224")
-        # google/vit-base-patch16-224 is a pre-trained Vision Transformer for general image recognition
+    def __init__(self, preload=(), background=True, cache=None, backends=None, specs=None, images=None,
+                 memory_budget_mb=None, idle_unload_seconds=None, phash_index=None):
+        # models are no longer loaded here, so creating AIModels (and the GUI) is instant.
+        # pass model names in preload (e.g. ["sentiment_analyzer"]) to start loading them early
+        # backends picks the CPU backend per model, e.g. {"summarizer": "int8"} (see backends.py)
+        # specs swaps the model ids, e.g. tiny stand-in models for the benchmarks
+        # memory_budget_mb / idle_unload_seconds let small machines unload models they aren't using
+        # CLIP (zero-shot) is in the registry too, so the budget and idle unloading cover it
+        self.registry = ModelRegistry(specs={ZERO_SHOT_MODEL: ZERO_SHOT_SPEC, **(specs or {})}, backends=backends,
+                                      memory_budget_mb=memory_budget_mb, idle_unload_seconds=idle_unload_seconds)
+        # repeated inputs are answered from here instead of running the model again.
+        # pass ResultCache(disk_dir=...) to keep results between runs, or cache=False to turn it off
+        self.cache = ResultCache() if cache is None else (cache or None)
+        # tesseract runs in its own process pool, created on the first OCR call
+        self.ocr_engine = OCREngine()
+        # decoded images are shared with the GUI preview (see image_loader.py)
+        self.images = images or SHARED_LOADER
+        # CLIP for custom label sets, loaded on the first zero-shot call (see zero_shot.py)
+        self.zero_shot = ZeroShotClassifier(self.registry, loader=self.images)
+        # pass a phash_index.PerceptualIndex to reuse classification results of near-identical
+        # images (resized, re-saved), not just byte-identical ones like the result cache does
+        self.phash_index = phash_index
+        self.batch_stats = {}  # task -> throughput of the last run_*_batch call
+        if preload:
+            self.registry.preload(preload, background=background)
 
         # this is "encapsulation" GUI just calls the method run_image_classification without needing to know the model detail
 
+    # the old attributes still work, they just load the model on first access
+    @property
+    def summarizer(self):
+        return self.registry.get("summarizer")
+
+    @property
+    def sentiment_analyzer(self):
+        return self.registry.get("sentiment_analyzer")
+
+    @property
+    def image_classifier(self):
+        return self.registry.get("image_classifier")
+
+    @property
+    def model_states(self):
+        """name -> "not loaded" / "loading" / "loaded" / "warming up" / "ready" / "failed"."""
+        return dict(self.registry.states)
+
+    def warmup(self, names=WARMUP_ORDER, background=True):
+        """
+        Load and warm up the models one after another (on a daemon thread if background),
+        so the first real call is as fast as the later ones. Progress is in model_states.
+        """
+        def run():
+            with PROFILE.step("import transformers"):
+                import transformers  # noqa: F401  (the biggest single import, worth seeing on its own)
+            unloads = self.registry.budget_unloads
+            for name in names:
+                # over the memory budget (or warming this one would push out one warmed before it):
+                # the rest load on their first real call
+                if not self.registry.has_room(name) or self.registry.budget_unloads > unloads:
+                    break
+                try:
+                    self.registry.warmup(name)
+                except Exception:
+                    pass  # state is "failed", the model will be loaded again on its first real call
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def memory_usage(self):
+        """Per-model memory (MB, also for unloaded models once we know their size) and the process RSS."""
+        return self.registry.memory_usage()
+
+    @property
+    def load_stats(self):
+        """Per-model load time and added memory, only for models that were loaded."""
+        return dict(self.registry.load_stats)
+
+    # ======================
+    # Result cache helpers
+    # ======================
+    def _cache_key(self, model_id, params, payload):
+        return ResultCache.make_key(model_id, params, payload)
+
+    def _cached(self, model_id, params, payload, compute):
+        if self.cache is None:
+            return compute()
+        key = self._cache_key(model_id, params, payload)
+        value = self.cache.get(key)
+        REGISTRY.inc("aimodels_cache_total", model=model_id, result="miss" if value is None else "hit")
+        if value is None:
+            value = compute()
+            self.cache.put(key, value)
+        return value
+
+    def _near_duplicate(self, image_path, model_id, params, compute, max_distance):
+        """Result stored for a near-identical image if there is one, else compute() and remember it."""
+        if self.phash_index is None:
+            return compute()
+        try:
+            value = self.phash_index.hash_image(image_path)
+        except Exception:
+            return compute()  # the model call will report the broken image
+        kind = self._cache_key(model_id, params, "")
+        result = self.phash_index.lookup(value, kind, max_distance)
+        REGISTRY.inc("aimodels_phash_total", model=model_id, result="miss" if result is None else "hit")
+        if result is None:
+            result = compute()
+            self.phash_index.add(value, kind, result)
+        return result
+
+    def _cached_batch(self, model_id, params, items, payload_of, compute_batch, should_cache=None):
+        """Look every item up in the cache and only send the misses to compute_batch."""
+        if self.cache is None:
+            return compute_batch(items)
+        keys = [self._cache_key(model_id, params, payload_of(item)) for item in items]
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, value in enumerate(results) if value is None]
+        REGISTRY.inc("aimodels_cache_total", len(missing), model=model_id, result="miss")
+        REGISTRY.inc("aimodels_cache_total", len(items) - len(missing), model=model_id, result="hit")
+        if missing:
+            computed = compute_batch([items[i] for i in missing])
+            for i, value in zip(missing, computed):
+                results[i] = value
+                if should_cache is None or should_cache(value):
+                    self.cache.put(keys[i], value)
+        return results
+
+    def _model_id(self, name):
+        # quantized / onnx models give slightly different scores, so they get their own cache entries
+        model_id = self.registry.specs[name][1]
+        backend = self.registry.backends[name]
+        return model_id if backend == "torch" else f"{model_id}@{backend}"
+
       #methods to run the classifications:  
       #method is basically a function that belongs to a class. Here this function belongs to the class AIModels, hence method
-    def run_summarization(self, text: str) -> str:
-        summary = self.summarizer(text, max_length=60, min_length=15, do_sample=False)
-        return summary[0]['summary_text']
+    @instrument
+    def run_summarization(self, text: str, on_partial=None, cancel_event=None,
+                          batch_size=SUMMARY_CHUNK_BATCH) -> str:
+        """
+        Summarize text of any length. Short text goes straight to the model.
+        Longer text is split into chunks of whole sentences whose boundaries depend on the content
+        (chunking.stable_chunks), so an edit only changes the chunks around it. Each chunk summary is
+        cached on its own, the rest are summarized batch_size at a time (map), and the joined chunk
+        summaries are summarized again (reduce).
+        on_partial(index, total, summary) is called as each chunk summary is ready, so the GUI
+        can show them while the rest are still running. Setting cancel_event stops between batches.
+        """
+        return self._cached(
+            self._model_id("summarizer"), self._summary_params(), text,
+            lambda: self._summarize(text, on_partial, cancel_event, batch_size),
+        )
+
+    def _summary_params(self):
+        return dict(SUMMARY_KWARGS, chunk_tokens=SUMMARY_CHUNK_TOKENS, chunk_min_tokens=SUMMARY_CHUNK_MIN_TOKENS,
+                    chunking="sentences")
+
+    @instrument
+    def run_summarization_stream(self, text: str, on_token, cancel_event=None, on_partial=None) -> str:
+        """
+        Like run_summarization, but the (final) summary is generated token by token and every
+        decoded piece of text is passed to on_token(text) as soon as it exists.
+        Setting cancel_event stops generation after the current token and returns what was
+        decoded so far. Streaming uses greedy decoding (the generation streamer can't follow
+        beam search), so the wording can differ a little from run_summarization.
+        """
+        params = dict(self._summary_params(), num_beams=1)
+        key = self._cache_key(self._model_id("summarizer"), params, text) if self.cache is not None else None
+        cached = self.cache.get(key) if key is not None else None
+        if cached is not None:
+            on_token(cached)
+            return cached
+
+        summary = self._summarize(text, on_partial, cancel_event, on_token=on_token)
+        stopped = cancel_event is not None and cancel_event.is_set()
+        if key is not None and not stopped:  # a stopped summary is incomplete, don't keep it
+            self.cache.put(key, summary)
+        return summary
+
+    def _generate_streaming(self, text, on_token, cancel_event=None):
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+        class StopOnEvent(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return cancel_event is not None and cancel_event.is_set()
+
+        summarizer = self.summarizer
+        tokenizer = summarizer.tokenizer
+        inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=token_limit(tokenizer) + 2)
+        streamer = TextIteratorStreamer(tokenizer, skip_special_tokens=True)
+        generate_kwargs = dict(
+            inputs, **SUMMARY_KWARGS, num_beams=1, streamer=streamer,
+            stopping_criteria=StoppingCriteriaList([StopOnEvent()]),
+        )
 
+        errors = []
+
+        def generate():
+            try:
+                summarizer.model.generate(**generate_kwargs)
+            except Exception as e:
+                errors.append(e)
+                streamer.end()  # wake up the loop below
+
+        # generate() runs on its own thread and fills the streamer, we read it here
+        start = time.perf_counter()
+        thread = threading.Thread(target=generate, name="summary-stream", daemon=True)
+        thread.start()
+        pieces = []
+        for piece in streamer:
+            if not piece:
+                continue
+            if not pieces:
+                REGISTRY.observe("aimodels_ttft_seconds", time.perf_counter() - start, model="summarizer")
+            pieces.append(piece)
+            on_token(piece)
+        thread.join()
+        if errors:
+            raise errors[0]
+        return "".join(pieces).strip()
+
+    def _summarize(self, text, on_partial=None, cancel_event=None, batch_size=SUMMARY_CHUNK_BATCH, on_token=None,
+                   ids=None):
+        # ids: the text already tokenized by the summarizer's tokenizer (see run_multi)
+        summarizer = self.summarizer
+        max_tokens = min(SUMMARY_CHUNK_TOKENS, token_limit(summarizer.tokenizer))
+        chunks = stable_chunks(summarizer.tokenizer, text, max_tokens, SUMMARY_CHUNK_MIN_TOKENS, ids=ids)
+        if len(chunks) == 1:
+            if on_token is not None:
+                return self._generate_streaming(text, on_token, cancel_event)
+            if ids is not None and len(ids) <= max_tokens:
+                return self._summary_from_ids(ids)
+            summary = summarizer(text, **SUMMARY_KWARGS)
+            return summary[0]['summary_text']
+
+        # map: summarize the chunks, reusing the summary of every chunk seen before
+        chunk_summaries = self._summarize_chunks(chunks, on_partial, cancel_event, batch_size)
+
+        # reduce: summarize the summaries. if they are still too long this recurses,
+        # but every level is ~10x shorter so it finishes after one or two rounds.
+        # when streaming, only this last pass is streamed token by token
+        return self._summarize(" ".join(chunk_summaries), cancel_event=cancel_event, batch_size=batch_size,
+                               on_token=on_token)
+
+    def _summarize_chunks(self, chunks, on_partial=None, cancel_event=None, batch_size=SUMMARY_CHUNK_BATCH):
+        """
+        Summary of every chunk. Chunk summaries are cached one by one (keyed by the chunk's text),
+        so re-submitting an edited document only runs the model on the chunks that changed.
+        """
+        model_id, params = self._model_id("summarizer"), dict(SUMMARY_KWARGS, part="chunk")
+        keys = [self._cache_key(model_id, params, chunk) for chunk in chunks] if self.cache is not None else None
+        summaries = [self.cache.get(key) for key in keys] if keys else [None] * len(chunks)
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+        REGISTRY.inc("aimodels_chunk_cache_total", len(chunks) - len(missing), result="hit")
+        REGISTRY.inc("aimodels_chunk_cache_total", len(missing), result="miss")
+
+        # only the new chunks are reported as partial results, numbered among themselves
+        summarizer = self.summarizer
+        for start in range(0, len(missing), batch_size):
+            if cancel_event is not None and cancel_event.is_set():
+                raise InterruptedError("summarization was cancelled")
+            batch = missing[start:start + batch_size]
+            outputs = summarizer([chunks[i] for i in batch], batch_size=batch_size, **SUMMARY_KWARGS)
+            for done, (i, out) in enumerate(zip(batch, outputs), start=start + 1):
+                summaries[i] = first(out)['summary_text']
+                if keys:
+                    self.cache.put(keys[i], summaries[i])  # kept even if the run is cancelled later
+                if on_partial is not None:
+                    on_partial(done, len(missing), summaries[i])
+        return summaries
+
+    def _summary_from_ids(self, ids):
+        # same generate() call the pipeline makes, minus its own tokenization
+        import torch
+        summarizer = self.summarizer
+        tokenizer = summarizer.tokenizer
+        input_ids = torch.tensor([tokenizer.build_inputs_with_special_tokens(ids)])
+        with REGISTRY.span("aimodels_stage_seconds", model="summarizer", stage="forward"), torch.no_grad():
+            output = summarizer.model.generate(input_ids=input_ids, attention_mask=torch.ones_like(input_ids),
+                                               **SUMMARY_KWARGS)
+        return tokenizer.decode(output[0], skip_special_tokens=True).strip()
+
+    def _sentiment_from_ids(self, ids):
+        import torch
+        analyzer = self.sentiment_analyzer
+        tokenizer = analyzer.tokenizer
+        ids = ids[:token_limit(tokenizer, default=512)]  # the pipeline would fail on longer input
+        input_ids = torch.tensor([tokenizer.build_inputs_with_special_tokens(ids)])
+        with REGISTRY.span("aimodels_stage_seconds", model="sentiment_analyzer", stage="forward"), torch.no_grad():
+            logits = analyzer.model(input_ids=input_ids, attention_mask=torch.ones_like(input_ids)).logits[0]
+        scores = torch.softmax(logits, dim=-1)
+        best = int(scores.argmax())
+        return format_sentiment({"label": analyzer.model.config.id2label[best], "score": float(scores[best])})
+
+    @instrument
+    def run_multi(self, text: str, tasks=TEXT_TASKS, on_partial=None, cancel_event=None) -> dict:
+        """
+        Run several text tasks on one input, e.g. run_multi(text, ["summarization", "sentiment"]).
+        Models that share a tokenizer (same vocabulary) get the text tokenized once, and the
+        tasks run at the same time on their own threads, so the whole call takes about as long
+        as the slowest task. Returns {task: result}. Results share the cache with the single methods.
+        """
+        tasks = list(dict.fromkeys(tasks))
+        unknown = [task for task in tasks if task not in TEXT_TASKS]
+        if unknown:
+            raise ValueError(f"unknown task(s) {unknown}, use some of {list(TEXT_TASKS)}")
+
+        # answered from the cache where possible (same keys as run_summarization / run_sentiment)
+        results, keys = {}, {}
+        for task in tasks:
+            name = TEXT_TASKS[task]
+            params = self._summary_params() if task == "summarization" else {}
+            keys[task] = self._cache_key(self._model_id(name), params, text)
+            value = self.cache.get(keys[task]) if self.cache is not None else None
+            REGISTRY.inc("aimodels_cache_total", model=self._model_id(name),
+                         result="hit" if value is not None else "miss")
+            if value is not None:
+                results[task] = value
+        todo = [task for task in tasks if task not in results]
+        if not todo:
+            return {task: results[task] for task in tasks}
+
+        with ThreadPoolExecutor(max_workers=len(todo), thread_name_prefix="multi") as pool:
+            # load the models in parallel (no-op when they are loaded already)
+            pipes = dict(zip(todo, pool.map(lambda task: self.registry.get(TEXT_TASKS[task]), todo)))
+
+            # one tokenization per distinct tokenizer
+            ids_by_signature = {}
+            for task in todo:
+                signature = tokenizer_signature(pipes[task].tokenizer)
+                if signature not in ids_by_signature:
+                    with REGISTRY.span("aimodels_stage_seconds", model=TEXT_TASKS[task], stage="tokenization"):
+                        ids_by_signature[signature] = pipes[task].tokenizer(text, add_special_tokens=False)["input_ids"]
+
+            def run(task):
+                ids = ids_by_signature[tokenizer_signature(pipes[task].tokenizer)]
+                if task == "summarization":
+                    return self._summarize(text, on_partial, cancel_event, ids=ids)
+                return self._sentiment_from_ids(ids)
+
+            for task, value in zip(todo, pool.map(run, todo)):
+                results[task] = value
+                if self.cache is not None:
+                    self.cache.put(keys[task], value)
+        return {task: results[task] for task in tasks}
+
+    @instrument
     def run_sentiment(self, text: str) -> str:
-        sentiment = self.sentiment_analyzer(text)[0]
-        return f"{sentiment['label']} (Confidence: {sentiment['score']:.2f})"
+        return self._cached(
+            self._model_id("sentiment_analyzer"), {}, text,
+            lambda: format_sentiment(self.sentiment_analyzer(text)[0]),
+        )
     
-    def run_image_classification(self, image_path: str) -> str:
+    @instrument
+    def run_document_sentiment(self, text: str, batch_size=32) -> dict:
+        """
+        Sentiment of a text of any length, sentence by sentence. Every sentence (sentences longer than
+        the model's 512 tokens are cut into windows) is scored in padded batches, and the logits are
+        combined with NumPy into one document score, weighted by sentence length.
+        Returns {"label", "score", "counts": {label: sentences}, "sentences": [{"text", "label", "score"}]},
+        format_document_sentiment() turns it into text.
+        """
+        return self._cached(
+            self._model_id("sentiment_analyzer"), {"mode": "document"}, text,
+            lambda: self._document_sentiment(text, batch_size),
+        )
+
+    def _document_sentiment(self, text, batch_size):
+        import numpy as np
+        import torch
+        analyzer = self.sentiment_analyzer
+        tokenizer, model = analyzer.tokenizer, analyzer.model
+        sentences = split_sentences(text) or [text]
+
+        # tokenize all sentences in one call, then cut the too-long ones into windows
+        with REGISTRY.span("aimodels_stage_seconds", model="sentiment_analyzer", stage="tokenization"):
+            encoded = tokenizer(sentences, add_special_tokens=False)["input_ids"]
+        limit = token_limit(tokenizer, default=512)
+        segments = [
+            (index, tokenizer.build_inputs_with_special_tokens(window))
+            for index, ids in enumerate(encoded) for window in token_windows(ids, limit)
+        ]
+
+        # longest first, so every batch pads to about the same length
+        order = sorted(range(len(segments)), key=lambda i: len(segments[i][1]), reverse=True)
+        logits = np.zeros((len(segments), model.config.num_labels), dtype=np.float32)
+        with REGISTRY.span("aimodels_stage_seconds", model="sentiment_analyzer", stage="forward"), torch.no_grad():
+            for start in range(0, len(order), batch_size):
+                rows = order[start:start + batch_size]
+                batch = tokenizer.pad({"input_ids": [segments[i][1] for i in rows]}, return_tensors="pt")
+                logits[rows] = model(**batch).logits.float().numpy()
+
+        # softmax per segment, then length-weighted means per sentence and for the whole document
+        probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probs /= probs.sum(axis=1, keepdims=True)
+        owner = np.array([index for index, _ in segments])
+        weights = np.array([len(ids) for _, ids in segments], dtype=np.float32)
+        sentence_probs = np.zeros((len(sentences), probs.shape[1]), dtype=np.float32)
+        np.add.at(sentence_probs, owner, probs * weights[:, None])
+        sentence_weights = np.bincount(owner, weights=weights, minlength=len(sentences))
+        sentence_probs /= sentence_weights[:, None]
+        document_probs = sentence_weights @ sentence_probs / sentence_weights.sum()
+
+        labels = [model.config.id2label[i] for i in range(probs.shape[1])]
+        best = sentence_probs.argmax(axis=1)
+        counts = np.bincount(best, minlength=len(labels))
+        return {
+            "label": labels[int(document_probs.argmax())],
+            "score": float(document_probs.max()),
+            "counts": {label: int(n) for label, n in zip(labels, counts)},
+            "sentences": [
+                {"text": sentence, "label": labels[int(b)], "score": float(sentence_probs[i, b])}
+                for i, (sentence, b) in enumerate(zip(sentences, best))
+            ],
+        }
+
+    @instrument
+    def run_image_classification(self, image_path: str, top_k=None) -> str:
        """ takes path of an image and runs classification, then returns the top prediction with 
        confidence score. Eg: if  we upload a pic of a dog, it will display:
        Top Predictions:
        1. labrador (confidence: 0.90) ... likewise
+       top_k sets how many predictions are listed (the pipeline's default is 5)
        """
 
-       results = self.image_classifier(image_path) # runs image and returns a list of labels and scores
-       top_result=results[0]                        #this is the highest confidence prediction
-       
-       output = f"Classification: {top_result['label']} (Confidence: {top_result['score']:.2f})\n\n"
-
-       output += "Top Predictions:\n" 
-       for i, r in enumerate (results, start=1):
-           label = r['label']
-           score = r['score']
-           output += f"{i} {label} (Confidence: {score:.2f})\n"
-           
-       return output #return after the loop
+       # cached by the image content, so the same picture under another name is a hit too.
+       # the image is decoded straight to 224x224 (JPEG draft mode) instead of full resolution
+       # on a cache miss, a near-identical picture (resized / recompressed) seen before is reused too
+       options = {} if top_k is None else {"top_k": top_k}
+       model_id = self._model_id("image_classifier")
+       return self._cached(
+           model_id, options, self.images.file_digest(image_path),
+           lambda: self._near_duplicate(
+               image_path, model_id, options,
+               lambda: format_classification(self.image_classifier(self.images.model_input(image_path), **options)), # runs image and returns a list of labels and scores
+               PHASH_CLASSIFY_DISTANCE),
+       )
+
+    @instrument
+    def run_zero_shot_classification(self, image_path: str, labels, top_k=5) -> str:
+        """
+        Classify an image into your own labels with CLIP, e.g. ["cat", "dog", "receipt"].
+        The label embeddings are computed once per label set and reused, so after the first call
+        this is one image encode plus one matrix product, even for thousands of labels.
+        """
+        labels = list(labels)
+        params = {"labels": self.zero_shot.label_set_key(labels), "top_k": top_k}
+        return self._cached(
+            self.zero_shot.model_id, params, self.images.file_digest(image_path),
+            lambda: self._near_duplicate(
+                image_path, self.zero_shot.model_id, params,
+                lambda: format_classification(self.zero_shot.classify(image_path, labels, top_k)),
+                PHASH_CLASSIFY_DISTANCE),
+        )
+
+    # ======================
+    # Batch versions
+    # ======================
+    # Same models, but a whole list goes through the pipeline with batch_size inputs per forward pass.
+    # Results always come back in the same order as the inputs.
+
+    # Cached items are answered from the cache, only the rest go through the model.
+
+    @instrument
+    def run_summarization_batch(self, texts, batch_size=DEFAULT_BATCH_SIZE):
+        def compute(items):
+            # texts longer than the model window would be cut off in a batch,
+            # so those go through the chunked run_summarization path instead
+            tokenizer = self.summarizer.tokenizer
+            limit = token_limit(tokenizer)
+            lengths = [len(ids) for ids in tokenizer(items, add_special_tokens=False)["input_ids"]]
+            short = [i for i, n in enumerate(lengths) if n <= limit]
+
+            results = [None] * len(items)
+            outputs = self._run_batch(
+                "summarization", self.summarizer, [items[i] for i in short], batch_size, sort_key=len, **SUMMARY_KWARGS
+            )
+            for i, out in zip(short, outputs):
+                results[i] = first(out)['summary_text']
+            for i, n in enumerate(lengths):
+                if n > limit:
+                    results[i] = self._summarize(items[i], batch_size=SUMMARY_CHUNK_BATCH)
+            return results
+        return self._cached_batch(self._model_id("summarizer"), self._summary_params(),
+                                  list(texts), lambda text: text, compute)
+
+    @instrument
+    def run_sentiment_batch(self, texts, batch_size=DEFAULT_BATCH_SIZE):
+        def compute(items):
+            outputs = self._run_batch("sentiment", self.sentiment_analyzer, items, batch_size, sort_key=len)
+            return [format_sentiment(first(out)) for out in outputs]
+        return self._cached_batch(self._model_id("sentiment_analyzer"), {}, list(texts), lambda text: text, compute)
+
+    @instrument
+    def run_image_classification_batch(self, image_paths, batch_size=DEFAULT_BATCH_SIZE):
+        # every image is resized to 224x224 by the processor, so there is no padding to save by sorting
+        def compute(items):
+            # PIL releases the GIL while decoding, so a few threads decode the batch in parallel
+            with ThreadPoolExecutor(max_workers=min(8, len(items))) as pool:
+                decoded = list(pool.map(self.images.model_input, items))
+            outputs = self._run_batch("image_classification", self.image_classifier, decoded, batch_size)
+            return [format_classification(out) for out in outputs]
+        return self._cached_batch(self._model_id("image_classifier"), {}, list(image_paths),
+                                  self.images.file_digest, compute)
+
+    def _run_batch(self, task, pipe, items, batch_size, sort_key=None, **kwargs):
+        items = list(items)
+        if not items:
+            return []
+
+        # longest texts first so each batch holds similar lengths and needs less padding
+        order = list(range(len(items)))
+        if sort_key is not None:
+            order.sort(key=lambda i: sort_key(items[i]), reverse=True)
+
+        start = time.perf_counter()
+        sorted_outputs = pipe([items[i] for i in order], batch_size=batch_size, **kwargs)
+        seconds = time.perf_counter() - start
+
+        # put the results back into input order
+        outputs = [None] * len(items)
+        for position, index in enumerate(order):
+            outputs[index] = sorted_outputs[position]
+
+        self.batch_stats[task] = {
+            "items": len(items),
+            "batch_size": batch_size,
+            "seconds": seconds,
+            "items_per_second": len(items) / seconds if seconds > 0 else float("inf"),
+        }
+        return outputs
     
     #adding the ocr function to read text from image
     # this is when we select Image and Summarization combo in the GUI
     
     
-    def run_ocr(self, image_path):
+    # OCR goes through ocr.OCREngine: pages and big scans are cleaned up (greyscale,
+    # shrink, black/white) and read by tesseract in parallel worker processes.
+
+    def decode_for_ocr(self, image_path):
+        # single images are decoded through the shared loader (so the preview / classifier decode
+        # is reused), multi-page TIFFs are left to the OCR workers page by page.
+        # timed as its own stage, so run_ocr's call metrics stay comparable with before
+        with REGISTRY.span("aimodels_stage_seconds", model=OCR_MODEL_ID, stage="decode"):
+            if count_pages(image_path) == 1:
+                return {image_path: self.images.ocr_input(image_path)}
+            return None
+
+    def has_cached_ocr(self, image_path) -> bool:
+        """Whether run_ocr would answer from the result cache, so the image doesn't need decoding."""
+        if self.cache is None:
+            return False
+        return self.cache.contains(self._cache_key(OCR_MODEL_ID, {}, self.images.file_digest(image_path)))
+
+    @instrument
+    def run_ocr(self, image_path, decoded=None):
+        # decoded: what decode_for_ocr() returned, when the caller decoded the image already
         try:
-            img = Image.open(image_path)
-            text = pytesseract.image_to_string(img)
-            return text
+            return self._cached(
+                OCR_MODEL_ID, {}, self.images.file_digest(image_path),
+                lambda: self.ocr_engine.image_to_text(
+                    image_path, decoded if decoded is not None else self.decode_for_ocr(image_path)),
+            )
         except Exception as e:
             return f"OCR failed: {str(e)}"
-    
+
+    @instrument
+    def run_ocr_batch(self, image_paths):
+        """OCR many images at once (all of them are in the process pool together), input order kept."""
+        def compute(paths):
+            texts = {path: [] for path in paths}
+            errors = {}
+            for page in self.ocr_engine.iter_pages(paths):
+                if page.error:
+                    errors[page.path] = page.error
+                else:
+                    texts[page.path].append(page.text)
+            return [
+                f"OCR failed: {errors[path]}" if path in errors else "\n".join(texts[path])
+                for path in paths
+            ]
+
+        def payload(path):
+            try:
+                return self.images.file_digest(path)
+            except OSError:
+                return path  # unreadable file, compute() reports the error
+
+        return self._cached_batch(
+            OCR_MODEL_ID, {}, list(image_paths), payload, compute,
+            should_cache=lambda text: not text.startswith("OCR failed"),
+        )
+
+    @instrument
+    def run_ocr_summarization(self, image_path, on_partial=None, cancel_event=None) -> str:
+        """
+        OCR an image (every page of a multi-page TIFF) and summarize it. Each page is summarized
+        as soon as tesseract has read it, while the later pages are still in OCR, and the page
+        summaries are combined at the end. Raises RuntimeError("OCR failed: ...") if OCR fails.
+        """
+        def compute():
+            page_summaries = []
+            decoded = self.decode_for_ocr(image_path)
+            for page in self.ocr_engine.iter_pages([image_path], cancel_event, decoded=decoded):
+                if page.error:
+                    raise RuntimeError(f"OCR failed: {page.error}")
+                text = page.text.strip()
+                if not text:
+                    continue
+                # a single page can stream its own chunk summaries, for more pages we report per page
+                if page.pages == 1:
+                    return self.run_summarization(text, on_partial=on_partial, cancel_event=cancel_event)
+                page_summaries.append(self.run_summarization(text, cancel_event=cancel_event))
+                if on_partial is not None:
+                    on_partial(page.page + 1, page.pages, page_summaries[-1])
+
+            if cancel_event is not None and cancel_event.is_set():
+                raise InterruptedError("summarization was cancelled")
+            if not page_summaries:
+                raise RuntimeError("OCR failed: no text found in this image")
+            if len(page_summaries) == 1:
+                return page_summaries[0]
+            return self.run_summarization(" ".join(page_summaries), cancel_event=cancel_event)
+
+        return self._cached(
+            self._model_id("summarizer"), dict(self._summary_params(), source=OCR_MODEL_ID),
+            self.images.file_digest(image_path), compute,
+        )
+
+    def close(self):
+        """Stop the OCR worker processes (call when the app / server shuts down)."""
+        self.ocr_engine.shutdown()
+
+
+def tokenizer_signature(tokenizer):
+    """Two tokenizers with the same signature turn a text into the same ids."""
+    return type(tokenizer).__name__, getattr(tokenizer, "name_or_path", ""), len(tokenizer)
+
+
+def first(result):
+    """Pipelines sometimes wrap a single result in a list, this unwraps it."""
+    return result[0] if isinstance(result, list) else result
+
+
+def format_sentiment(sentiment) -> str:
+    return f"{sentiment['label']} (Confidence: {sentiment['score']:.2f})"
+
+
+def format_document_sentiment(result) -> str:
+    output = f"Document sentiment: {format_sentiment(result)}\n"
+    output += f"{len(result['sentences'])} sentences: " + ", ".join(
+        f"{n} {label.lower()}" for label, n in result["counts"].items()) + "\n\n"
+    output += "Per sentence:\n"
+    for i, sentence in enumerate(result["sentences"], start=1):
+        text = " ".join(sentence["text"].split())
+        text = text if len(text) <= 80 else text[:77] + "..."
+        output += f"{i} {sentence['label']} ({sentence['score']:.2f})  {text}\n"
+    return output
+
+
+def format_classification(results) -> str:
+    top_result = results[0]                        #this is the highest confidence prediction
+
+    output = f"Classification: {top_result['label']} (Confidence: {top_result['score']:.2f})\n\n"
+
+    output += "Top Predictions:\n"
+    for i, r in enumerate(results, start=1):
+        label = r['label']
+        score = r['score']
+        output += f"{i} {label} (Confidence: {score:.2f})\n"
+
+    return output #return after the loop
+
+
 # Testing methods
 """ if __name__ == "__main__": 
     models = AIModels()
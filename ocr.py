@@ -0,0 +1,234 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+
+import pytesseract
+from PIL import Image, ImageOps
+
+from instrumentation import REGISTRY
+
+# Parallel OCR for the Image + Summarization path.
+#
+# The work is split into pages (every frame of a multi-page TIFF is its own page) and big pages
+# are split again into horizontal strips ("tiles"). Pages are decoded + cleaned up in worker
+# processes, then every tile is read by tesseract in the pool as well, so many images / pages /
+# tiles are recognised at the same time and throughput grows with the number of cores.
+
+# images whose longest side is bigger than this are shrunk first (tesseract gains nothing from more)
+OCR_MAX_SIDE = 3500
+# pages taller than this are cut into strips that are recognised in parallel
+OCR_TILE_HEIGHT = 1200
+# when cutting, look this many pixels around the cut for an empty row so no text line is split
+OCR_CUT_SEARCH = 80
+
+
+@dataclass
+class OCRPage:
+    path: str
+    page: int        # 0 based page / frame number
+    pages: int       # total pages in this file
+    text: str
+    error: str = None
+
+
+def count_pages(path) -> int:
+    # only reads the header, the pixels are not decoded here
+    with Image.open(path) as img:
+        return getattr(img, "n_frames", 1)
+
+
+def otsu_threshold(histogram) -> int:
+    """Pick the grey level that best separates ink from paper (Otsu's method)."""
+    total = sum(histogram)
+    sum_all = sum(i * h for i, h in enumerate(histogram))
+    sum_bg = weight_bg = 0
+    best_level, best_score = 127, -1.0
+    for level, count in enumerate(histogram):
+        weight_bg += count
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += level * count
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        score = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if score > best_score:
+            best_level, best_score = level, score
+    return best_level
+
+
+def preprocess(img, max_side=OCR_MAX_SIDE):
+    """Greyscale -> shrink if huge -> black and white. Smaller + cleaner input is faster to read."""
+    if img.mode in ("RGBA", "LA", "P"):
+        # put transparent images on white paper first, otherwise the background turns black
+        img = img.convert("RGBA")
+        background = Image.new("RGBA", img.size, "white")
+        img = Image.alpha_composite(background, img)
+    img = ImageOps.grayscale(img)
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+    img = ImageOps.autocontrast(img)
+    threshold = otsu_threshold(img.histogram())
+    return img.point(lambda p: 255 if p > threshold else 0, mode="L")
+
+
+def split_into_tiles(img, tile_height=OCR_TILE_HEIGHT, search=OCR_CUT_SEARCH):
+    """Cut a tall page into strips, moving every cut to the whitest row nearby."""
+    width, height = img.size
+    if height <= tile_height:
+        return [img]
+
+    # average brightness of every row, done by squashing the image to 1 pixel wide
+    row_brightness = list(img.resize((1, height), Image.BOX).getdata())
+
+    tiles, top = [], 0
+    while height - top > tile_height:
+        target = top + tile_height
+        low, high = max(top + 1, target - search), min(height - 1, target + search)
+        cut = max(range(low, high + 1), key=lambda row: row_brightness[row])
+        tiles.append(img.crop((0, top, width, cut)))
+        top = cut
+    tiles.append(img.crop((0, top, width, height)))
+    return tiles
+
+
+# ---- these run inside the worker processes ----
+
+def _worker_init():
+    # tesseract uses OpenMP threads itself, with one tesseract per core that just oversubscribes
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _load_page(source, page, config):
+    """
+    Decode + preprocess one page. source is a file path, or an image the parent already decoded.
+    Small pages are recognised right away to save a round trip.
+    """
+    if isinstance(source, Image.Image):
+        prepared = preprocess(source)
+    else:
+        with Image.open(source) as img:
+            if page:
+                img.seek(page)
+            prepared = preprocess(img)
+    tiles = split_into_tiles(prepared)
+    if len(tiles) == 1:
+        return "text", pytesseract.image_to_string(tiles[0], config=config)
+    return "tiles", tiles
+
+
+def _recognise(tile, config):
+    return pytesseract.image_to_string(tile, config=config)
+
+
+class OCREngine:
+    """Process pool that OCRs many images / pages / tiles at once. Safe to share between threads."""
+
+    def __init__(self, max_workers=None, config=""):
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self.config = config
+        self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            # spawn instead of fork: the parent may already have torch threads running
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_worker_init,
+            )
+        return self._pool
+
+    def iter_pages(self, paths, cancel_event=None, decoded=None):
+        """
+        Yield an OCRPage for every page of every file. Pages of the same file come out in order,
+        each one as soon as it and the pages before it are done, so callers can start
+        summarizing page 1 while later pages are still being read.
+        decoded can map a path to an already decoded single-page image to skip decoding it again.
+        """
+        decoded = decoded or {}
+        pending = {}     # future -> (path, page, tile or None)
+        page_parts = {}  # (path, page) -> list of tile texts
+        next_page = {}   # path -> next page number to yield
+        finished = {}    # (path, page) -> OCRPage waiting for earlier pages
+        page_counts = {}
+        submitted = {}   # (path, page) -> submit time, for the ocr_page_seconds metric
+        failed = set()   # (path, page) that already failed, their remaining tiles are ignored
+
+        for path in paths:
+            try:
+                page_counts[path] = 1 if path in decoded else count_pages(path)
+            except Exception as e:
+                yield OCRPage(path, 0, 1, "", error=str(e))
+                continue
+            next_page[path] = 0
+            for page in range(page_counts[path]):
+                submitted[(path, page)] = time.perf_counter()
+                source = decoded.get(path, path)
+                pending[self.pool.submit(_load_page, source, page, self.config)] = (path, page, None)
+
+        try:
+            while pending:
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, page, tile = pending.pop(future)
+                    key = (path, page)
+                    if key in failed:
+                        continue  # another tile of this page already failed
+                    try:
+                        kind, value = ("text", future.result()) if tile is not None else future.result()
+                    except Exception as e:
+                        # the page is reported once, tiles of it that finish later are dropped
+                        failed.add(key)
+                        finished[key] = OCRPage(path, page, page_counts[path], "", error=str(e))
+                        page_parts.pop(key, None)
+                        continue
+
+                    if kind == "tiles":
+                        page_parts[key] = [None] * len(value)
+                        for i, tile_img in enumerate(value):
+                            pending[self.pool.submit(_recognise, tile_img, self.config)] = (path, page, i)
+                        continue
+                    if tile is None:
+                        finished[key] = OCRPage(path, page, page_counts[path], value)
+                        continue
+                    parts = page_parts[key]
+                    parts[tile] = value
+                    if all(part is not None for part in parts):
+                        del page_parts[key]
+                        finished[key] = OCRPage(path, page, page_counts[path], "\n".join(parts))
+
+                # hand out every page whose earlier pages are already out
+                for path in list(next_page):
+                    while (path, next_page[path]) in finished:
+                        page = finished.pop((path, next_page[path]))
+                        REGISTRY.observe("ocr_page_seconds", time.perf_counter() - submitted.pop((path, page.page)),
+                                         status="error" if page.error else "ok")
+                        yield page
+                        next_page[path] += 1
+                    if next_page[path] >= page_counts[path]:
+                        del next_page[path]
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def image_to_text(self, path, decoded=None) -> str:
+        """All pages of one file joined together. Raises if any page failed."""
+        texts = []
+        for page in self.iter_pages([path], decoded=decoded):
+            if page.error:
+                raise RuntimeError(page.error)
+            texts.append(page.text)
+        return "\n".join(texts)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
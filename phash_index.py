@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+from array import array
+from itertools import combinations
+
+from PIL import Image
+
+from image_loader import SHARED_LOADER
+from instrumentation import REGISTRY
+
+# Near-duplicate lookup for images: the same photo re-saved, resized or recompressed gets the
+# classification stored for the first copy instead of running the model again.
+# (Not used for OCR: a 9x8 hash can't tell two text pages with the same layout apart.)
+#
+# - every image gets a 64 bit difference hash (dHash): shrink to 9x8 grey pixels and keep one bit
+#   per "is this pixel brighter than its right neighbour". Resizing and JPEG recompression flip
+#   only a few bits, so near-duplicates are a small Hamming distance apart
+# - multi-index hashing: the 64 bits are split into 4 segments of 16 bits with one dict per segment.
+#   Two hashes within distance r must have at least one segment within r // 4 bits (pigeonhole),
+#   so a lookup only probes the few segment values that close and checks those candidates,
+#   instead of comparing against every stored hash. Lookups stay well under a millisecond at
+#   hundreds of thousands of images
+# - hashes are kept in an array of unsigned 64 bit ints (8 bytes per image). On disk every result is
+#   one line {"hash", "kind", "result"} appended to index.jsonl, so adding an image never rewrites the
+#   index and a hash can't end up next to another image's result. A line cut off by a crash is cut
+#   off the file on the next load, so later lines start clean
+
+PHASH_INDEX_DIR = os.path.join(".cache", "phash")
+SEGMENTS = 4
+SEGMENT_BITS = 16
+SEGMENT_MASK = (1 << SEGMENT_BITS) - 1
+
+
+def dhash(image) -> int:
+    """64 bit difference hash of a PIL image."""
+    small = image.convert("L").resize((9, 8), Image.BILINEAR)
+    pixels = small.tobytes()  # one byte per grey pixel, row by row
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hamming(a, b) -> int:
+    return (a ^ b).bit_count()
+
+
+def _segments(value):
+    return [(value >> (SEGMENT_BITS * i)) & SEGMENT_MASK for i in range(SEGMENTS)]
+
+
+def _neighbours(segment, radius):
+    """Every 16 bit value within radius bits of segment (itself included)."""
+    values = [segment]
+    for flips in range(1, radius + 1):
+        for bits in combinations(range(SEGMENT_BITS), flips):
+            mask = 0
+            for bit in bits:
+                mask |= 1 << bit
+            values.append(segment ^ mask)
+    return values
+
+
+class PerceptualIndex:
+    def __init__(self, disk_dir=PHASH_INDEX_DIR, loader=SHARED_LOADER):
+        self.disk_dir = disk_dir
+        self.loader = loader
+        self.hashes = array("Q")     # row -> 64 bit hash
+        self.results = []            # row -> {kind: result}
+        self._rows = {}              # hash -> row, exact duplicates share one row
+        self._tables = [dict() for _ in range(SEGMENTS)]  # segment value -> list of rows
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.write_errors = 0  # results that only made it into memory, see stats()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._load()
+
+    # ---- persistence ----
+    @property
+    def path(self):
+        return os.path.join(self.disk_dir, "index.jsonl")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            # the last write was cut off: drop it from the file too, or the next line would be glued to it
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+                self._store(int(entry["hash"], 16), entry["kind"], entry["result"])
+            except (ValueError, KeyError, TypeError):
+                continue  # broken line, the other entries are still fine
+
+    def _append(self, value, kind, result):
+        line = json.dumps({"hash": f"{value:016x}", "kind": kind, "result": result}, ensure_ascii=False) + "\n"
+        try:
+            with open(self.path, "ab") as f:
+                start = f.tell()
+                try:
+                    f.write(line.encode("utf-8"))
+                    f.flush()
+                except OSError:
+                    f.truncate(start)  # don't leave half a line behind
+                    raise
+        except OSError:
+            # the result stays in memory for this run; counted so it shows up in stats and the metrics
+            self.write_errors += 1
+            REGISTRY.inc("aimodels_phash_write_errors_total")
+
+    # ---- index ----
+    def _store(self, value, kind, result):
+        row = self._rows.get(value)
+        if row is None:
+            row = len(self.hashes)
+            self.hashes.append(value)
+            self.results.append({})
+            self._rows[value] = row
+            for table, segment in zip(self._tables, _segments(value)):
+                table.setdefault(segment, []).append(row)
+        self.results[row][kind] = result
+
+    def hash_image(self, image_path) -> int:
+        # the 224x224 decode is the one the classifier uses, so it's usually already in the loader's cache
+        return dhash(self.loader.model_input(image_path))
+
+    def nearest(self, value, kind, max_distance):
+        """(row, distance) of the closest stored hash with a result of this kind, or None."""
+        row = self._rows.get(value)
+        if row is not None and kind in self.results[row]:
+            return row, 0
+        radius = max_distance // SEGMENTS
+        best = None
+        seen = set()
+        for table, segment in zip(self._tables, _segments(value)):
+            for probe in _neighbours(segment, radius):
+                for row in table.get(probe, ()):
+                    if row in seen or kind not in self.results[row]:
+                        continue
+                    seen.add(row)
+                    distance = hamming(self.hashes[row], value)
+                    if distance <= max_distance and (best is None or distance < best[1]):
+                        best = (row, distance)
+        return best
+
+    def lookup(self, value, kind, max_distance):
+        """Stored result of this kind for a near-duplicate of value, or None."""
+        with self._lock:
+            match = self.nearest(value, kind, max_distance)
+            if match is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self.results[match[0]][kind]
+
+    def add(self, value, kind, result):
+        """Remember result for the image with hash value."""
+        with self._lock:
+            self._store(value, kind, result)
+            if self.disk_dir:
+                self._append(value, kind, result)
+
+    def stats(self):
+        with self._lock:
+            return {"images": len(self.hashes), "hits": self.hits, "misses": self.misses,
+                    "write_errors": self.write_errors}
+
+    def __len__(self):
+        return len(self.hashes)
@@ -0,0 +1,330 @@
+# Local HTTP inference server: keeps the models loaded in one process so other programs
+# (and several GUIs, see client.py) can share one warm model host.
+#
+#   python server.py --host 0.0.0.0 --port 8765
+#
+# Endpoints (JSON in, JSON out):
+#   POST /summarize  {"text": "..."}           -> {"result": "..."}
+#   POST /sentiment  {"text": "..."}           -> {"result": "POSITIVE (Confidence: 0.99)"}
+#   POST /classify   {"image": "<base64>"}     -> {"result": "Classification: ..."}
+#   POST /ocr        {"image": "<base64>"}     -> {"result": "extracted text"}
+#   GET  /health                                -> {"status": "ok", "queues": {...}}
+#   GET  /metrics                               -> Prometheus text
+#
+# Requests that arrive close together are put into one micro-batch per model (up to max_batch
+# items, waiting at most max_wait ms for more). When a model's queue is full the server answers
+# 503 straight away instead of piling up work (backpressure).
+
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from models import AIModels, MODEL_SPECS
+from instrumentation import REGISTRY
+
+MAX_BODY_BYTES = 20 * 1024 * 1024
+
+
+@dataclass
+class BatchConfig:
+    max_batch: int
+    max_wait_ms: float
+    max_queue: int
+
+
+# endpoint -> defaults, small batches for the slow summarizer and big ones for sentiment
+DEFAULT_BATCHING = {
+    "summarize": BatchConfig(max_batch=4, max_wait_ms=50, max_queue=64),
+    "sentiment": BatchConfig(max_batch=32, max_wait_ms=10, max_queue=512),
+    "classify": BatchConfig(max_batch=16, max_wait_ms=20, max_queue=256),
+    "ocr": BatchConfig(max_batch=8, max_wait_ms=20, max_queue=128),
+}
+
+
+class Overloaded(Exception):
+    """The queue for a model is full, the client should retry later."""
+
+
+class MicroBatcher:
+    """
+    Collects single requests into batches for one model. Each batcher has its own worker
+    thread, so a batch of summaries never blocks a batch of sentiments.
+    """
+
+    def __init__(self, name, batch_fn, config):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.config = config
+        self.queue = asyncio.Queue(maxsize=config.max_queue)
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"batch-{name}")
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            REGISTRY.inc("server_rejected_total", endpoint=self.name)
+            raise Overloaded(f"{self.name} queue is full ({self.config.max_queue} waiting)")
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.config.max_wait_ms / 1000
+            while len(batch) < self.config.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # clients that disconnected meanwhile don't need their item computed
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+            REGISTRY.observe("server_batch_size", len(batch), buckets=(1, 2, 4, 8, 16, 32, 64), endpoint=self.name)
+            try:
+                results = await loop.run_in_executor(self._thread, self.batch_fn, [item for item, _ in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    if not batch[0][1].done():
+                        batch[0][1].set_exception(e)
+                    continue
+                # one bad input shouldn't fail everyone batched with it: retry the items one by one
+                # (like cli.process_batch) and only fail the ones that fail on their own too
+                REGISTRY.inc("server_batch_retries_total", endpoint=self.name)
+                for item, future in batch:
+                    try:
+                        result = (await loop.run_in_executor(self._thread, self.batch_fn, [item]))[0]
+                    except Exception as item_error:
+                        if not future.done():
+                            future.set_exception(item_error)
+                        continue
+                    if not future.done():
+                        future.set_result(result)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        self._thread.shutdown(wait=False, cancel_futures=True)
+
+
+class ImageFiles:
+    """Batch functions in AIModels take paths, so uploaded images are written to temp files."""
+
+    def __init__(self):
+        # removed again by close() (or when the object is garbage collected)
+        self._tmp = tempfile.TemporaryDirectory(prefix="aimodels-server-")
+        self.folder = self._tmp.name
+
+    def close(self):
+        self._tmp.cleanup()
+
+    def wrap(self, batch_fn):
+        def run(images):
+            paths = []
+            try:
+                for data in images:
+                    fd, path = tempfile.mkstemp(dir=self.folder)
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(data)
+                    paths.append(path)
+                return batch_fn(paths)
+            finally:
+                for path in paths:
+                    os.remove(path)
+        return run
+
+
+class InferenceServer:
+    def __init__(self, models, batching=None):
+        self.models = models
+        batching = batching or DEFAULT_BATCHING
+        self.images = images = ImageFiles()
+        self.batchers = {
+            "summarize": MicroBatcher("summarize", models.run_summarization_batch, batching["summarize"]),
+            "sentiment": MicroBatcher("sentiment", models.run_sentiment_batch, batching["sentiment"]),
+            "classify": MicroBatcher("classify", images.wrap(models.run_image_classification_batch),
+                                     batching["classify"]),
+            "ocr": MicroBatcher("ocr", images.wrap(models.run_ocr_batch), batching["ocr"]),
+        }
+
+    async def serve(self, host, port):
+        for batcher in self.batchers.values():
+            batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving on http://{host}:{port}", file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for batcher in self.batchers.values():
+                batcher.stop()
+            self.images.close()
+
+    # ---- HTTP ----
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                start = time.perf_counter()
+                status, payload, content_type = await self.route(method, path, body)
+                REGISTRY.observe("server_request_seconds", time.perf_counter() - start,
+                                 route=self.route_name(path), status=status)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self.send(writer, status, payload, content_type, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as e:
+            await self.send(writer, 400, {"error": str(e)}, keep_alive=False)
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, path, _version = line.decode("latin-1").split()
+        except ValueError:
+            raise ValueError("bad request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY_BYTES:
+            raise ValueError(f"request body too large (max {MAX_BODY_BYTES} bytes)")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    async def send(self, writer, status, payload, content_type="application/json", keep_alive=True):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                   500: "Internal Server Error", 503: "Service Unavailable"}
+        body = payload.encode("utf-8") if isinstance(payload, str) else json.dumps(payload).encode("utf-8")
+        head = [
+            f"HTTP/1.1 {status} {reasons.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if status == 503:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    def route_name(self, path):
+        # metric label for a request: one of the known routes, so random paths can't create new series
+        name = path.split("?", 1)[0].strip("/")
+        return name if name in self.batchers or name in ("health", "metrics") else "unknown"
+
+    async def route(self, method, path, body):
+        """Returns (status, payload, content type)."""
+        path = path.split("?", 1)[0]  # no endpoint takes query parameters, same as route_name()
+        if method == "GET" and path == "/health":
+            queues = {name: b.queue.qsize() for name, b in self.batchers.items()}
+            return 200, {"status": "ok", "queues": queues, "models": list(self.models.load_stats)}, "application/json"
+        if method == "GET" and path == "/metrics":
+            return 200, REGISTRY.to_prometheus(), "text/plain; version=0.0.4"
+
+        endpoint = path.strip("/")
+        if endpoint not in self.batchers:
+            return 404, {"error": f"unknown endpoint {path}"}, "application/json"
+        if method != "POST":
+            return 405, {"error": "use POST"}, "application/json"
+
+        # only problems with the request itself are 400, errors from the model below are 500
+        try:
+            item = self.parse_item(endpoint, json.loads(body or b"{}"))
+        except (ValueError, KeyError, binascii.Error) as e:
+            return 400, {"error": f"bad request: {e}"}, "application/json"
+        try:
+            result = await self.batchers[endpoint].submit(item)
+        except Overloaded as e:
+            return 503, {"error": str(e)}, "application/json"
+        except Exception as e:
+            return 500, {"error": str(e)}, "application/json"
+        return 200, {"result": result}, "application/json"
+
+    @staticmethod
+    def parse_item(endpoint, request):
+        if not isinstance(request, dict):
+            raise ValueError("the body must be a JSON object")
+        if endpoint in ("summarize", "sentiment"):
+            text = request["text"]
+            if not isinstance(text, str) or not text.strip():
+                raise ValueError("'text' must be a non-empty string")
+            return text
+        if not isinstance(request["image"], str):
+            raise ValueError("'image' must be a base64 string")
+        return base64.b64decode(request["image"], validate=True)
+
+
+def parse_batching(values):
+    """--batching summarize=4,50 -> max batch 4, max wait 50 ms for the summarize endpoint."""
+    batching = {name: BatchConfig(**vars(config)) for name, config in DEFAULT_BATCHING.items()}
+    for value in values or []:
+        name, _, settings = value.partition("=")
+        max_batch, max_wait = settings.split(",")
+        batching[name].max_batch = int(max_batch)
+        batching[name].max_wait_ms = float(max_wait)
+    return batching
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the AI models over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--batching", action="append", metavar="ENDPOINT=MAX_BATCH,MAX_WAIT_MS",
+                        help="micro-batch settings per endpoint, e.g. --batching sentiment=64,5")
+    parser.add_argument("--max-queue", type=int, help="queue limit for every endpoint")
+    parser.add_argument("--cache-dir", help="keep results on disk between restarts")
+    args = parser.parse_args(argv)
+
+    batching = parse_batching(args.batching)
+    if args.max_queue:
+        for config in batching.values():
+            config.max_queue = args.max_queue
+
+    from cache import ResultCache
+    cache = ResultCache(max_items=4096, disk_dir=args.cache_dir) if args.cache_dir else None
+    # load everything before accepting requests so the first clients don't pay for it
+    models = AIModels(preload=list(MODEL_SPECS), background=False, cache=cache)
+    try:
+        asyncio.run(InferenceServer(models, batching).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        models.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass
+
+from instrumentation import REGISTRY
+from models import format_sentiment
+
+# A small stage graph: every stage has its own worker threads and a bounded queue in front of it,
+#
+#   decode (2) -> [queue] -> ocr (2) -> [queue] -> summarize (1) -> [queue] -> sentiment (1)
+#
+# so image 3 can be decoded while image 2 is in OCR and image 1 is being summarized, instead of
+# every image going through all steps before the next one starts. When a stage falls behind, its
+# queue fills up and the stages before it wait (back pressure) instead of piling up decoded images.
+#
+# Items are plain dicts that every stage adds its result to. An item that failed in one stage
+# carries "error" and skips the remaining stages, so every submitted item comes out at the end.
+# Queue depth and busy workers per stage go to the metrics registry (pipeline_* gauges), and
+# stats() gives the occupancy: the stage with ~100% occupancy and a full queue is the bottleneck.
+
+_END = object()  # put behind the last item, tells the workers to stop
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: object            # fn(item) -> None, adds its result to the item dict
+    workers: int = 1
+    queue_size: int = 4   # items that may wait in front of this stage
+
+
+class StageGraph:
+    def __init__(self, stages, graph="pipeline"):
+        self.stages = list(stages)
+        self.graph = graph
+        self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._remaining = [stage.workers for stage in self.stages]   # workers still running per stage
+        self._busy = [0] * len(self.stages)
+        self._busy_seconds = [0.0] * len(self.stages)
+        self._processed = [0] * len(self.stages)
+        self._max_depth = [0] * len(self.stages)
+        self._cancelled = threading.Event()
+        self._threads = []
+        self._started_at = None
+
+    # ---- running ----
+    def start(self):
+        self._started_at = time.perf_counter()
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(index,), name=f"{self.graph}-{stage.name}-{n}",
+                                          daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def submit(self, item):
+        """Add an item at the first stage, waits while that stage's queue is full."""
+        item.setdefault("error", None)
+        item.setdefault("timings", {})
+        self._put(0, item)
+
+    def close(self):
+        """No more items: the workers stop once everything submitted has gone through."""
+        for _ in range(self.stages[0].workers):
+            self._queues[0].put(_END)
+
+    def cancel(self):
+        """Items that haven't started a stage yet skip it and come out with error "cancelled"."""
+        self._cancelled.set()
+
+    def results(self):
+        """Yield items in the order they finish, until the graph is closed and empty."""
+        while True:
+            item = self._results.get()
+            if item is _END:
+                return
+            yield item
+
+    def run(self, items):
+        """Start, feed items from a background thread and yield them as they come out of the last stage."""
+        self.start()
+
+        def feed():
+            try:
+                for item in items:
+                    if self._cancelled.is_set():
+                        break
+                    self.submit(item)
+            finally:
+                self.close()
+
+        threading.Thread(target=feed, name=f"{self.graph}-feed", daemon=True).start()
+        yield from self.results()
+
+    def _put(self, index, item):
+        q = self._queues[index]
+        q.put(item)
+        depth = q.qsize()
+        with self._lock:
+            self._max_depth[index] = max(self._max_depth[index], depth)
+        REGISTRY.set_gauge("pipeline_queue_depth", depth, graph=self.graph, stage=self.stages[index].name)
+
+    def _work(self, index):
+        stage = self.stages[index]
+        q = self._queues[index]
+        try:
+            while True:
+                item = q.get()
+                if item is _END:
+                    return
+                REGISTRY.set_gauge("pipeline_queue_depth", q.qsize(), graph=self.graph, stage=stage.name)
+                if item["error"] is None and self._cancelled.is_set():
+                    item["error"] = "cancelled"
+                if item["error"] is None:
+                    self._process(index, stage, item)
+                if index + 1 < len(self.stages):
+                    self._put(index + 1, item)
+                else:
+                    self._results.put(item)
+        finally:
+            with self._lock:
+                self._remaining[index] -= 1
+                last = self._remaining[index] == 0
+            # the last worker of a stage to stop passes the end marker on to every worker of the next stage
+            if last:
+                if index + 1 < len(self.stages):
+                    for _ in range(self.stages[index + 1].workers):
+                        self._queues[index + 1].put(_END)
+                else:
+                    self._results.put(_END)
+
+    def _process(self, index, stage, item):
+        with self._lock:
+            self._busy[index] += 1
+            busy = self._busy[index]
+        REGISTRY.set_gauge("pipeline_stage_busy", busy, graph=self.graph, stage=stage.name)
+        start = time.perf_counter()
+        try:
+            stage.fn(item)
+        except Exception as e:
+            item["error"] = f"{stage.name} failed: {e}"
+        finally:
+            seconds = time.perf_counter() - start
+            item["timings"][stage.name] = seconds
+            REGISTRY.observe("pipeline_stage_seconds", seconds, graph=self.graph, stage=stage.name)
+            with self._lock:
+                self._busy[index] -= 1
+                self._busy_seconds[index] += seconds
+                self._processed[index] += 1
+                busy = self._busy[index]
+            REGISTRY.set_gauge("pipeline_stage_busy", busy, graph=self.graph, stage=stage.name)
+
+    # ---- reporting ----
+    def stats(self):
+        """Per stage: workers, processed items, queue depth (now / max) and occupancy (0..1)."""
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+        report = {}
+        with self._lock:
+            for index, stage in enumerate(self.stages):
+                occupancy = self._busy_seconds[index] / (elapsed * stage.workers) if elapsed else 0.0
+                report[stage.name] = {
+                    "workers": stage.workers,
+                    "processed": self._processed[index],
+                    "queue_depth": self._queues[index].qsize(),
+                    "max_queue_depth": self._max_depth[index],
+                    "occupancy": occupancy,
+                }
+        for name, info in report.items():
+            REGISTRY.set_gauge("pipeline_stage_occupancy", round(info["occupancy"], 3), graph=self.graph, stage=name)
+        return report
+
+    def bottleneck(self):
+        """Name of the stage with the highest occupancy."""
+        report = self.stats()
+        return max(report, key=lambda name: report[name]["occupancy"]) if report else None
+
+
+# ======================
+# Image -> OCR -> summary (-> sentiment)
+# ======================
+# worker threads per stage. OCR threads hand pages to the OCR process pool, so 2 keep it busy;
+# the models use all cores for one forward pass already, so one summarizer thread is enough
+OCR_GRAPH_WORKERS = {"decode": 2, "ocr": 2, "summarize": 1, "sentiment": 1}
+
+
+def ocr_summary_graph(models, sentiment=False, workers=None):
+    """
+    Graph for image paths: submit {"path": ...}, items come out with "text", "summary"
+    (and "sentiment" or "sentiment_error" if asked for) or "error".
+    """
+    workers = dict(OCR_GRAPH_WORKERS, **(workers or {}))
+
+    def decode(item):
+        # an image whose text is already cached isn't decoded at all, run_ocr answers from the cache
+        # (OCR results are only reused for identical files, see models.PHASH_CLASSIFY_DISTANCE)
+        if not models.has_cached_ocr(item["path"]):
+            item["decoded"] = models.decode_for_ocr(item["path"])
+
+    def ocr(item):
+        text = models.run_ocr(item["path"], decoded=item.pop("decoded", None))
+        if text.startswith("OCR failed"):
+            raise RuntimeError(text[len("OCR failed: "):])
+        if not text.strip():
+            raise RuntimeError("no text found in this image")
+        item["text"] = text.strip()
+
+    def summarize(item):
+        item["summary"] = models.run_summarization(item["text"])
+
+    def score(item):
+        # the last stage: a failure here goes to "sentiment_error" instead of "error",
+        # so the summary of the item still counts as done
+        try:
+            item["sentiment"] = format_sentiment(models.run_document_sentiment(item["text"]))
+        except Exception as e:
+            item["sentiment_error"] = f"sentiment failed: {e}"
+
+    stages = [
+        Stage("decode", decode, workers["decode"]),
+        Stage("ocr", ocr, workers["ocr"]),
+        Stage("summarize", summarize, workers["summarize"]),
+    ]
+    if sentiment:
+        stages.append(Stage("sentiment", score, workers["sentiment"]))
+    return StageGraph(stages, graph="ocr_summary")
@@ -0,0 +1,59 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Startup profile: how long each launch step took, so we can see what dominates the time until
+# the window is up and until every model is ready to answer without a first-call spike.
+#
+#   import gui -> build window -> window shown -> import transformers -> load <model> -> warmup <model>
+#
+# main.py imports this first, so the offsets are measured from (almost) the start of the process.
+# The GUI saves the profile to STARTUP_PROFILE_PATH once warmup has finished.
+
+STARTUP_PROFILE_PATH = os.path.join(".cache", "startup_profile.json")
+
+
+class StartupProfile:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.steps = []   # {"step", "start", "seconds", ...}, offsets in seconds from started_at
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name, **info):
+        """Time the with-block as one step (recorded even if it raises, with the error)."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            info["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._add(name, start, time.perf_counter() - start, info)
+
+    def mark(self, name, **info):
+        """A moment rather than a step, e.g. "window shown"."""
+        self._add(name, time.perf_counter(), 0.0, info)
+
+    def _add(self, name, start, seconds, info):
+        with self._lock:
+            self.steps.append(dict(step=name, start=round(start - self.started_at, 4),
+                                   seconds=round(seconds, 4), thread=threading.current_thread().name, **info))
+
+    def to_dict(self):
+        with self._lock:
+            steps = sorted(self.steps, key=lambda s: s["start"])
+        slowest = sorted((s for s in steps if s["seconds"]), key=lambda s: s["seconds"], reverse=True)
+        return {"total_seconds": round(time.perf_counter() - self.started_at, 4),
+                "steps": steps, "slowest": [s["step"] for s in slowest[:5]]}
+
+    def save(self, path=STARTUP_PROFILE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+
+PROFILE = StartupProfile()
@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+pytest.importorskip("PIL")
+from assets import AssetCache
+
+BACKGROUND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "syd_bg.jpg")
+
+
+def test_disk_keeps_only_the_latest_renders(tmp_path):
+    assets = AssetCache(cache_dir=str(tmp_path), max_on_disk=3)
+    sizes = [(400 + 10 * n, 300 + 10 * n) for n in range(8)]  # a window being dragged bigger
+    for size in sizes:
+        assets.render(BACKGROUND, size)
+    files = os.listdir(tmp_path)
+    assert len(files) == 3
+    assert any(name.endswith(f"-{sizes[-1][0]}x{sizes[-1][1]}.png") for name in files)
+
+
+def test_render_is_loaded_from_disk_on_the_next_launch(tmp_path):
+    AssetCache(cache_dir=str(tmp_path)).render(BACKGROUND, (320, 240))
+    img, exact = AssetCache(cache_dir=str(tmp_path)).quick(BACKGROUND, (320, 240))
+    assert exact and img.size == (320, 240)
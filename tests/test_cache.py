@@ -0,0 +1,45 @@
+from cache import ResultCache
+
+
+def test_key_depends_on_model_params_and_payload():
+    key = ResultCache.make_key("bart", {"max_length": 60}, "some text")
+    assert key == ResultCache.make_key("bart", {"max_length": 60}, b"some text")
+    assert key != ResultCache.make_key("bart", {"max_length": 61}, "some text")
+    assert key != ResultCache.make_key("t5", {"max_length": 60}, "some text")
+    assert key != ResultCache.make_key("bart", {"max_length": 60}, "other text")
+
+
+def test_memory_tier_drops_the_least_recently_used():
+    cache = ResultCache(max_items=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"  # a is now more recent than b
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    stats = cache.stats()
+    assert stats["hits"] == 3 and stats["misses"] == 1 and stats["memory_items"] == 2
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    ResultCache(disk_dir=str(tmp_path)).put("key", {"label": "cat"})
+    cache = ResultCache(disk_dir=str(tmp_path))
+    assert cache.contains("key")
+    assert cache.get("key") == {"label": "cat"}
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_broken_disk_file_is_a_miss(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.put("key", "value")
+    with open(cache._disk_path("key"), "w") as f:
+        f.write("{not json")
+    assert ResultCache(disk_dir=str(tmp_path)).get("key", "default") == "default"
+
+
+def test_clear_with_disk_removes_the_files(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.put("key", "value")
+    cache.clear(disk=True)
+    assert not cache.contains("key")
+    assert cache.stats()["hits"] == 0
@@ -0,0 +1,66 @@
+import random
+
+from chunking import split_sentences, stable_chunks, token_windows
+
+
+class WordTokenizer:
+    """One token per word, enough to test the chunking without loading a real tokenizer."""
+
+    def __call__(self, texts, add_special_tokens=False):
+        return {"input_ids": [[hash(word) for word in text.split()] for text in texts]}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(f"w{i}" for i in range(len(ids)))
+
+
+def document(sentences=120, seed=3):
+    rng = random.Random(seed)
+    words = "report budget city park traffic weather noise people train bus".split()
+    return " ".join(
+        " ".join(rng.choice(words) for _ in range(rng.randint(8, 20))).capitalize() + "."
+        for _ in range(sentences)
+    )
+
+
+def test_split_sentences_keeps_closing_quotes():
+    assert split_sentences('He said "stop." Then he left!\n\nNext part') == [
+        'He said "stop."', "Then he left!", "Next part",
+    ]
+
+
+def test_token_windows():
+    assert token_windows(list(range(5)), 2) == [[0, 1], [2, 3], [4]]
+    assert token_windows([], 2) == [[]]
+
+
+def test_short_text_is_one_chunk():
+    text = "A short review. It was fine."
+    assert stable_chunks(WordTokenizer(), text, max_tokens=100, min_tokens=50) == [text]
+
+
+def test_chunks_respect_the_limits_and_keep_every_sentence():
+    text = document()
+    chunks = stable_chunks(WordTokenizer(), text, max_tokens=120, min_tokens=60)
+    assert len(chunks) > 1
+    assert all(len(chunk.split()) <= 120 for chunk in chunks)
+    assert " ".join(chunks) == " ".join(split_sentences(text))
+
+
+def test_an_edit_only_changes_the_chunks_around_it():
+    text = document(sentences=300)
+    sentences = split_sentences(text)
+    sentences[150] = "A completely different sentence about something else entirely."
+    edited = " ".join(sentences)
+
+    tokenizer = WordTokenizer()
+    before = stable_chunks(tokenizer, text, max_tokens=120, min_tokens=60)
+    after = stable_chunks(tokenizer, edited, max_tokens=120, min_tokens=60)
+    changed = set(after) - set(before)
+    assert 1 <= len(changed) <= 2
+    assert len(set(after) & set(before)) >= len(after) - 2
+
+
+def test_overlong_sentence_is_cut_into_windows():
+    text = " ".join(["word"] * 250) + ". Short end."
+    chunks = stable_chunks(WordTokenizer(), text, max_tokens=100, min_tokens=50)
+    assert all(len(chunk.split()) <= 100 for chunk in chunks)
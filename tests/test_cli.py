@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+pytest.importorskip("PIL")
+import cli
+
+
+class FakeModels:
+    """Stands in for AIModels: texts containing "crash" make the batch call raise."""
+
+    calls = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def run_sentiment_batch(self, texts, batch_size=8):
+        FakeModels.calls.append(list(texts))
+        if any("crash" in text for text in texts):
+            raise RuntimeError("model crashed")
+        return [f"POSITIVE: {text}" for text in texts]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def reviews(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "AIModels", FakeModels)
+    FakeModels.calls = []
+    folder = tmp_path / "reviews"
+    folder.mkdir()
+    for name, text in (("a.txt", "great"), ("b.txt", "crash now"), ("c.txt", "fine"), ("d.txt", "   ")):
+        (folder / name).write_text(text, encoding="utf-8")
+    return folder
+
+
+def read_records(path):
+    return {r["path"].rsplit("/", 1)[-1]: r for r in map(json.loads, path.read_text(encoding="utf-8").splitlines())}
+
+
+@pytest.mark.parametrize("batch_size", ["1", "3", "8"])
+def test_a_failing_file_is_recorded_and_the_run_goes_on(reviews, tmp_path, batch_size):
+    out = tmp_path / "out.jsonl"
+    assert cli.main(["sentiment", str(reviews), "-o", str(out), "--batch-size", batch_size]) == 1
+
+    records = read_records(out)
+    assert records["a.txt"]["result"] == "POSITIVE: great"
+    assert records["b.txt"] == dict(records["b.txt"], result=None, error="model crashed")
+    assert records["c.txt"]["result"] == "POSITIVE: fine"
+    assert records["d.txt"]["error"] == "no text found"
+    assert len((tmp_path / "out.jsonl.checkpoint").read_text().splitlines()) == 4
+
+
+def test_resume_skips_files_in_the_checkpoint(reviews, tmp_path):
+    out = tmp_path / "out.jsonl"
+    (tmp_path / "out.jsonl.checkpoint").write_text(f"{reviews / 'a.txt'}\n{reviews / 'b.txt'}\n", encoding="utf-8")
+    cli.main(["sentiment", str(reviews), "-o", str(out), "--resume", "--batch-size", "8"])
+    assert FakeModels.calls == [["fine"]]
+    assert set(read_records(out)) == {"c.txt", "d.txt"}
+
+    # everything is done now, a second resume has nothing left to run
+    FakeModels.calls = []
+    assert cli.main(["sentiment", str(reviews), "-o", str(out), "--resume"]) == 0
+    assert FakeModels.calls == []
+
+
+def test_resume_to_stdout_needs_a_checkpoint_file(reviews):
+    with pytest.raises(SystemExit):
+        cli.main(["sentiment", str(reviews), "--resume"])
+
+
+def test_text_that_starts_like_an_ocr_error_is_still_scored(reviews, tmp_path):
+    (reviews / "e.txt").write_text("OCR failed to impress me, but the phone is great", encoding="utf-8")
+    out = tmp_path / "out.jsonl"
+    cli.main(["sentiment", str(reviews), "-o", str(out)])
+    record = read_records(out)["e.txt"]
+    assert record["error"] is None and record["result"].startswith("POSITIVE")
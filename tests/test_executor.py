@@ -0,0 +1,84 @@
+import threading
+
+from executor import InferenceExecutor, JobCancelled
+
+
+def test_same_key_while_running_returns_the_same_job():
+    executor = InferenceExecutor(max_workers=2)
+    release = threading.Event()
+    calls = []
+
+    def work(job):
+        calls.append(job.id)
+        release.wait(5)
+        return "done"
+
+    first = executor.submit("summary", work)
+    second = executor.submit("summary", work)
+    assert second is first
+    release.set()
+    first.future.result(5)
+    assert first.outcome() == ("ok", "done")
+    assert len(calls) == 1
+
+    # once it finished the key can run again
+    third = executor.submit("summary", work)
+    third.future.result(5)
+    assert third is not first
+    executor.shutdown()
+
+
+def test_cancel_while_running_is_reported_as_cancelled():
+    executor = InferenceExecutor(max_workers=1)
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        while True:
+            job.check_cancelled()
+            job.cancel_event.wait(0.01)
+
+    job = executor.submit("long", work)
+    assert started.wait(5)
+    executor.cancel("long")
+    try:
+        job.future.result(5)
+    except JobCancelled:
+        pass
+    assert job.outcome() == ("cancelled", None)
+    assert not executor.is_running("long")
+    executor.shutdown()
+
+
+def test_cancel_before_start_never_runs_the_function():
+    executor = InferenceExecutor(max_workers=1)
+    release = threading.Event()
+    ran = []
+    blocker = executor.submit("blocker", lambda job: release.wait(5))
+    queued = executor.submit("queued", lambda job: ran.append(True))
+    queued.cancel()
+    release.set()
+    blocker.future.result(5)
+    assert queued.outcome() == ("cancelled", None)
+    assert ran == []
+    executor.shutdown()
+
+
+def test_errors_and_partial_updates_reach_the_gui_side():
+    executor = InferenceExecutor(max_workers=1)
+
+    def work(job):
+        job.report("part 1")
+        job.report("part 2")
+        raise ValueError("broken input")
+
+    job = executor.submit("bad", work)
+    try:
+        job.future.result(5)
+    except ValueError:
+        pass
+    status, error = job.outcome()
+    assert status == "error" and isinstance(error, ValueError)
+    assert job.drain_updates() == ["part 1", "part 2"]
+    assert job.drain_updates() == []
+    executor.shutdown()
@@ -0,0 +1,83 @@
+import json
+import time
+
+import pytest
+
+pytest.importorskip("PIL")
+from job_queue import DONE, FAILED, PENDING, DocumentQueue
+
+
+class FakeModels:
+    def __init__(self):
+        self.batches = []
+
+    def run_sentiment_batch(self, texts, batch_size=8):
+        self.batches.append(("sentiment", list(texts)))
+        if any("crash" in text for text in texts):
+            raise RuntimeError("model crashed")
+        return [f"POSITIVE: {text}" for text in texts]
+
+    def run_summarization_batch(self, texts, batch_size=8):
+        self.batches.append(("summary", list(texts)))
+        return [f"summary: {text}" for text in texts]
+
+
+def run_until_done(queue, timeout=5):
+    queue.start()
+    deadline = time.monotonic() + timeout
+    while queue.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not queue.running
+
+
+def test_items_are_batched_per_model():
+    models = FakeModels()
+    queue = DocumentQueue(models, workers=1, batch_size=3)
+    for n in range(4):
+        queue.add_text(f"review {n}", "Sentiment Analysis")
+    queue.add_text("long article", "Summarization")
+    run_until_done(queue)
+
+    assert queue.counts() == {PENDING: 0, "running": 0, DONE: 5, FAILED: 0}
+    assert sorted(len(texts) for _, texts in models.batches) == [1, 1, 3]
+    assert {item.result for item in queue.items.values()} >= {"POSITIVE: review 0", "summary: long article"}
+
+
+def test_one_bad_document_does_not_fail_its_batch():
+    models = FakeModels()
+    queue = DocumentQueue(models, workers=1, batch_size=8)
+    good = queue.add_text("nice product", "Sentiment Analysis")
+    bad = queue.add_text("crash please", "Sentiment Analysis")
+    run_until_done(queue)
+
+    assert good.status == DONE and good.result == "POSITIVE: nice product"
+    assert bad.status == FAILED and bad.error == "model crashed"
+
+    # retry puts it back in the queue
+    queue.retry([bad.id])
+    assert bad.status == PENDING
+
+
+def test_changes_model_edits_and_removal():
+    queue = DocumentQueue(FakeModels(), workers=1)
+    text = queue.add_text("some text", "Sentiment Analysis")
+    assert queue.add_file("notes.pdf", "Summarization") is None  # can't run that file type
+    assert queue.set_model([text.id], "Image Classification") == []  # not a text model
+    assert queue.set_model([text.id], "Summarization") == [text.id]
+    assert [item.id for item in queue.drain_changes()] == [text.id]
+    assert queue.drain_changes() == []
+
+    run_until_done(queue)
+    assert text.result == "summary: some text"
+    assert queue.remove_finished() == [text.id]
+    assert queue.items == {}
+
+
+def test_export_writes_every_item(tmp_path):
+    queue = DocumentQueue(FakeModels(), workers=1)
+    queue.add_text("great", "Sentiment Analysis")
+    run_until_done(queue)
+    path = tmp_path / "results.jsonl"
+    assert queue.export(str(path)) == 1
+    record = json.loads(path.read_text(encoding="utf-8"))
+    assert record["status"] == DONE and record["result"] == "POSITIVE: great"
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("PIL")
+import models
+from models import ModelRegistry
+
+SPECS = {"small": ("sentiment-analysis", "small"), "medium": ("summarization", "medium"),
+         "large": ("image-classification", "large")}
+SIZES = {"small": 300, "medium": 500, "large": 900}
+BASE_RSS = 100
+
+
+class FakePipeline:
+    def __init__(self, model_id):
+        self.mb = SIZES[model_id]
+
+
+@pytest.fixture
+def registry_factory(monkeypatch, tmp_path):
+    """Registries whose "RSS" is 100 MB plus the fake models they have loaded."""
+    registries = []
+
+    def build(task, model_id, backend):
+        time.sleep(0.01)  # long enough for parallel loads to overlap
+        return FakePipeline(model_id)
+
+    monkeypatch.setattr(models, "build_pipeline", build)
+    monkeypatch.setattr(models, "instrument_pipeline", lambda pipe, name: pipe)
+    monkeypatch.setattr(models, "model_memory_mb", lambda pipe: pipe.mb)
+    monkeypatch.setattr(models, "current_rss_mb",
+                        lambda: BASE_RSS + sum(p.mb for r in registries for p in list(r._pipelines.values())))
+
+    def make(**kwargs):
+        kwargs.setdefault("sizes_path", str(tmp_path / "sizes.json"))
+        registry = ModelRegistry(specs=SPECS, **kwargs)
+        registries.append(registry)
+        return registry
+
+    return make
+
+
+def test_no_budget_keeps_everything(registry_factory):
+    registry = registry_factory()
+    for name in SPECS:
+        registry.get(name)
+    assert sorted(registry._pipelines) == sorted(SPECS)
+
+
+def test_model_of_unknown_size_is_unloaded_after_the_load(registry_factory):
+    registry = registry_factory(memory_budget_mb=1000)
+    registry.get("small")
+    registry.get("medium")                 # 900 MB, fits
+    registry.get("large")                  # size unknown before loading: 1800 MB, so both others go
+    assert list(registry._pipelines) == ["large"]
+    assert registry.budget_unloads == 2
+    assert registry.states["small"] == "not loaded"
+
+
+def test_least_recently_used_goes_first(registry_factory):
+    registry = registry_factory(memory_budget_mb=1500)
+    registry.get("small")
+    registry.get("medium")
+    registry.get("small")                  # small is now the most recently used
+    registry.get("large")                  # 1800 MB: medium goes, small stays
+    assert sorted(registry._pipelines) == ["large", "small"]
+
+
+def test_measured_sizes_are_used_by_the_next_registry(registry_factory):
+    first = registry_factory()
+    first.get("large")
+    first.unload("large")
+    registry = registry_factory(memory_budget_mb=1000)
+    assert registry.memory_mb["large"] == 900
+    registry.get("medium")
+    assert not registry.has_room("large")  # 600 + 900 > 1000, known before loading
+    registry.get("large")                  # so medium is unloaded first
+    assert list(registry._pipelines) == ["large"]
+
+
+def test_parallel_loads_under_a_budget(registry_factory):
+    registry = registry_factory(memory_budget_mb=1200)
+    errors = []
+
+    def load(name):
+        try:
+            for _ in range(20):
+                registry.get(name)
+                registry.unload(name)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=load, args=(name,)) for name in SPECS]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+
+def test_idle_models_are_unloaded(registry_factory):
+    registry = registry_factory(idle_unload_seconds=0.2)
+    registry.get("small")
+    deadline = time.monotonic() + 5
+    while registry.is_loaded("small") and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not registry.is_loaded("small")
+    assert registry.get("small") is not None  # loaded again on the next use
@@ -0,0 +1,72 @@
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip("pytesseract")
+import ocr
+from ocr import OCREngine
+
+
+class FakePool:
+    """Stands in for the process pool: every call's outcome is decided by the test."""
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes  # first argument of the call -> (delay seconds, value or exception)
+
+    def submit(self, fn, source, *args):
+        future = Future()
+        delay, value = self.outcomes[source]
+
+        def finish():
+            if isinstance(value, Exception):
+                future.set_exception(value)
+            else:
+                future.set_result(value)
+
+        if delay:
+            threading.Timer(delay, finish).start()
+        else:
+            finish()
+        return future
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+def engine_with(outcomes, monkeypatch):
+    monkeypatch.setattr(ocr, "count_pages", lambda path: 1)
+    engine = OCREngine(max_workers=1)
+    engine._pool = FakePool(outcomes)
+    return engine
+
+
+def test_tiles_of_a_page_are_joined_in_order(monkeypatch):
+    engine = engine_with({
+        "scan.png": (0, ("tiles", ["top", "bottom"])),
+        "top": (0.05, "first half"),
+        "bottom": (0, "second half"),
+    }, monkeypatch)
+    pages = list(engine.iter_pages(["scan.png"]))
+    assert [(p.error, p.text) for p in pages] == [(None, "first half\nsecond half")]
+
+
+def test_late_tile_of_a_failed_page_is_ignored(monkeypatch):
+    # the first tile fails right away, the page is reported as failed, and then the second
+    # tile finishes: it must be dropped instead of crashing on the forgotten page
+    engine = engine_with({
+        "bad.png": (0, ("tiles", ["broken", "slow"])),
+        "good.png": (0, ("text", "text of the good page")),
+        "broken": (0, RuntimeError("tesseract crashed")),
+        "slow": (0.5, "late text"),
+    }, monkeypatch)
+    pages = {p.path: p for p in engine.iter_pages(["bad.png", "good.png"])}
+    assert pages["bad.png"].error == "tesseract crashed"
+    assert pages["good.png"].text == "text of the good page"
+    assert len(pages) == 2
+
+
+def test_image_to_text_raises_for_a_failed_page(monkeypatch):
+    engine = engine_with({"bad.png": (0, RuntimeError("unreadable"))}, monkeypatch)
+    with pytest.raises(RuntimeError, match="unreadable"):
+        engine.image_to_text("bad.png")
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+from phash_index import PerceptualIndex, dhash, hamming
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+def test_resized_copy_is_close_and_another_picture_is_not():
+    with Image.open(os.path.join(DATA, "cat.jpg")) as img:
+        cat = img.convert("RGB")
+    with Image.open(os.path.join(DATA, "bmw.jpg")) as img:
+        car = img.convert("RGB")
+    small_cat = cat.resize((cat.width // 3, cat.height // 3))
+    assert hamming(dhash(cat), dhash(small_cat)) <= 6
+    assert hamming(dhash(cat), dhash(car)) > 12
+
+
+def test_lookup_finds_the_closest_hash_with_that_kind():
+    index = PerceptualIndex(disk_dir=None)
+    index.add(0b1111, "vit", "cat")
+    index.add(0b1111 << 40, "vit", "car")
+    index.add(0b1110, "clip", "kitten")
+    assert index.lookup(0b0111, "vit", max_distance=4) == "cat"       # 1 bit away
+    assert index.lookup(0b1111 << 40 | 1, "vit", max_distance=4) == "car"
+    assert index.lookup(0b1111, "clip", max_distance=4) == "kitten"
+    assert index.lookup(0b1111, "ocr", max_distance=4) is None       # no result of that kind
+    assert index.lookup(0xFFFF_0000_0000_0000, "vit", max_distance=6) is None
+    assert index.stats() == {"images": 3, "hits": 3, "misses": 2, "write_errors": 0}
+
+
+def test_every_match_within_the_distance_is_found():
+    # multi-index probing must not miss hashes whose differing bits are spread over all segments
+    index = PerceptualIndex(disk_dir=None)
+    stored = 0x0123_4567_89AB_CDEF
+    index.add(stored, "vit", "found")
+    query = stored ^ (1 << 0) ^ (1 << 17) ^ (1 << 34) ^ (1 << 51) ^ (1 << 52) ^ (1 << 5)
+    assert hamming(stored, query) == 6
+    assert index.lookup(query, "vit", max_distance=6) == "found"
+    assert index.lookup(query, "vit", max_distance=5) is None
+
+
+def test_reload_from_disk(tmp_path):
+    index = PerceptualIndex(disk_dir=str(tmp_path))
+    index.add(1, "vit", "cat")
+    index.add(1, "clip", "kitten")
+    index.add(1 << 63, "vit", "car")
+    again = PerceptualIndex(disk_dir=str(tmp_path))
+    assert len(again) == 2
+    assert again.lookup(1, "clip", 0) == "kitten"
+    assert again.lookup(1 << 63, "vit", 0) == "car"
+
+
+def test_torn_last_write_is_cut_off_and_later_writes_still_load(tmp_path):
+    index = PerceptualIndex(disk_dir=str(tmp_path))
+    index.add(1, "vit", "cat")
+    with open(index.path, "ab") as f:
+        f.write(b'{"hash": "0000000000000002", "kind": "vi')  # crash in the middle of a line
+
+    reloaded = PerceptualIndex(disk_dir=str(tmp_path))
+    assert len(reloaded) == 1
+    reloaded.add(3, "vit", "dog")
+
+    final = PerceptualIndex(disk_dir=str(tmp_path))
+    assert final.lookup(1, "vit", 0) == "cat"
+    assert final.lookup(3, "vit", 0) == "dog"
+    assert final.lookup(2, "vit", 0) is None
+
+
+def test_failed_write_is_counted(tmp_path):
+    index = PerceptualIndex(disk_dir=str(tmp_path))
+    os.makedirs(index.path)  # a folder where the file should be, so every write fails
+    index.add(1, "vit", "cat")
+    assert index.lookup(1, "vit", 0) == "cat"  # still answered from memory
+    assert index.stats()["write_errors"] == 1
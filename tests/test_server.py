@@ -0,0 +1,119 @@
+import asyncio
+import base64
+import json
+
+import pytest
+
+pytest.importorskip("PIL")
+from server import BatchConfig, InferenceServer, MicroBatcher, Overloaded
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class FakeModels:
+    load_stats = {}
+
+    def __init__(self):
+        self.batches = []
+
+    def run_sentiment_batch(self, texts):
+        self.batches.append(list(texts))
+        if "bad" in texts:
+            raise ValueError("model could not score 'bad'")
+        return [f"POSITIVE: {t}" for t in texts]
+
+    run_summarization_batch = run_sentiment_batch
+
+    def run_image_classification_batch(self, paths):
+        return ["Classification: cat" for _ in paths]
+
+    run_ocr_batch = run_image_classification_batch
+
+
+def test_close_requests_share_one_batch():
+    models = FakeModels()
+
+    async def scenario():
+        batcher = MicroBatcher("sentiment", models.run_sentiment_batch, BatchConfig(4, 50, 16))
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(f"t{n}") for n in range(6)))
+        finally:
+            batcher.stop()
+
+    assert run(scenario()) == [f"POSITIVE: t{n}" for n in range(6)]
+    assert [len(b) for b in models.batches] == [4, 2]
+
+
+def test_failed_batch_is_retried_item_by_item():
+    models = FakeModels()
+
+    async def scenario():
+        batcher = MicroBatcher("sentiment", models.run_sentiment_batch, BatchConfig(8, 50, 16))
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(t) for t in ("good", "bad", "fine")), return_exceptions=True)
+        finally:
+            batcher.stop()
+
+    good, bad, fine = run(scenario())
+    assert good == "POSITIVE: good" and fine == "POSITIVE: fine"
+    assert isinstance(bad, ValueError)
+    assert models.batches[0] == ["good", "bad", "fine"]
+    assert models.batches[1:] == [["good"], ["bad"], ["fine"]]
+
+
+def test_full_queue_is_rejected():
+    async def scenario():
+        batcher = MicroBatcher("sentiment", FakeModels().run_sentiment_batch, BatchConfig(1, 0, 1))
+        waiting = asyncio.ensure_future(batcher.submit("first"))  # not started, so it stays queued
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await batcher.submit("second")
+        waiting.cancel()
+        batcher.stop()
+
+    run(scenario())
+
+
+def route(method, path, body=None):
+    async def scenario():
+        server = InferenceServer(FakeModels())
+        for batcher in server.batchers.values():
+            batcher.start()
+        try:
+            raw = json.dumps(body).encode() if body is not None else b""
+            return await server.route(method, path, raw)
+        finally:
+            for batcher in server.batchers.values():
+                batcher.stop()
+            server.images.close()
+
+    status, payload, _ = run(scenario())
+    return status, payload
+
+
+def test_route_status_codes():
+    assert route("POST", "/sentiment", {"text": "nice"}) == (200, {"result": "POSITIVE: nice"})
+    assert route("POST", "/classify", {"image": base64.b64encode(b"img").decode()})[0] == 200
+    assert route("POST", "/sentiment", {"text": ""})[0] == 400
+    assert route("POST", "/sentiment", {})[0] == 400
+    assert route("POST", "/sentiment", [1])[0] == 400
+    assert route("POST", "/classify", {"image": 5})[0] == 400
+    assert route("GET", "/sentiment")[0] == 405
+    assert route("POST", "/translate", {"text": "x"})[0] == 404
+
+
+def test_model_errors_are_500_not_400():
+    status, payload = route("POST", "/sentiment", {"text": "bad"})
+    assert status == 500 and "could not score" in payload["error"]
+
+
+def test_query_string_is_ignored():
+    assert route("GET", "/health?verbose=1")[0] == 200
+    server = InferenceServer(FakeModels())
+    assert server.route_name("/health?verbose=1") == "health"
+    assert server.route_name("/../../etc/passwd") == "unknown"
+    server.images.close()
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("PIL")
+from stage_graph import Stage, StageGraph, ocr_summary_graph
+
+
+def test_every_item_goes_through_every_stage():
+    graph = StageGraph([
+        Stage("double", lambda item: item.update(value=item["n"] * 2), workers=2),
+        Stage("label", lambda item: item.update(label=f"#{item['value']}")),
+    ], graph="test")
+    results = list(graph.run({"n": n} for n in range(20)))
+    assert sorted(item["label"] for item in results) == sorted(f"#{n * 2}" for n in range(20))
+    assert all(item["error"] is None and set(item["timings"]) == {"double", "label"} for item in results)
+    assert graph.stats()["double"]["processed"] == 20
+
+
+def test_failed_item_skips_the_remaining_stages():
+    seen = []
+
+    def check(item):
+        if item["n"] == 3:
+            raise ValueError("bad input")
+
+    graph = StageGraph([Stage("check", check), Stage("record", lambda item: seen.append(item["n"]))], graph="test")
+    results = {item["n"]: item for item in graph.run({"n": n} for n in range(5))}
+    assert results[3]["error"] == "check failed: bad input"
+    assert 3 not in seen and sorted(seen) == [0, 1, 2, 4]
+
+
+def test_slow_stage_fills_its_queue_and_is_the_bottleneck():
+    graph = StageGraph([
+        Stage("fast", lambda item: None, workers=2, queue_size=2),
+        Stage("slow", lambda item: time.sleep(0.02), queue_size=2),
+    ], graph="test")
+    list(graph.run({"n": n} for n in range(15)))
+    stats = graph.stats()
+    assert stats["slow"]["max_queue_depth"] <= 2
+    assert graph.bottleneck() == "slow"
+
+
+def test_cancel_marks_the_items_that_did_not_start():
+    started = threading.Event()
+    release = threading.Event()
+
+    def block(item):
+        started.set()
+        release.wait(5)
+
+    graph = StageGraph([Stage("block", block, queue_size=10)], graph="test").start()
+    for n in range(4):
+        graph.submit({"n": n})
+    graph.close()
+    assert started.wait(5)
+    graph.cancel()
+    release.set()
+    errors = sorted(str(item["error"]) for item in graph.results())
+    assert errors == ["None", "cancelled", "cancelled", "cancelled"]
+
+
+class FakeModels:
+    def __init__(self, cached=()):
+        self.cached = set(cached)
+        self.decoded = []
+
+    def has_cached_ocr(self, path):
+        return path in self.cached
+
+    def decode_for_ocr(self, path):
+        self.decoded.append(path)
+        return {path: "pixels"}
+
+    def run_ocr(self, path, decoded=None):
+        return "" if path == "blank.png" else f"text of {path}"
+
+    def run_summarization(self, text):
+        return f"summary of {text}"
+
+
+def test_ocr_summary_graph_skips_decoding_cached_images():
+    models = FakeModels(cached={"cached.png"})
+    results = {item["path"]: item for item in ocr_summary_graph(models).run(
+        {"path": path} for path in ("new.png", "cached.png", "blank.png"))}
+    assert results["new.png"]["summary"] == "summary of text of new.png"
+    assert results["cached.png"]["summary"] == "summary of text of cached.png"
+    assert results["blank.png"]["error"] == "ocr failed: no text found in this image"
+    assert sorted(models.decoded) == ["blank.png", "new.png"]
+
+
+def test_sentiment_failure_does_not_fail_the_summary():
+    class NoSentiment(FakeModels):
+        def run_document_sentiment(self, text):
+            raise RuntimeError("sentiment model missing")
+
+    [item] = ocr_summary_graph(NoSentiment(), sentiment=True).run([{"path": "page.png"}])
+    assert item["error"] is None
+    assert item["summary"] == "summary of text of page.png"
+    assert item["sentiment_error"] == "sentiment failed: sentiment model missing"
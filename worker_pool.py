@@ -0,0 +1,156 @@
+import gc
+import multiprocessing
+import os
+import sys
+import time
+
+from models import AIModels, MODEL_SPECS, DEFAULT_BATCH_SIZE
+
+# Multi-process model workers that share ONE copy of the weights.
+#
+# The models are loaded in the parent process, their tensors are moved to shared memory and then
+# the workers are forked. The children see the same physical memory pages (read-only, copy-on-write),
+# so 4 workers cost about the same RAM as 1 instead of 4 x (bart + distilbert + vit).
+# Every worker gets its own small torch thread budget so workers x threads <= physical cores.
+#
+# Only works where fork() exists (Linux / macOS), not on Windows.
+
+# set in the parent right before forking, the children inherit it
+_MODELS = None
+
+# the batch methods a pool can spread over its workers
+PARALLEL_METHODS = ("run_summarization_batch", "run_sentiment_batch", "run_image_classification_batch")
+
+
+def physical_cores():
+    try:
+        import psutil
+        return psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    except ImportError:
+        return os.cpu_count() or 1
+
+
+def _init_worker(threads):
+    import torch
+    # each worker only uses its share of the cores, otherwise N workers x all cores threads fight
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # can only be set once per process, fine if the parent already did
+
+
+def _run_slice(method, items, batch_size):
+    return getattr(_MODELS, method)(items, batch_size=batch_size)
+
+
+def _share_weights(models):
+    """Move every loaded torch model into shared memory so forked workers never copy it."""
+    for name in models.registry.specs:
+        if not models.registry.is_loaded(name):
+            continue
+        model = getattr(models.registry.get(name), "model", None)
+        if hasattr(model, "share_memory"):
+            model.share_memory()
+
+
+class SharedModelPool:
+    """
+    pool = SharedModelPool(workers=4)
+    pool.run_sentiment_batch(texts)   # split over 4 processes, results in input order
+
+    Other AIModels methods (run_ocr_batch, close, ...) are passed through to the parent's models,
+    so the pool can be used wherever an AIModels object is expected for batch work.
+    """
+
+    def __init__(self, workers=None, threads_per_worker=1, models=None, preload=tuple(MODEL_SPECS)):
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("SharedModelPool needs fork(), which this platform doesn't have")
+
+        global _MODELS
+        self.threads_per_worker = threads_per_worker
+        self.workers = workers or max(1, physical_cores() // threads_per_worker)
+
+        # children inherit the environment, stop HF tokenizers from starting their own thread pools
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+        # load everything *before* forking, otherwise each worker would load its own copy.
+        # don't run any inference in the parent first: forking after torch's OpenMP pool
+        # has started can hang the children
+        self.models = models or AIModels(preload=preload, background=False, cache=False)
+        for name in preload:
+            self.models.registry.get(name)
+        _share_weights(self.models)
+        _MODELS = self.models
+
+        # keep the garbage collector from touching (and so copying) the inherited objects
+        gc.collect()
+        gc.freeze()
+        context = multiprocessing.get_context("fork")
+        self._pool = context.Pool(self.workers, initializer=_init_worker, initargs=(threads_per_worker,))
+        gc.unfreeze()
+
+    def map(self, method, items, batch_size=DEFAULT_BATCH_SIZE):
+        """Split items into one contiguous slice per worker and run method(slice) in parallel."""
+        if method not in PARALLEL_METHODS:
+            raise ValueError(f"{method} can't be run in the pool, use one of {PARALLEL_METHODS}")
+        items = list(items)
+        if not items:
+            return []
+        size = -(-len(items) // self.workers)  # ceil division
+        slices = [items[i:i + size] for i in range(0, len(items), size)]
+        results = self._pool.starmap(_run_slice, [(method, s, batch_size) for s in slices])
+        return [r for part in results for r in part]
+
+    def run_summarization_batch(self, texts, batch_size=DEFAULT_BATCH_SIZE):
+        return self.map("run_summarization_batch", texts, batch_size)
+
+    def run_sentiment_batch(self, texts, batch_size=DEFAULT_BATCH_SIZE):
+        return self.map("run_sentiment_batch", texts, batch_size)
+
+    def run_image_classification_batch(self, image_paths, batch_size=DEFAULT_BATCH_SIZE):
+        return self.map("run_image_classification_batch", image_paths, batch_size)
+
+    def __getattr__(self, name):
+        # everything else (run_ocr_batch, load_stats, ...) comes from the parent's AIModels
+        if name == "models":
+            raise AttributeError(name)
+        return getattr(self.models, name)
+
+    def terminate(self):
+        """Stop the worker processes but keep the models loaded in this process."""
+        self._pool.terminate()
+        self._pool.join()
+
+    def close(self):
+        self.terminate()
+        self.models.close()
+
+
+def main():
+    """Sentiment throughput for 1, 2, 4 ... workers, to check how close to linear the scaling is."""
+    from benchmark import synthetic_corpus
+
+    texts = synthetic_corpus(256, 20, 80)
+    models = AIModels(preload=("sentiment_analyzer",), background=False, cache=False)
+    counts, n = [], 1
+    while n <= physical_cores():
+        counts.append(n)
+        n *= 2
+
+    base_rate = None
+    print(f"{'workers':>8}{'texts/s':>10}{'speedup':>9}")
+    for workers in counts:
+        pool = SharedModelPool(workers=workers, models=models, preload=("sentiment_analyzer",))
+        pool.run_sentiment_batch(texts[:workers * 2])  # let every worker warm up
+        start = time.perf_counter()
+        pool.run_sentiment_batch(texts)
+        rate = len(texts) / (time.perf_counter() - start)
+        base_rate = base_rate or rate
+        print(f"{workers:>8}{rate:>10.1f}{rate / base_rate:>8.2f}x")
+        pool.terminate()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
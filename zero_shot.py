@@ -0,0 +1,132 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from image_loader import SHARED_LOADER
+from instrumentation import REGISTRY
+
+# Zero-shot image classification with CLIP: the user gives any list of labels instead of the
+# 1000 fixed ImageNet classes of google/vit-base-patch16-224.
+#
+# - every label is turned into a prompt ("a photo of a {label}.") and run through CLIP's text
+#   encoder ONCE. The normalized embeddings are kept as one float32 matrix (labels x dim), in memory
+#   and as a .npy file under LABEL_CACHE_DIR, keyed by model + prompt template + the label list
+# - classifying an image is then one image encode plus a single matrix-vector product against
+#   that matrix, and np.argpartition picks the top-k, so 5000 labels cost about the same as 10
+# - CLIP itself is a "zero-shot-image-classification" pipeline in models.ModelRegistry (as ZERO_SHOT_SPEC),
+#   so it is loaded lazily, counts against the memory budget and can be unloaded like the other models.
+#   Only its model, tokenizer and image processor are used, not the pipeline's own __call__
+
+CLIP_MODEL_ID = "openai/clip-vit-base-patch32"
+ZERO_SHOT_MODEL = "zero_shot"  # name in the model registry
+ZERO_SHOT_SPEC = ("zero-shot-image-classification", CLIP_MODEL_ID)
+PROMPT_TEMPLATE = "a photo of a {}."
+LABEL_CACHE_DIR = os.path.join(".cache", "labels")
+# labels per forward pass when encoding a new label set
+TEXT_BATCH = 256
+
+
+def parse_labels(text):
+    """Comma or newline separated labels -> list, duplicates and blanks removed (order kept)."""
+    parts = [p.strip() for line in text.splitlines() for p in line.split(",")]
+    return list(dict.fromkeys(p for p in parts if p))
+
+
+class ZeroShotClassifier:
+    def __init__(self, registry, name=ZERO_SHOT_MODEL, template=PROMPT_TEMPLATE, cache_dir=LABEL_CACHE_DIR,
+                 loader=SHARED_LOADER, max_label_sets=8):
+        self.registry = registry
+        self.name = name
+        self.model_id = registry.specs[name][1]
+        self.template = template
+        self.cache_dir = cache_dir
+        self.loader = loader
+        self.max_label_sets = max_label_sets
+        self._label_sets = OrderedDict()  # label set key -> (labels, embedding matrix)
+        self._sets_lock = threading.Lock()
+
+    def _load(self):
+        # the registry loads the pipeline on first use (and again after it was unloaded)
+        return self.registry.get(self.name)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.registry.is_loaded(self.name)
+
+    def label_set_key(self, labels):
+        ident = "\n".join([self.model_id, self.template] + list(labels))
+        return hashlib.sha1(ident.encode("utf-8")).hexdigest()[:20]
+
+    # ---- label embeddings ----
+    def label_matrix(self, labels):
+        """(len(labels), dim) float32 matrix of normalized prompt embeddings, computed once per label set."""
+        labels = list(labels)
+        if not labels:
+            raise ValueError("zero-shot classification needs at least one label")
+        key = self.label_set_key(labels)
+        with self._sets_lock:
+            entry = self._label_sets.get(key)
+            if entry is not None:
+                self._label_sets.move_to_end(key)
+                return entry[1]
+
+        path = os.path.join(self.cache_dir, f"{key}.npy")
+        matrix = None
+        if os.path.exists(path):
+            try:
+                matrix = np.load(path)
+            except (OSError, ValueError):
+                matrix = None  # broken file, encode again
+        if matrix is None or matrix.shape[0] != len(labels):
+            matrix = self._encode_labels(labels)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp.npy"
+            np.save(tmp_path, matrix)
+            os.replace(tmp_path, path)
+
+        with self._sets_lock:
+            self._label_sets[key] = (labels, matrix)
+            while len(self._label_sets) > self.max_label_sets:
+                self._label_sets.popitem(last=False)
+        return matrix
+
+    def _encode_labels(self, labels):
+        import torch
+        pipe = self._load()
+        prompts = [self.template.format(label) for label in labels]
+        parts = []
+        with REGISTRY.span("aimodels_stage_seconds", model="zero_shot", stage="label_encoding"), torch.no_grad():
+            for start in range(0, len(prompts), TEXT_BATCH):
+                inputs = pipe.tokenizer(prompts[start:start + TEXT_BATCH], return_tensors="pt", padding=True)
+                parts.append(pipe.model.get_text_features(**inputs).numpy())
+        matrix = np.concatenate(parts).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        return np.ascontiguousarray(matrix)
+
+    # ---- images ----
+    def image_embedding(self, image_path):
+        import torch
+        pipe = self._load()
+        image = self.loader.center_crop(image_path)
+        with REGISTRY.span("aimodels_stage_seconds", model="zero_shot", stage="forward"), torch.no_grad():
+            inputs = pipe.image_processor(images=image, return_tensors="pt")
+            vector = pipe.model.get_image_features(**inputs)[0].numpy().astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def classify(self, image_path, labels, top_k=5):
+        """Top-k [{"label", "score"}] for the image, scores are softmax probabilities over all labels."""
+        matrix = self.label_matrix(labels)
+        vector = self.image_embedding(image_path)
+        logits = (matrix @ vector) * float(self._load().model.logit_scale.exp())
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+
+        k = min(top_k, len(probs))
+        # argpartition finds the k best without sorting every label, then only those k are sorted
+        best = np.argpartition(-probs, k - 1)[:k]
+        best = best[np.argsort(-probs[best])]
+        labels = list(labels)
+        return [{"label": labels[i], "score": float(probs[i])} for i in best]